@@ -0,0 +1,281 @@
+"""
+Behavioural checks for the admission-control middleware
+(middleware/admission.py): per-route concurrency limits, load shedding
+(queue full, deadline, client timeout), the cache-hit fast path, and slot
+accounting when a queued request is cancelled.
+
+Requests go through httpx's ASGI transport to a small echo app wrapped in
+AdmissionControlMiddleware, so no server or real route is involved; Redis
+(for the fast path) is the bench's fakeredis.
+
+    python -m bench.admission_check
+    python -m bench.admission_check --only cancelled_waiter -v
+
+Exits non-zero if any scenario fails.
+"""
+import sys
+import json
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+from bench.checks import check, main as run_checks
+
+handles: Dict[str, Any] = {}
+GATED = "/gated"
+
+
+def setup():
+    from bench.fakes import install_fakes
+
+    handles.update(install_fakes())
+
+
+def reset():
+    handles["redis"].flushdb()
+
+
+class EchoApp:
+    """
+    ASGI app that echoes the request body. A JSON body with "hold": true
+    waits until `release` is set; otherwise the request takes `delay` seconds.
+    Tracks how many requests are running at once.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.release = asyncio.Event()
+        self.running = 0
+        self.peak = 0
+        self.started = 0
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        self.running += 1
+        self.started += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            if body and json.loads(body).get("hold"):
+                await self.release.wait()
+            else:
+                await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _client(app: EchoApp, limit: int = 1, queue_size: int = 8, queue_timeout: float = 5.0, cache_keys=None):
+    import httpx
+    from middleware.admission import AdmissionControlMiddleware
+
+    middleware = AdmissionControlMiddleware(app, limits={GATED: limit}, cache_keys=cache_keys,
+                                            queue_size=queue_size, queue_timeout=queue_timeout)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://check")
+    return client, middleware.gates[GATED]
+
+
+async def _until(condition, message: str, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError(f"timed out waiting for: {message}")
+        await asyncio.sleep(0.005)
+
+
+def _post(client, body: Dict[str, Any], timeout: Optional[float] = None):
+    headers = {"x-request-timeout": str(timeout)} if timeout is not None else {}
+    return client.post(GATED, json=body, headers=headers)
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenario_concurrency_limit():
+    """Concurrent requests beyond the limit queue and all complete, never exceeding the limit."""
+    async def go():
+        app = EchoApp(delay=0.03)
+        client, gate = _client(app, limit=2, queue_size=16)
+        async with client:
+            responses = await asyncio.gather(*(_post(client, {"i": i}) for i in range(10)))
+        check([r.status_code for r in responses] == [200] * 10, f"statuses {[r.status_code for r in responses]}")
+        check(app.peak == 2, f"{app.peak} requests ran at once with a limit of 2")
+        snap = gate.snapshot()
+        check(snap["in_flight"] == 0 and snap["queued"] == 0 and snap["admitted"] == 10, f"snapshot {snap}")
+        check(snap["avg_latency_ms"] is not None, "latency not tracked")
+    asyncio.run(go())
+
+
+def scenario_queue_full():
+    """With the slot taken and the queue full, the next request gets 503 with Retry-After at once."""
+    async def go():
+        app = EchoApp()
+        client, gate = _client(app, limit=1, queue_size=2)
+        async with client:
+            holder = asyncio.create_task(_post(client, {"hold": True}))
+            await _until(lambda: app.running == 1, "holder running")
+            queued = [asyncio.create_task(_post(client, {"i": i})) for i in range(2)]
+            await _until(lambda: len(gate.waiters) == 2, "queue filled")
+            start = time.monotonic()
+            rejected = await _post(client, {"i": 2})
+            elapsed = time.monotonic() - start
+            app.release.set()
+            responses = await asyncio.gather(holder, *queued)
+        check(rejected.status_code == 503, f"status {rejected.status_code}")
+        check(int(rejected.headers["retry-after"]) >= 1, f"Retry-After {rejected.headers.get('retry-after')}")
+        check("queue full" in rejected.json()["detail"], f"detail {rejected.text}")
+        check(elapsed < 0.5, f"rejection took {elapsed:.2f}s")
+        check([r.status_code for r in responses] == [200] * 3, "queued requests not served")
+        check(gate.shed["queue_full"] == 1 and gate.in_flight == 0, f"snapshot {gate.snapshot()}")
+    asyncio.run(go())
+
+
+def scenario_deadline_shed():
+    """A request whose expected wait exceeds its budget is rejected without taking a queue slot."""
+    async def go():
+        app = EchoApp()
+        client, gate = _client(app, limit=1, queue_timeout=1.0)
+        gate.avg_latency = 5.0  # each queued request is expected to wait ~5 s
+        async with client:
+            holder = asyncio.create_task(_post(client, {"hold": True}))
+            await _until(lambda: app.running == 1, "holder running")
+            start = time.monotonic()
+            rejected = await _post(client, {"i": 1})
+            elapsed = time.monotonic() - start
+            app.release.set()
+            await holder
+        check(rejected.status_code == 503 and elapsed < 0.5, f"status {rejected.status_code} after {elapsed:.2f}s")
+        check(int(rejected.headers["retry-after"]) >= 5, f"Retry-After {rejected.headers['retry-after']}")
+        check(gate.shed["deadline"] == 1 and not gate.waiters, f"snapshot {gate.snapshot()}")
+    asyncio.run(go())
+
+
+def scenario_client_timeout_header():
+    """X-Request-Timeout shortens (never extends) how long a request may queue."""
+    async def go():
+        app = EchoApp()
+        client, gate = _client(app, limit=1, queue_timeout=0.3)
+        async with client:
+            holder = asyncio.create_task(_post(client, {"hold": True}))
+            await _until(lambda: app.running == 1, "holder running")
+            start = time.monotonic()
+            short = await _post(client, {"i": 1}, timeout=0.05)
+            short_elapsed = time.monotonic() - start
+            start = time.monotonic()
+            long = await _post(client, {"i": 2}, timeout=60)
+            long_elapsed = time.monotonic() - start
+            app.release.set()
+            await holder
+        check(short.status_code == 503 and short_elapsed < 0.25, f"short budget: {short.status_code} after {short_elapsed:.2f}s")
+        check(long.status_code == 503 and long_elapsed < 1.0, f"header extended the budget: {long_elapsed:.2f}s")
+        check(gate.shed["timeout"] == 2 and not gate.waiters and gate.in_flight == 0, f"snapshot {gate.snapshot()}")
+    asyncio.run(go())
+
+
+def scenario_cache_fast_path():
+    """Requests whose response is cached skip the gate and are served while the route is saturated."""
+    async def go():
+        handles["redis"].set("check:hot", "{}")
+        app = EchoApp()
+        client, gate = _client(app, limit=1, queue_size=0, cache_keys={GATED: lambda body: f"check:{body['text']}"})
+        async with client:
+            holder = asyncio.create_task(_post(client, {"hold": True, "text": "cold"}))
+            await _until(lambda: app.running == 1, "holder running")
+            hot = await _post(client, {"text": "hot"})
+            cold = await _post(client, {"text": "cold"})
+            malformed = await client.post(GATED, content=b"{not json")
+            app.release.set()
+            await holder
+        check(hot.status_code == 200 and hot.json() == {"text": "hot"}, f"cache hit: {hot.status_code} {hot.text}")
+        check(cold.status_code == 503, f"cache miss while saturated: {cold.status_code}")
+        check(malformed.status_code == 503, f"malformed body skipped the gate: {malformed.status_code}")
+        check(gate.fast_path == 1 and gate.in_flight == 0, f"snapshot {gate.snapshot()}")
+    asyncio.run(go())
+
+
+def scenario_cancelled_waiter():
+    """A waiter cancelled while queued, or just after being handed the slot, does not leak it."""
+    from middleware.admission import RouteGate
+
+    async def go():
+        gate = RouteGate(GATED, limit=1, queue_size=4)
+        await gate.acquire(1.0)
+
+        # Cancelled while still queued.
+        waiter = asyncio.create_task(gate.acquire(5.0))
+        await _until(lambda: len(gate.waiters) == 1, "waiter queued")
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        check(not gate.waiters and gate.in_flight == 1, f"after cancelling a queued waiter: {gate.snapshot()}")
+
+        # Handed the slot, then cancelled before it could run.
+        waiter = asyncio.create_task(gate.acquire(5.0))
+        await _until(lambda: len(gate.waiters) == 1, "waiter queued")
+        gate.release(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        check(gate.in_flight == 0 and not gate.waiters, f"slot leaked: {gate.snapshot()}")
+
+        await asyncio.wait_for(gate.acquire(0.1), timeout=0.5)
+        check(gate.in_flight == 1, "slot not reusable")
+        gate.release(0.01)
+        check(gate.in_flight == 0, f"after the last release: {gate.snapshot()}")
+    asyncio.run(go())
+
+
+def scenario_body_replayed():
+    """Reading the body for the cache check does not lose it for the route, on a hit or a miss."""
+    async def go():
+        handles["redis"].set("check:hit", "{}")
+        app = EchoApp()
+        client, _ = _client(app, limit=2, cache_keys={GATED: lambda body: f"check:{body['text']}"})
+        payload = {"text": "miss", "blob": "é" * 200_000}
+        async with client:
+            miss = await _post(client, payload)
+            hit = await _post(client, {**payload, "text": "hit"})
+        check(miss.json() == payload, "body changed on the gated path")
+        check(hit.json() == {**payload, "text": "hit"}, "body changed on the fast path")
+    asyncio.run(go())
+
+
+def scenario_ungated_paths():
+    """Paths without a limit are never queued or shed."""
+    async def go():
+        app = EchoApp()
+        client, gate = _client(app, limit=1, queue_size=0)
+        async with client:
+            holder = asyncio.create_task(_post(client, {"hold": True}))
+            await _until(lambda: app.running == 1, "holder running")
+            other = await client.post("/other", json={"i": 1})
+            health = await client.get("/health")
+            app.release.set()
+            await holder
+        check(other.status_code == 200 and health.status_code == 200, f"statuses {other.status_code}, {health.status_code}")
+        check(gate.admitted == 1, f"ungated requests counted by the gate: {gate.snapshot()}")
+    asyncio.run(go())
+
+
+SCENARIOS = {
+    "concurrency_limit": scenario_concurrency_limit,
+    "queue_full": scenario_queue_full,
+    "deadline_shed": scenario_deadline_shed,
+    "client_timeout_header": scenario_client_timeout_header,
+    "cache_fast_path": scenario_cache_fast_path,
+    "cancelled_waiter": scenario_cancelled_waiter,
+    "body_replayed": scenario_body_replayed,
+    "ungated_paths": scenario_ungated_paths,
+}
+
+
+def main(argv=None) -> int:
+    return run_checks(SCENARIOS, "Behavioural checks for the admission-control middleware.", argv,
+                      setup=setup, before_each=reset)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Behavioural checks for the batched analyze pipeline
+(services/analyze_service.run_analyze_batch) against the bench fakes: that a
+batch answers exactly what one /graph/analyze call per text would, reuses the
+Redis cache, answers duplicates once, and survives corrupt cache entries.
+
+    python -m bench.analyze_batch_check
+    python -m bench.analyze_batch_check --only corrupt_cache_entry -v
+
+Exits non-zero if any scenario fails.
+"""
+import sys
+from typing import Any, Dict, List
+
+from bench.checks import check, main as run_checks
+
+handles: Dict[str, Any] = {}
+SEED_TOPICS = ["vector databases", "retrieval augmented generation", "rate limiting"]
+TEXTS = [
+    "Vector databases trade recall for latency.",
+    "Retrieval quality depends on chunking.",
+    "Token buckets smooth bursts of requests.",
+]
+
+
+def setup():
+    from bench.fakes import install_fakes
+
+    handles.update(install_fakes())
+
+    from main import import_heavy_modules
+    from schemas.research_schema import ResearchInput
+    from services.research_service import run_research_pipeline
+
+    import_heavy_modules()
+    # Something for the retrieval step to find.
+    db = handles["SessionLocal"]()
+    try:
+        for topic in SEED_TOPICS:
+            run_research_pipeline(ResearchInput(topic=topic), db, handles["mongo_db"])
+    finally:
+        db.close()
+
+
+def reset():
+    from tools import llm_cache
+
+    handles["redis"].flushdb()
+    llm_cache.clear_local()
+
+
+def _batch(texts: List[str], use_cache: bool = True) -> List[Dict[str, Any]]:
+    from services.analyze_service import run_analyze_batch
+
+    db = handles["SessionLocal"]()
+    try:
+        return run_analyze_batch(texts, db, handles["mongo_db"], use_cache=use_cache)
+    finally:
+        db.close()
+
+
+def _single(text: str) -> Dict[str, Any]:
+    from services.analyze_service import run_analyze_pipeline
+
+    db = handles["SessionLocal"]()
+    try:
+        return run_analyze_pipeline(text, db, handles["mongo_db"], use_cache=False)
+    finally:
+        db.close()
+
+
+def _comparable(result: Dict[str, Any]) -> Dict[str, Any]:
+    # Batched similarity is one matrix product, so scores differ in the last bits.
+    out = {k: v for k, v in result.items() if k not in ("generated_at", "cached")}
+    out["related"] = [{**r, "similarity": round(r["similarity"], 9)} for r in out["related"]]
+    return out
+
+
+class _CountLLMCalls:
+    def __enter__(self):
+        from bench.fakes import FakeChatModel
+
+        self.calls = 0
+        self._original = FakeChatModel.invoke
+
+        def counted(model, value, *args, **kwargs):
+            self.calls += 1
+            return self._original(model, value, *args, **kwargs)
+
+        FakeChatModel.invoke = counted
+        return self
+
+    def __exit__(self, *exc):
+        from bench.fakes import FakeChatModel
+
+        FakeChatModel.invoke = self._original
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenario_matches_single():
+    """Each batch result equals the single-text pipeline's result for that text, in input order."""
+    expected = [_comparable(_single(t)) for t in TEXTS]
+    reset()
+    got = [_comparable(r) for r in _batch(TEXTS, use_cache=False)]
+    check(all(r["related"] for r in got), "retrieval found nothing; the comparison is vacuous")
+    for i, (e, g) in enumerate(zip(expected, got)):
+        for field in e:
+            check(e[field] == g[field], f"text {i}: batch {field} {g[field]} != single {e[field]}")
+
+
+def scenario_cache_hits():
+    """Texts analyzed before are answered from the cache; only the rest reach the LLM."""
+    _single(TEXTS[0])  # writes the cache entry
+    with _CountLLMCalls() as llm:
+        results = _batch(TEXTS)
+    check(results[0].get("cached") is True, "previously analyzed text not served from the cache")
+    check(not results[1].get("cached") and not results[2].get("cached"), "fresh texts marked cached")
+    check(llm.calls == 2, f"{llm.calls} LLM calls for 2 uncached texts")
+    with _CountLLMCalls() as llm:
+        again = _batch(TEXTS)
+    check(llm.calls == 0 and all(r["cached"] for r in again), f"repeat batch made {llm.calls} LLM calls")
+
+
+def scenario_duplicates_answered_once():
+    """Texts that normalize to the same string share one synthesis and one result."""
+    texts = [TEXTS[0], "  " + TEXTS[0].replace(" ", "   ") + "\n", TEXTS[1], TEXTS[0]]
+    with _CountLLMCalls() as llm:
+        results = _batch(texts)
+    check(llm.calls == 2, f"{llm.calls} LLM calls for 2 distinct texts")
+    check(results[0] == results[1] == results[3], "duplicate texts got different results")
+    check(results[0] != results[2], "distinct texts got the same result")
+
+
+def scenario_corrupt_cache_entry():
+    """An unparseable cached value is a miss: the text is re-analyzed and the entry rewritten."""
+    from services.analyze_service import analyze_cache_key
+    from tools.cache import cache_get
+
+    key = analyze_cache_key(TEXTS[1])
+    handles["redis"].set(key, b"{not json")
+    _single(TEXTS[0])
+    results = _batch(TEXTS)
+    check(results[0].get("cached") is True, "valid entry next to the corrupt one was not used")
+    check(not results[1].get("cached") and results[1]["insights"], f"corrupt entry served: {results[1]}")
+    check(cache_get(key) is not None, "corrupt entry not replaced")
+
+
+def scenario_validation():
+    """Oversized batches and empty texts are rejected with 400 before any work is done."""
+    from fastapi import HTTPException
+    from config import settings
+
+    cases = {
+        "oversized": ["text"] * (settings.ANALYZE_BATCH_MAX_SIZE + 1),
+        "empty text": ["fine", "   "],
+    }
+    with _CountLLMCalls() as llm:
+        for name, texts in cases.items():
+            try:
+                _batch(texts)
+            except HTTPException as e:
+                check(e.status_code == 400, f"{name}: status {e.status_code}")
+            else:
+                raise AssertionError(f"{name}: batch accepted")
+    check(llm.calls == 0, f"{llm.calls} LLM calls for rejected batches")
+    check(_batch([]) == [], "empty batch")
+
+
+SCENARIOS = {
+    "matches_single": scenario_matches_single,
+    "cache_hits": scenario_cache_hits,
+    "duplicates_answered_once": scenario_duplicates_answered_once,
+    "corrupt_cache_entry": scenario_corrupt_cache_entry,
+    "validation": scenario_validation,
+}
+
+
+def main(argv=None) -> int:
+    return run_checks(SCENARIOS, "Behavioural checks for the batched analyze pipeline.", argv,
+                      setup=setup, before_each=reset)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
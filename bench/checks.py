@@ -0,0 +1,86 @@
+"""
+Shared scaffolding for the behavioural check scripts (bench/*_check.py).
+
+Each script maps scenario names to functions that raise CheckFailed (or any
+exception) on failure, and hands them to `main`, which runs the selected
+scenarios, prints a table and returns a non-zero exit status if any failed:
+
+    python -m bench.<name>_check
+    python -m bench.<name>_check --only a,b -v
+"""
+import time
+import argparse
+import logging
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+
+class CheckFailed(AssertionError):
+    pass
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        raise CheckFailed(message)
+
+
+def wait_for(condition: Callable[[], bool], message: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return
+        time.sleep(0.01)
+    raise CheckFailed(f"timed out waiting for: {message}")
+
+
+def run(scenarios: Dict[str, Callable[[], None]], names: List[str], verbose: bool,
+        before_each: Optional[Callable[[], None]] = None) -> List[Dict[str, Any]]:
+    rows = []
+    for name in names:
+        start = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            if before_each:
+                before_each()
+            scenarios[name]()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if verbose and not isinstance(e, CheckFailed):
+                traceback.print_exc()
+        rows.append({
+            "scenario": name,
+            "result": "FAIL" if error else "ok",
+            "seconds": round(time.perf_counter() - start, 2),
+            "detail": error or "",
+        })
+    return rows
+
+
+def main(scenarios: Dict[str, Callable[[], None]], description: str, argv=None,
+         setup: Optional[Callable[[], Any]] = None, before_each: Optional[Callable[[], None]] = None) -> int:
+    """
+    Parse --only / -v, call `setup` once (e.g. to install the backend fakes,
+    which must happen before the app modules are imported), then run the
+    scenarios with `before_each` ahead of every one.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--only", help="comma-separated scenarios (default: all)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show logs and tracebacks")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    names = args.only.split(",") if args.only else list(scenarios)
+    unknown = [n for n in names if n not in scenarios]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(scenarios)}")
+
+    from bench import stats
+
+    if setup:
+        setup()
+    rows = run(scenarios, names, args.verbose, before_each)
+    print(stats.format_table(rows, ["scenario", "result", "seconds", "detail"]))
+    failed = [r for r in rows if r["result"] != "ok"]
+    print(f"\n{len(rows) - len(failed)}/{len(rows)} scenarios passed")
+    return 1 if failed else 0
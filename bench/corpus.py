@@ -0,0 +1,166 @@
+"""
+Synthetic research corpus: `Research` rows in Postgres plus clustered
+embeddings in the Mongo `embeddings` collection, shaped exactly like the
+documents `create_and_store_embedding` writes.
+
+Embeddings are drawn around `clusters` random unit centres with Gaussian
+noise, which gives retrieval a realistic structure (near neighbours exist and
+are well separated) instead of uniformly random vectors where every cosine
+similarity is ~0.
+
+Fill real databases (explicit URIs only, never the values from .env):
+
+    python -m bench.corpus --count 100000 \\
+        --postgres-uri postgresql://... --mongo-uri mongodb://... --mongo-db research_bench
+"""
+import sys
+import argparse
+import datetime
+from typing import Iterator, Tuple, List
+
+import numpy as np
+
+DEFAULT_DIM = 3072
+
+
+class CorpusGenerator:
+    """
+    Deterministic generator of clustered unit vectors. Batches are produced on
+    demand so a 1M x 3072 corpus never has to be materialized at once.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM, clusters: int = 256, noise: float = 0.6, seed: int = 7):
+        self.dim = dim
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        centres = self.rng.standard_normal((clusters, dim)).astype(np.float32)
+        self.centres = centres / np.linalg.norm(centres, axis=1, keepdims=True)
+        self.generated = 0
+
+    def _around(self, centre_idx: np.ndarray, noise: float) -> np.ndarray:
+        vecs = self.centres[centre_idx] + self.rng.standard_normal((len(centre_idx), self.dim)).astype(np.float32) * (noise / np.sqrt(self.dim))
+        return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    def batches(self, count: int, batch_size: int = 1000) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yields (cluster_ids, vectors) batches totalling `count` rows."""
+        remaining = count
+        while remaining > 0:
+            n = min(batch_size, remaining)
+            cluster_ids = self.rng.integers(0, len(self.centres), size=n)
+            yield cluster_ids, self._around(cluster_ids, self.noise)
+            self.generated += n
+            remaining -= n
+
+    def queries(self, count: int) -> np.ndarray:
+        """Query vectors near random cluster centres (a bit tighter than the corpus)."""
+        cluster_ids = self.rng.integers(0, len(self.centres), size=count)
+        return self._around(cluster_ids, self.noise / 2)
+
+
+def populate(
+    session,
+    mongo_coll,
+    generator: CorpusGenerator,
+    count: int,
+    batch_size: int = 1000,
+    on_batch=None,
+) -> int:
+    """
+    Insert `count` synthetic Research rows and matching embedding documents.
+    `on_batch(research_ids, vectors)` is called after every batch, which the
+    scaling benchmark uses to maintain exact ground truth incrementally.
+    Returns the number of rows written.
+    """
+    from sqlalchemy import insert
+    from models.research import Research
+
+    written = 0
+    for cluster_ids, vectors in generator.batches(count, batch_size):
+        offset = generator.generated - len(cluster_ids)
+        rows = [
+            {
+                "topic": f"synthetic topic {offset + i} (cluster {c})",
+                "summary": f"Synthetic summary for document {offset + i} in cluster {c}.",
+                "tags": f"synthetic,cluster-{c}",
+                "s3_url": None,
+            }
+            for i, c in enumerate(cluster_ids.tolist())
+        ]
+        research_ids = list(session.scalars(insert(Research).returning(Research.id), rows))
+        session.commit()
+
+        now = datetime.datetime.utcnow()
+        mongo_coll.insert_many([
+            {
+                "research_id": rid,
+                "topic": row["topic"],
+                "embedding": vec.tolist(),
+                "text": row["summary"],
+                "created_at": now,
+            }
+            for rid, row, vec in zip(research_ids, rows, vectors)
+        ])
+        if on_batch:
+            on_batch(np.asarray(research_ids, dtype=np.int64), vectors)
+        written += len(rows)
+    return written
+
+
+class GroundTruth:
+    """
+    Exact top-k research ids for a fixed query set, maintained incrementally
+    as corpus batches arrive (so it costs one pass over the corpus in total).
+    """
+
+    def __init__(self, queries: np.ndarray, top_k: int):
+        self.queries = queries
+        self.top_k = top_k
+        self.scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        self.ids = np.zeros((len(queries), 0), dtype=np.int64)
+
+    def add(self, research_ids: np.ndarray, vectors: np.ndarray):
+        sims = self.queries @ vectors.T
+        scores = np.concatenate([self.scores, sims], axis=1)
+        ids = np.concatenate([self.ids, np.broadcast_to(research_ids, sims.shape)], axis=1)
+        keep = np.argsort(-scores, axis=1)[:, :self.top_k]
+        self.scores = np.take_along_axis(scores, keep, axis=1)
+        self.ids = np.take_along_axis(ids, keep, axis=1)
+
+    def recall(self, query_idx: int, found_ids: List[int]) -> float:
+        truth = set(self.ids[query_idx].tolist())
+        if not truth:
+            return 1.0
+        return len(truth & set(found_ids[:self.top_k])) / len(truth)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fill Postgres + Mongo with a synthetic research corpus.")
+    parser.add_argument("--count", type=int, required=True)
+    parser.add_argument("--postgres-uri", required=True)
+    parser.add_argument("--mongo-uri", required=True)
+    parser.add_argument("--mongo-db", default="research_bench")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from pymongo import MongoClient
+    from models.research import Base
+
+    engine = create_engine(args.postgres_uri)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    coll = MongoClient(args.mongo_uri)[args.mongo_db]["embeddings"]
+
+    generator = CorpusGenerator(dim=args.dim, clusters=args.clusters, seed=args.seed)
+    written = populate(session, coll, generator, args.count, batch_size=args.batch_size)
+    session.close()
+    print(f"Wrote {written} synthetic documents ({args.dim}-dim, {args.clusters} clusters).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
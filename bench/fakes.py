@@ -0,0 +1,337 @@
+"""
+Deterministic in-process stand-ins for every backend the pipelines talk to:
+
+    Postgres -> SQLite file          Redis  -> fakeredis
+    MongoDB  -> mongomock            S3     -> moto
+    Tavily   -> FakeTavilyClient     OpenAI -> FakeChatModel / FakeEmbeddings
+
+Every stand-in sleeps for a configurable injected latency and reports its time
+to the current request's StageRecorder, so benchmarks can break a request down
+into search / llm / embed / postgres / mongo / s3 / redis / app time.
+
+`install_fakes()` must run before `config`, `tools.*` or `services.*` are
+imported, because those modules read the environment at import time.
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import tempfile
+import threading
+import contextvars
+from typing import Dict, List, Any, Optional
+
+DEFAULT_DIM = 3072
+STAGES = ("search", "llm", "embed", "postgres", "mongo", "s3", "redis")
+
+
+# -----------------------------
+# Per-request stage accounting
+# -----------------------------
+class StageRecorder:
+    """
+    Exclusive per-stage timings for one request: time spent inside a nested
+    stage is not counted again in its parent, so stages add up to the total.
+
+    Stages entered on helper threads (the context is copied into them) are
+    recorded too; overlapping stages are each counted in full, so for fan-out
+    work the stage times measure busy time and may exceed the wall clock.
+    """
+
+    def __init__(self):
+        self.times_ms: Dict[str, float] = {}
+        self._stacks: Dict[int, List[List[Any]]] = {}
+        self._lock = threading.Lock()
+
+    def enter(self, stage: str):
+        stack = self._stacks.setdefault(threading.get_ident(), [])
+        stack.append([stage, time.perf_counter(), 0.0])
+
+    def exit(self):
+        stack = self._stacks[threading.get_ident()]
+        stage, start, child = stack.pop()
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.times_ms[stage] = self.times_ms.get(stage, 0.0) + elapsed - child
+        if stack:
+            stack[-1][2] += elapsed
+
+
+_recorder: contextvars.ContextVar[Optional[StageRecorder]] = contextvars.ContextVar("bench_recorder", default=None)
+
+
+def start_recording() -> StageRecorder:
+    recorder = StageRecorder()
+    _recorder.set(recorder)
+    return recorder
+
+
+class stage:
+    """Context manager: time a block as `name` and inject the stage's latency."""
+
+    latency_ms: Dict[str, float] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        recorder = _recorder.get()
+        if recorder:
+            recorder.enter(self.name)
+        delay = self.latency_ms.get(self.name, 0.0)
+        if delay:
+            time.sleep(delay / 1000.0)
+        return self
+
+    def __exit__(self, *exc):
+        recorder = _recorder.get()
+        if recorder:
+            recorder.exit()
+        return False
+
+
+# -----------------------------
+# Generic timing proxies
+# -----------------------------
+class TimedIterator:
+    def __init__(self, target, stage_name: str):
+        self._target = target
+        self._stage = stage_name
+        self._iter = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iter is None:
+            self._iter = iter(self._target)
+        recorder = _recorder.get()
+        if recorder:
+            recorder.enter(self._stage)
+        try:
+            return next(self._iter)
+        finally:
+            if recorder:
+                recorder.exit()
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+class Timed:
+    """
+    Wraps a client object so every method call is timed as `stage_name`.
+    Returned cursors are wrapped too, so iterating a Mongo cursor counts as
+    Mongo time rather than application time.
+    """
+
+    def __init__(self, target, stage_name: str):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_stage", stage_name)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            with stage(self._stage):
+                result = attr(*args, **kwargs)
+            if hasattr(result, "__next__") and not isinstance(result, (str, bytes, dict, list)):
+                return TimedIterator(result, self._stage)
+            return result
+
+        return wrapper
+
+    def __getitem__(self, key):
+        return Timed(self._target[key], self._stage)
+
+
+# -----------------------------
+# Fake LLM / embedder / search
+# -----------------------------
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _prompt_text(value) -> str:
+    if hasattr(value, "to_messages"):
+        value = value.to_messages()
+    if isinstance(value, (list, tuple)):
+        return "\n".join(getattr(m, "content", str(m)) for m in value)
+    return getattr(value, "content", str(value))
+
+
+class FakeChatModel:
+    """
+    Stands in for langchain_openai.ChatOpenAI. Works both as `llm(messages)`,
+    `llm.invoke(messages)` and as the right-hand side of `prompt | llm`.
+    Responses are derived from the prompt hash, so runs are reproducible.
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.0, **kwargs):
+        self.model_name = model
+        self.temperature = temperature
+
+    def __call__(self, value, *args, **kwargs):
+        return self.invoke(value)
+
+    def invoke(self, value, *args, **kwargs):
+        from langchain_core.messages import AIMessage
+
+        prompt = _prompt_text(value)
+        with stage("llm"):
+            h = _digest(prompt)
+            if "Summarize" in prompt:
+                body = {
+                    "summary": f"Synthetic summary {h[:16]} of {len(prompt)} characters of research text.",
+                    "tags": [f"tag-{h[i:i + 4]}" for i in range(0, 24, 4)],
+                }
+            else:
+                body = {
+                    "insights": f"Synthetic insight {h[:16]}.",
+                    "contradictions": [f"contradiction-{h[16:22]}"],
+                    "missing_points": [f"missing-{h[22:28]}"],
+                    "related_summary": f"related-{h[28:34]}",
+                }
+            content = json.dumps(body)
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return AIMessage(
+            content=content,
+            response_metadata={
+                "model_name": self.model_name,
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+        )
+
+
+def fake_vector(text: str, dim: int = DEFAULT_DIM) -> List[float]:
+    rng = random.Random(_digest(text))
+    return [rng.gauss(0.0, 1.0) for _ in range(dim)]
+
+
+class FakeEmbeddings:
+    """Stands in for langchain_openai.OpenAIEmbeddings."""
+
+    dim = DEFAULT_DIM
+
+    def __init__(self, model: str = "text-embedding-3-large", **kwargs):
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with stage("embed"):
+            return [fake_vector(t, self.dim) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeTavilyClient:
+    """Stands in for tavily.TavilyClient; returns Tavily's response shape."""
+
+    def __init__(self, api_key: str = "", **kwargs):
+        self.api_key = api_key
+
+    def search(self, query: str, max_results: int = 5, **kwargs) -> Dict[str, Any]:
+        with stage("search"):
+            h = _digest(query.lower())
+            results = [
+                {
+                    "title": f"{query} — source {i + 1}",
+                    "url": f"https://example.org/{h[:8]}/{i + 1}",
+                    "content": f"Snippet {i + 1} about {query}: " + h[i:i + 32],
+                    "score": round(1.0 - i * 0.05, 3),
+                }
+                for i in range(max_results)
+            ]
+            return {"query": query, "results": results}
+
+
+# -----------------------------
+# Install everything
+# -----------------------------
+def _instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        stage("postgres").__enter__()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stage("postgres").__exit__(None, None, None)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        stage("postgres").__exit__(None, None, None)
+
+
+def install_fakes(latency_ms: Optional[Dict[str, float]] = None, workdir: Optional[str] = None, dim: int = DEFAULT_DIM) -> Dict[str, Any]:
+    """
+    Point the app at local stand-ins. Returns a dict with the handles a
+    benchmark needs: `SessionLocal`, `mongo_db`, `redis`, `s3`, `workdir`.
+    """
+    stage.latency_ms = dict(latency_ms or {})
+    FakeEmbeddings.dim = dim
+    workdir = workdir or tempfile.mkdtemp(prefix="bench-")
+
+    # Override (not setdefault): a developer's .env must never leak real
+    # services into a benchmark run.
+    os.environ.update({
+        "POSTGRES_URI": f"sqlite:///{os.path.join(workdir, 'research.db')}",
+        "MONGO_URI": "mongodb://localhost:27017",
+        "MONGO_DB_NAME": "bench_db",
+        "REDIS_URI": "redis://localhost:6379/0",
+        "AWS_ACCESS_KEY": "testing",
+        "AWS_SECRET_KEY": "testing",
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_S3_BUCKET": "bench-research",
+        "S3_CACHE_DIR": os.path.join(workdir, "s3-cache"),
+        "OPENAI_API_KEY": "sk-bench",
+        "TAVILY_API_KEY": "bench",
+    })
+
+    import fakeredis
+    import mongomock
+    import tavily
+    import langchain_openai
+    from moto import mock_aws
+
+    langchain_openai.ChatOpenAI = FakeChatModel
+    langchain_openai.OpenAIEmbeddings = FakeEmbeddings
+    tavily.TavilyClient = FakeTavilyClient
+
+    aws = mock_aws()
+    aws.start()
+
+    import config
+    from models.research import Base
+
+    engine = config.get_engine()
+    Base.metadata.create_all(bind=engine)
+    _instrument_engine(engine)
+
+    mongo_client = mongomock.MongoClient()
+    config.set_client("mongo_client", mongo_client)
+    config.set_client("mongo_db", Timed(mongo_client[config.settings.MONGO_DB_NAME], "mongo"))
+    config.set_client("redis_client", Timed(fakeredis.FakeRedis(), "redis"))
+    s3 = config.get_s3_client()
+    s3.create_bucket(Bucket=config.settings.AWS_S3_BUCKET)
+    config.set_client("s3_client", Timed(s3, "s3"))
+
+    return {
+        "SessionLocal": config.get_session_factory(),
+        "mongo_db": config.get_mongo_db(),
+        "redis": config.get_redis_client(),
+        "s3": config.get_s3_client(),
+        "workdir": workdir,
+        "aws": aws,
+    }
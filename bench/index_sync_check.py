@@ -0,0 +1,416 @@
+"""
+Behavioural checks for tools/index_sync.py against mongomock and a real
+snapshot directory: every scenario compares the sync's results with an exact
+scan of the collection, so a regression in the change-stream / polling
+handoff, the overlap window, rebasing or tombstones shows up as a mismatch.
+
+    python -m bench.index_sync_check
+    python -m bench.index_sync_check --only rebase,tombstones -v
+
+mongomock has no change streams, so the change-stream scenarios drive the
+sync through a scripted stream with the same try_next()/close() interface.
+Exits non-zero if any scenario fails.
+"""
+import sys
+import time
+import queue
+import shutil
+import datetime
+import tempfile
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from bench.checks import check, wait_for, main as run_checks
+
+DIM = 16
+TOP_K = 5
+SEED = 7
+FAST = dict(batch_size=50, flush_seconds=0.05, poll_seconds=0.05, reconcile_seconds=3600.0, overlap_seconds=5.0)
+
+
+# -----------------------------
+# Fixture: collection + snapshot
+# -----------------------------
+class Fixture:
+    def __init__(self, seed: int):
+        import mongomock
+
+        from config import settings
+
+        self.rng = np.random.default_rng(seed)
+        self.coll = mongomock.MongoClient()["index_sync_check"]["embeddings"]
+        self.index_dir = tempfile.mkdtemp(prefix="index-sync-check-")
+        self.next_research_id = 1
+        self.syncs: List[Any] = []
+        settings.VECTOR_INDEX_DIR = self.index_dir
+        settings.VECTOR_INDEX_RELOAD_SECONDS = 0.0  # see every new manifest immediately
+
+    def doc(self, _id=None) -> Dict[str, Any]:
+        vec = self.rng.standard_normal(DIM).astype(np.float32)
+        doc = {"research_id": self.next_research_id, "topic": f"topic {self.next_research_id}", "embedding": vec.tolist()}
+        if _id is not None:
+            doc["_id"] = _id
+        self.next_research_id += 1
+        return doc
+
+    def insert(self, count: int = 1, **kwargs) -> List[Dict[str, Any]]:
+        docs = [self.doc(**kwargs) for _ in range(count)]
+        self.coll.insert_many(docs)
+        return docs
+
+    def snapshot(self, full: bool = False) -> Dict[str, Any]:
+        from tools.vector_index import build_snapshot
+
+        # The cutoff has one-second resolution: start a new second so everything
+        # inserted so far is covered and the watermark moves past the last one.
+        time.sleep(1.01 - time.time() % 1)
+        return build_snapshot(self.coll, self.index_dir, full=full, lag_seconds=0)
+
+    def sync(self, stream=None, **overrides):
+        from tools.index_sync import IndexSync
+
+        sync = IndexSync(self.coll, **dict(FAST, **overrides))
+        if stream is not None:
+            sync._open_stream = lambda: stream
+        self.syncs.append(sync)
+        return sync
+
+    def queries(self, count: int = 8) -> np.ndarray:
+        return self.rng.standard_normal((count, DIM)).astype(np.float32)
+
+    def exact(self, queries: np.ndarray) -> List[List[str]]:
+        docs = list(self.coll.find({}))
+        ids = [str(d["_id"]) for d in docs]
+        vectors = np.array([d["embedding"] for d in docs], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        sims = q @ vectors.T
+        return [[ids[i] for i in np.argsort(-row)[:TOP_K]] for row in sims]
+
+    def assert_matches(self, sync, what: str):
+        queries = self.queries()
+        got = [[r["_id"] for r in found] for found in sync.search_many(queries, top_k=TOP_K)]
+        check(got == self.exact(queries), f"{what}: sync results differ from an exact scan")
+
+    def close(self):
+        for sync in self.syncs:
+            sync.stop()
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+
+
+class ScriptedStream:
+    """Stands in for a pymongo change stream; feed it events or exceptions."""
+
+    def __init__(self):
+        self.events: "queue.Queue[Any]" = queue.Queue()
+        self.closed = False
+
+    def insert(self, doc: Dict[str, Any]):
+        self.events.put({"operationType": "insert", "fullDocument": doc, "clusterTime": None})
+
+    def delete(self, _id):
+        self.events.put({"operationType": "delete", "documentKey": {"_id": _id}, "clusterTime": None})
+
+    def fail(self, error: Exception):
+        self.events.put(error)
+
+    def try_next(self):
+        try:
+            event = self.events.get(timeout=0.02)
+        except queue.Empty:
+            return None
+        if isinstance(event, Exception):
+            raise event
+        return event
+
+    def close(self):
+        self.closed = True
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenario_catch_up(fx: Fixture):
+    """Polling catch-up covers exactly the documents past the snapshot."""
+    fx.insert(200)
+    fx.snapshot()
+    fx.insert(30)
+    sync = fx.sync()
+    sync.start()
+    wait_for(sync.ready.is_set, "initial catch-up")
+    check(sync.mode == "polling", f"mongomock has no change streams, mode is {sync.mode}")
+    fx.assert_matches(sync, "after catch-up")
+
+    fx.insert(20)
+    wait_for(lambda: sync.inserts_applied >= 50, "polled inserts")
+    fx.assert_matches(sync, "after polled inserts")
+
+
+def scenario_overlap(fx: Fixture):
+    """An ObjectId minted slightly in the past is still picked up by the overlap window."""
+    from bson import ObjectId
+
+    fx.insert(50)
+    fx.snapshot()
+    sync = fx.sync(overlap_seconds=1.0)
+    sync.start()
+    wait_for(sync.ready.is_set, "initial catch-up")
+    time.sleep(2.1)  # move past the watermark, so polls start from the overlap window
+    fx.insert(5)
+    wait_for(lambda: sync.inserts_applied >= 5, "polled inserts")
+
+    late_id = ObjectId.from_datetime(sync._max_seen.generation_time - datetime.timedelta(seconds=1))
+    check(sync._state.base_watermark < str(late_id) < str(sync._max_seen), "late id must sort between the watermark and what was applied")
+    fx.insert(1, _id=late_id)
+    wait_for(lambda: sync.inserts_applied >= 6, "late insert inside the overlap window")
+    check(sync._state.rows == sync.inserts_applied, "overlap re-reads must not duplicate delta rows")
+    fx.assert_matches(sync, "after late insert")
+
+
+def scenario_reconcile_deletes(fx: Fixture):
+    """Polling mode finds deletes of snapshot and delta rows by reconciling _ids."""
+    docs = fx.insert(100)
+    fx.snapshot()
+    delta = fx.insert(10)
+    sync = fx.sync()
+    sync.start()
+    wait_for(sync.ready.is_set, "initial catch-up")
+
+    gone = [docs[3]["_id"], docs[40]["_id"], delta[2]["_id"]]
+    fx.coll.delete_many({"_id": {"$in": gone}})
+    sync.reconcile_seconds = 0.0
+    wait_for(lambda: len(sync._state.tombstones) >= 3, "tombstones from reconcile")
+    fx.assert_matches(sync, "after deletes")
+
+
+class CountingCollection:
+    """Wraps a collection and counts the documents find() hands back."""
+
+    def __init__(self, coll):
+        self.coll = coll
+        self.docs_read = 0
+        self.counts = 0
+
+    def find(self, *args, **kwargs):
+        return CountingCursor(self, self.coll.find(*args, **kwargs))
+
+    def count_documents(self, *args, **kwargs):
+        self.counts += 1
+        return self.coll.count_documents(*args, **kwargs)
+
+
+class CountingCursor:
+    def __init__(self, owner: CountingCollection, cursor):
+        self.owner = owner
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def __iter__(self):
+        for doc in self.cursor:
+            self.owner.docs_read += 1
+            yield doc
+
+
+def scenario_reconcile_cost(fx: Fixture):
+    """Reconcile finds snapshot deletes by bisecting counts, without reading every _id."""
+    docs = fx.insert(3000)
+    fx.snapshot()
+    fx.insert(10)
+    sync = fx.sync()
+    counting = CountingCollection(fx.coll)
+    sync.coll = counting
+    sync._rebase()
+    sync._poll_once()
+
+    counting.docs_read = 0
+    sync._reconcile()
+    check(not sync._state.tombstones, "reconcile without deletes created tombstones")
+    check(counting.docs_read <= 10, f"reconcile without deletes read {counting.docs_read} documents")
+
+    gone = [docs[5]["_id"], docs[1700]["_id"], docs[2999]["_id"]]
+    fx.coll.delete_many({"_id": {"$in": gone}})
+    counting.docs_read = counting.counts = 0
+    sync._reconcile()
+    check(sync._state.tombstones == {str(i) for i in gone}, f"tombstones {sorted(sync._state.tombstones)}")
+    check(counting.docs_read < 3000 // 2, f"reconcile read {counting.docs_read} documents to find 3 deletes")
+    fx.assert_matches(sync, "after bisected reconcile")
+
+    counting.docs_read = 0
+    sync._reconcile()
+    check(counting.docs_read <= 10, f"tombstoned rows re-read: {counting.docs_read} documents")
+
+
+def scenario_rebase(fx: Fixture):
+    """A newer snapshot drops the delta rows it covers without changing results."""
+    fx.insert(100)
+    fx.snapshot()
+    fx.insert(40)
+    sync = fx.sync()
+    sync.start()
+    wait_for(sync.ready.is_set, "initial catch-up")
+    check(sync._state.rows == 40, f"expected 40 delta rows, got {sync._state.rows}")
+
+    manifest = fx.snapshot()
+    wait_for(lambda: sync._state.base_watermark == manifest["watermark"], "rebase onto the new snapshot")
+    check(sync._state.rows == 0, f"rebase left {sync._state.rows} covered delta rows")
+    fx.assert_matches(sync, "after rebase")
+
+    fx.insert(5)
+    wait_for(lambda: sync._state.rows == 5, "inserts after rebase")
+    fx.assert_matches(sync, "after inserts past the new watermark")
+
+
+def scenario_tombstones(fx: Fixture):
+    """Tombstones outlive incremental snapshots but are pruned once a full rebuild drops the rows."""
+    docs = fx.insert(100)
+    fx.snapshot()
+    sync = fx.sync()
+    sync.start()
+    wait_for(sync.ready.is_set, "initial catch-up")
+
+    fx.coll.delete_many({"_id": {"$in": [docs[1]["_id"], docs[2]["_id"]]}})
+    sync.reconcile_seconds = 0.0
+    wait_for(lambda: len(sync._state.tombstones) == 2, "tombstones from reconcile")
+    sync.reconcile_seconds = 3600.0
+
+    fx.insert(3)
+    manifest = fx.snapshot()  # incremental: the deleted rows are still in it
+    wait_for(lambda: sync._state.base_watermark == manifest["watermark"], "rebase onto incremental snapshot")
+    check(len(sync._state.tombstones) == 2, "tombstones for rows still in the snapshot must stay")
+    fx.assert_matches(sync, "after incremental snapshot")
+
+    manifest = fx.snapshot(full=True)
+    wait_for(lambda: sync._state.base_watermark == manifest["watermark"], "rebase onto full rebuild")
+    check(not sync._state.tombstones, f"{len(sync._state.tombstones)} tombstones survived a full rebuild")
+    fx.assert_matches(sync, "after full rebuild")
+
+
+def scenario_change_stream(fx: Fixture):
+    """Stream events are applied in batches, deduplicated against catch-up, and deletes hide rows."""
+    docs = fx.insert(60)
+    fx.snapshot()
+    early = fx.insert(5)
+    stream = ScriptedStream()
+    sync = fx.sync(stream=stream)
+    sync.start()
+    wait_for(sync.ready.is_set, "initial catch-up")
+    wait_for(lambda: sync.mode == "change_stream", "change stream mode")
+
+    stream.insert(early[0])  # already applied by catch-up
+    for doc in fx.insert(10):
+        stream.insert(doc)
+    fx.coll.delete_one({"_id": docs[7]["_id"]})
+    stream.delete(docs[7]["_id"])
+    wait_for(lambda: sync.inserts_applied == 15 and sync.deletes_applied == 1, "stream events applied")
+    check(sync._state.rows == 15, f"duplicate delta rows: {sync._state.rows}")
+    fx.assert_matches(sync, "after stream events")
+
+
+def scenario_stream_handoff(fx: Fixture):
+    """When the stream fails, polling takes over and picks up what the stream never delivered."""
+    fx.insert(60)
+    fx.snapshot()
+    stream = ScriptedStream()
+    sync = fx.sync(stream=stream)
+    sync.start()
+    wait_for(lambda: sync.mode == "change_stream", "change stream mode")
+
+    fx.insert(4)  # written while the stream is about to die; never delivered
+    stream.fail(RuntimeError("cursor killed"))
+    wait_for(lambda: sync.mode == "polling", "fallback to polling")
+    check(stream.closed, "failed stream was not closed")
+    wait_for(lambda: sync.inserts_applied == 4, "polling catches up after the handoff")
+    fx.assert_matches(sync, "after handoff")
+
+
+def scenario_crash(fx: Fixture):
+    """A sync whose thread dies is no longer handed to readers."""
+    import tools.index_sync as index_sync
+
+    fx.insert(20)
+    fx.snapshot()
+    stream = ScriptedStream()
+    sync = fx.sync(stream=stream)
+    index_sync._sync = sync
+    try:
+        sync.start()
+        wait_for(lambda: index_sync.get_index_sync() is sync, "sync handed to readers")
+        stream.insert({"embedding": [1.0] * DIM})  # no _id: _apply raises
+        wait_for(lambda: sync.mode == "stopped", "thread stops")
+        check(index_sync.get_index_sync() is None, "dead sync still returned by get_index_sync()")
+        check(index_sync.get_index_sync(include_unready=True) is sync, "dead sync hidden from diagnostics")
+    finally:
+        index_sync._sync = None
+
+
+def scenario_needs_snapshot(fx: Fixture):
+    """Without a snapshot the sync never loads the collection into memory."""
+    import tools.index_sync as index_sync
+    from config import settings
+
+    fx.insert(30)
+    sync = fx.sync()
+    sync.start()
+    wait_for(lambda: sync.mode == "waiting_for_snapshot", "waiting for a snapshot")
+    time.sleep(0.2)
+    check(not sync.ready.is_set() and sync._state.rows == 0, "sync caught up without a snapshot")
+
+    fx.snapshot()
+    wait_for(sync.ready.is_set, "catch-up once a snapshot exists")
+    fx.assert_matches(sync, "after the first snapshot")
+
+    settings.VECTOR_INDEX_DIR = None
+    try:
+        check(index_sync.start_index_sync(fx.coll) is None, "started without VECTOR_INDEX_DIR")
+    finally:
+        settings.VECTOR_INDEX_DIR = fx.index_dir
+
+
+def scenario_chunk_merging(fx: Fixture):
+    """Many small batches keep O(log n) chunks instead of recopying the whole delta."""
+    sync = fx.sync()
+    docs = fx.insert(1000)
+    for doc in docs:
+        sync._apply([(doc, None)], [])
+    chunks = len(sync._state.chunks)
+    check(sync._state.rows == 1000, f"expected 1000 delta rows, got {sync._state.rows}")
+    check(chunks <= 12, f"{chunks} chunks for 1000 single-row batches")
+    fx.assert_matches(sync, "after many small batches")
+
+
+SCENARIOS: Dict[str, Callable[[Fixture], None]] = {
+    "catch_up": scenario_catch_up,
+    "overlap": scenario_overlap,
+    "reconcile_deletes": scenario_reconcile_deletes,
+    "reconcile_cost": scenario_reconcile_cost,
+    "rebase": scenario_rebase,
+    "tombstones": scenario_tombstones,
+    "change_stream": scenario_change_stream,
+    "stream_handoff": scenario_stream_handoff,
+    "crash": scenario_crash,
+    "needs_snapshot": scenario_needs_snapshot,
+    "chunk_merging": scenario_chunk_merging,
+}
+
+
+def _with_fixture(scenario: Callable[[Fixture], None]) -> Callable[[], None]:
+    def run():
+        fx = Fixture(SEED)
+        try:
+            scenario(fx)
+        finally:
+            fx.close()
+    return run
+
+
+def main(argv=None) -> int:
+    scenarios = {name: _with_fixture(fn) for name, fn in SCENARIOS.items()}
+    return run_checks(scenarios, "Behavioural checks for the incremental index sync.", argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
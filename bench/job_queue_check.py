@@ -0,0 +1,205 @@
+"""
+Behavioural checks for the research job queue (tools/job_queue.py) and the
+worker (worker.py), against fakeredis and the rest of the bench fakes:
+retries with backoff, crash recovery through heartbeats, and resuming a
+retried job without duplicating its side effects.
+
+    python -m bench.job_queue_check
+    python -m bench.job_queue_check --only stale_heartbeat -v
+
+Exits non-zero if any scenario fails.
+"""
+import sys
+import time
+from typing import Any, Dict
+
+from bench.checks import check, main as run_checks
+
+handles: Dict[str, Any] = {}
+DEFAULTS = {"JOB_QUEUE_MAX_LENGTH": 1000, "JOB_MAX_ATTEMPTS": 3, "JOB_RETRY_BACKOFF_SECONDS": 0.0}
+
+
+def setup():
+    from bench.fakes import install_fakes
+
+    handles.update(install_fakes())
+
+
+def reset():
+    import config
+    from tools import llm_cache
+
+    handles["redis"].flushdb()
+    llm_cache.clear_local()
+    for name, value in DEFAULTS.items():
+        setattr(config.settings, name, value)
+
+
+def _claim_next():
+    from tools import job_queue
+
+    job_queue.promote_delayed()
+    return job_queue.claim(timeout=0.1)
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenario_lifecycle():
+    """A job moves queued -> running -> succeeded and leaves the processing list."""
+    from tools import job_queue
+
+    job = job_queue.enqueue_research("lifecycle")
+    check(job_queue.queue_depth()["queued"] == 1, "job not queued")
+    claimed = job_queue.claim(timeout=0.1)
+    check(claimed["id"] == job["id"] and claimed["status"] == job_queue.RUNNING, f"claimed {claimed}")
+    check(claimed["attempts"] == 1, f"attempts {claimed['attempts']}")
+    job_queue.complete(job["id"], {"ok": True})
+    done = job_queue.get_job(job["id"])
+    check(done["status"] == job_queue.SUCCEEDED and done["result"] == {"ok": True}, f"finished as {done}")
+    check(job_queue.queue_depth() == {"queued": 0, "processing": 0, "delayed": 0}, f"depth {job_queue.queue_depth()}")
+
+
+def scenario_cached_result():
+    """A cached result is recorded as succeeded and never reaches the queue."""
+    from tools import job_queue
+
+    job = job_queue.enqueue_research("cached", cached_result={"id": 1})
+    check(job["status"] == job_queue.SUCCEEDED, f"status {job['status']}")
+    check(job_queue.queue_depth()["queued"] == 0, "cached job was queued")
+
+
+def scenario_queue_full():
+    """enqueue raises QueueFull at JOB_QUEUE_MAX_LENGTH."""
+    import config
+    from tools import job_queue
+
+    config.settings.JOB_QUEUE_MAX_LENGTH = 2
+    job_queue.enqueue_research("a")
+    job_queue.enqueue_research("b")
+    try:
+        job_queue.enqueue_research("c")
+    except job_queue.QueueFull:
+        return
+    raise AssertionError("third job accepted by a queue of 2")
+
+
+def scenario_retry_backoff():
+    """Retryable failures wait in the delayed set, then run again until JOB_MAX_ATTEMPTS."""
+    import config
+    from tools import job_queue
+
+    config.settings.JOB_RETRY_BACKOFF_SECONDS = 0.2
+    job = job_queue.enqueue_research("flaky")
+    job_queue.fail(job_queue.claim(timeout=0.1)["id"], "boom")
+    check(job_queue.get_job(job["id"])["status"] == job_queue.RETRYING, "not retrying")
+    check(job_queue.promote_delayed() == 0, "promoted before the backoff elapsed")
+    time.sleep(0.25)
+    check(_claim_next()["attempts"] == 2, "second attempt not claimed")
+    job_queue.fail(job["id"], "boom")
+    time.sleep(0.45)  # backoff doubles
+    check(_claim_next()["attempts"] == 3, "third attempt not claimed")
+    job_queue.fail(job["id"], "boom")
+    final = job_queue.get_job(job["id"])
+    check(final["status"] == job_queue.FAILED and final["error"] == "boom", f"after max attempts: {final}")
+    check(job_queue.queue_depth() == {"queued": 0, "processing": 0, "delayed": 0}, f"depth {job_queue.queue_depth()}")
+
+
+def scenario_non_retryable():
+    """A non-retryable failure is final on the first attempt."""
+    from tools import job_queue
+
+    job = job_queue.enqueue_research("bad input")
+    job_queue.fail(job_queue.claim(timeout=0.1)["id"], "400", retryable=False)
+    check(job_queue.get_job(job["id"])["status"] == job_queue.FAILED, "non-retryable job retried")
+
+
+def scenario_stale_heartbeat():
+    """Jobs whose worker stopped heart-beating are retried; live and mid-claim jobs are not."""
+    from tools import job_queue
+
+    stale, live = job_queue.enqueue_research("stale"), job_queue.enqueue_research("live")
+    job_queue.claim(timeout=0.1)
+    job_queue.claim(timeout=0.1)
+    handles["redis"].hset(f"job:{stale['id']}", "heartbeat", time.time() - 1000)
+    job_queue.heartbeat(live["id"])
+    check(job_queue.requeue_stale(60) == 1, "expected exactly one stale job")
+    check(job_queue.get_job(stale["id"])["status"] == job_queue.RETRYING, "stale job not retried")
+    check(job_queue.get_job(live["id"])["status"] == job_queue.RUNNING, "live job disturbed")
+
+
+def scenario_retry_not_failed_mid_claim():
+    """The previous attempt's heartbeat must not make a freshly moved retry look stale."""
+    from tools import job_queue
+
+    job = job_queue.enqueue_research("retry")
+    job_queue.claim(timeout=0.1)
+    handles["redis"].hset(f"job:{job['id']}", "heartbeat", time.time() - 1000)
+    job_queue.fail(job["id"], "boom")
+    job_queue.promote_delayed()
+    # claim() between BLMOVE and HSET: the id is in processing, no new heartbeat yet.
+    handles["redis"].blmove("jobs:research:queue", "jobs:research:processing", 0.1, "RIGHT", "LEFT")
+    check(job_queue.requeue_stale(60) == 0, "retry failed again while being claimed")
+    current = job_queue.get_job(job["id"])
+    check(current["attempts"] == 1 and current["status"] == job_queue.QUEUED, f"state {current}")
+
+
+def scenario_resume_after_failure():
+    """A job retried after its Research row was committed does not duplicate row, object or embedding."""
+    from bench.fakes import FakeEmbeddings
+    from models.research import Research
+    from tools import job_queue
+    from worker import Worker
+
+    original = FakeEmbeddings.embed_documents
+    calls = {"n": 0}
+
+    def fail_once(self, texts):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("embedding unavailable")
+        return original(self, texts)
+
+    FakeEmbeddings.embed_documents = fail_once
+    try:
+        job = job_queue.enqueue_research("resumable topic")
+        worker = Worker(concurrency=1)
+        for _ in range(3):
+            claimed = _claim_next()
+            if claimed:
+                worker.process(claimed)
+    finally:
+        FakeEmbeddings.embed_documents = original
+
+    final = job_queue.get_job(job["id"])
+    check(final["status"] == job_queue.SUCCEEDED, f"job ended {final['status']}: {final['error']}")
+    check(final["attempts"] == 2 and final["research_id"] is not None, f"attempts {final['attempts']}, research_id {final['research_id']}")
+    db = handles["SessionLocal"]()
+    try:
+        rows = db.query(Research).filter_by(topic="resumable topic").count()
+    finally:
+        db.close()
+    embeddings = handles["mongo_db"]["embeddings"].count_documents({"research_id": final["research_id"]})
+    objects = handles["s3"].list_objects_v2(Bucket="bench-research", Prefix=f"research/{final['research_id']}_").get("KeyCount")
+    check((rows, embeddings, objects) == (1, 1, 1), f"rows {rows}, embeddings {embeddings}, objects {objects}")
+    check(final["result"]["s3_url"], "s3_url missing from the result")
+
+
+SCENARIOS = {
+    "lifecycle": scenario_lifecycle,
+    "cached_result": scenario_cached_result,
+    "queue_full": scenario_queue_full,
+    "retry_backoff": scenario_retry_backoff,
+    "non_retryable": scenario_non_retryable,
+    "stale_heartbeat": scenario_stale_heartbeat,
+    "retry_not_failed_mid_claim": scenario_retry_not_failed_mid_claim,
+    "resume_after_failure": scenario_resume_after_failure,
+}
+
+
+def main(argv=None) -> int:
+    return run_checks(SCENARIOS, "Behavioural checks for the research job queue.", argv, setup=setup, before_each=reset)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Offline benchmark for the /chain/research and /graph/analyze pipelines.
+
+Replays a JSONL workload (one request per line) against the pipelines with
+every backend replaced by the in-process fakes in `bench/fakes.py`, then
+reports throughput, p50/p99 latency and a per-stage breakdown, and compares
+the result with a stored baseline.
+
+    python -m bench.pipelines
+    python -m bench.pipelines --latency llm=400,embed=80,search=250 --concurrency 8
+    python -m bench.pipelines --save-baseline         # record a new baseline
+
+Workload lines look like:
+
+    {"route": "/chain/research", "body": {"topic": "..."}}
+    {"route": "/graph/analyze", "body": {"text": "..."}}
+
+Exit status is 1 when any route regresses by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+from bench import stats
+from bench.fakes import install_fakes, start_recording, STAGES, DEFAULT_DIM
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORKLOAD = os.path.join(HERE, "requests.jsonl")
+DEFAULT_BASELINE = os.path.join(HERE, "baselines", "pipelines.json")
+ROUTES = ("/chain/research", "/graph/analyze")
+
+# Scaled-down but proportionate stand-in for production latencies, so the
+# benchmark exercises overlap and queuing rather than only Python overhead.
+DEFAULT_LATENCY_MS = {
+    "search": 30.0,
+    "llm": 60.0,
+    "embed": 15.0,
+    "postgres": 1.0,
+    "mongo": 1.0,
+    "s3": 5.0,
+    "redis": 0.2,
+}
+
+
+def parse_latency(spec: str) -> Dict[str, float]:
+    latency = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        if name not in STAGES:
+            raise argparse.ArgumentTypeError(f"unknown stage '{name}', expected one of {', '.join(STAGES)}")
+        latency[name] = float(value)
+    return latency
+
+
+def load_workload(path: str) -> List[Dict[str, Any]]:
+    workload = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if item.get("route") not in ROUTES:
+                raise ValueError(f"Unsupported route in workload: {item.get('route')}")
+            workload.append(item)
+    return workload
+
+
+class Runner:
+    def __init__(self, handles: Dict[str, Any]):
+        # Imported here: the services must see the fakes installed first.
+        from schemas.research_schema import ResearchInput
+        from services.research_service import run_research_pipeline
+        from services.analyze_service import run_analyze_pipeline
+        from main import import_heavy_modules
+
+        # Same as the app's startup warm-up: deferred imports are not request cost.
+        import_heavy_modules()
+
+        self.ResearchInput = ResearchInput
+        self.run_research_pipeline = run_research_pipeline
+        self.run_analyze_pipeline = run_analyze_pipeline
+        self.SessionLocal = handles["SessionLocal"]
+        self.mongo_db = handles["mongo_db"]
+
+    def run_one(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        recorder = start_recording()
+        db = self.SessionLocal()
+        start = time.perf_counter()
+        error = None
+        try:
+            if item["route"] == "/chain/research":
+                result = self.run_research_pipeline(self.ResearchInput(**item["body"]), db, self.mongo_db)
+            else:
+                result = self.run_analyze_pipeline(item["body"]["text"], db, self.mongo_db)
+            cached = bool(result.get("cached"))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            cached = False
+        finally:
+            db.close()
+        total_ms = (time.perf_counter() - start) * 1000
+        stages = dict(recorder.times_ms)
+        stages["app"] = max(0.0, total_ms - sum(stages.values()))
+        return {"route": item["route"], "latency_ms": total_ms, "stages": stages, "cached": cached, "error": error}
+
+
+def run(workload: List[Dict[str, Any]], handles: Dict[str, Any], iterations: int, concurrency: int, keep_cache: bool = False) -> Dict[str, Any]:
+    from tools import llm_cache
+
+    runner = Runner(handles)
+    samples: List[Dict[str, Any]] = []
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        for _ in range(iterations):
+            # Each pass replays the same mix of cold requests and repeats,
+            # instead of later passes being served entirely from Redis.
+            if not keep_cache:
+                handles["redis"].flushdb()
+                llm_cache.clear_local()
+            samples.extend(pool.map(runner.run_one, workload))
+    wall_s = time.perf_counter() - start
+
+    routes: Dict[str, Any] = {}
+    for route in ROUTES:
+        rs = [s for s in samples if s["route"] == route]
+        if not rs:
+            continue
+        ok = [s for s in rs if not s["error"]]
+        summary = stats.summarize([s["latency_ms"] for s in ok])
+        summary["errors"] = len(rs) - len(ok)
+        summary["cache_hits"] = sum(1 for s in ok if s["cached"])
+        stage_names = sorted({name for s in ok for name in s["stages"]})
+        summary["stages_mean_ms"] = {
+            name: round(sum(s["stages"].get(name, 0.0) for s in ok) / len(ok), 3) if ok else 0.0
+            for name in stage_names
+        }
+        routes[route] = summary
+
+    errors = sorted({s["error"] for s in samples if s["error"]})
+    return {
+        "requests": len(samples),
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(samples) / wall_s, 3) if wall_s else 0.0,
+        "routes": routes,
+        "errors": errors[:10],
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['requests']} requests in {report['wall_s']}s -> {report['throughput_rps']} req/s")
+    rows = [{"route": route, **{k: v for k, v in s.items() if k != "stages_mean_ms"}} for route, s in report["routes"].items()]
+    print(stats.format_table(rows, ["route", "count", "errors", "cache_hits", "mean_ms", "p50_ms", "p99_ms", "max_ms"]))
+
+    print("\nPer-stage mean (ms/request, exclusive):")
+    stage_rows = []
+    for route, s in report["routes"].items():
+        stage_rows.append({"route": route, **s["stages_mean_ms"]})
+    columns = ["route"] + sorted({k for r in stage_rows for k in r if k != "route"})
+    print(stats.format_table(stage_rows, columns))
+    for err in report["errors"]:
+        print(f"error: {err}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--iterations", type=int, default=5, help="replay the workload this many times")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=parse_latency, default={}, help="override injected latency, e.g. llm=400,embed=80")
+    parser.add_argument("--keep-cache", action="store_true", help="do not flush Redis between iterations")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="embedding dimension of the fake embedder")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 == 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore latency changes smaller than this")
+    parser.add_argument("--json", help="also write the full report to this path")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    latency = dict(DEFAULT_LATENCY_MS, **args.latency)
+    handles = install_fakes(latency_ms=latency, dim=args.dim)
+    workload = load_workload(args.workload)
+    result = run(workload, handles, args.iterations, args.concurrency, keep_cache=args.keep_cache)
+    report = {
+        "config": {
+            "workload": os.path.relpath(args.workload, HERE),
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "keep_cache": args.keep_cache,
+            "latency_ms": latency,
+            "dim": args.dim,
+        },
+        "environment": stats.environment(),
+        "result": result,
+    }
+    print_report(result)
+
+    if args.json:
+        stats.save_baseline(args.json, report)
+
+    if args.save_baseline:
+        stats.save_baseline(args.baseline, report)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    baseline = stats.load_baseline(args.baseline)
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+    if baseline.get("config") != report["config"]:
+        print("\nwarning: baseline was recorded with a different config; comparison may be meaningless")
+
+    current = dict(result["routes"], _overall={"throughput_rps": result["throughput_rps"]})
+    base = dict(baseline["result"]["routes"], _overall={"throughput_rps": baseline["result"]["throughput_rps"]})
+    rows = stats.compare(
+        current, base,
+        metrics=["p50_ms", "p99_ms", "throughput_rps"],
+        # p99 over a few dozen samples is close to the max, so it gets more slack.
+        tolerance={"p50_ms": args.tolerance, "p99_ms": args.tolerance * 2, "throughput_rps": args.tolerance},
+        min_delta=args.min_delta_ms,
+        higher_is_better=["throughput_rps"],
+    )
+    print("\nAgainst baseline:")
+    print(stats.format_table(rows, ["name", "metric", "baseline", "current", "change_pct", "regressed"]))
+    regressed = [r for r in rows if r["regressed"]]
+    if regressed or result["errors"]:
+        print(f"\nFAIL: {len(regressed)} regression(s), {len(result['errors'])} error type(s)")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Behavioural checks for the OpenAI admission limiter (tools/rate_limiter.py):
+priority ordering, the AIMD concurrency limit, the RPM / TPM sliding window,
+queue timeouts, and how limited_call retries and releases failed calls.
+
+The limiter talks to no backend, so no fakes are installed; scenarios build
+their own ModelLimiter (or use a fresh model name in the registry).
+
+    python -m bench.rate_limiter_check
+    python -m bench.rate_limiter_check --only aimd_failed -v
+
+Exits non-zero if any scenario fails.
+"""
+import sys
+import time
+import itertools
+import threading
+from typing import List
+
+from bench.checks import check, wait_for, main as run_checks
+
+_models = itertools.count()
+
+
+def _limiter(**overrides):
+    from tools.rate_limiter import ModelLimiter
+
+    options = dict(model="check", rpm=10_000, tpm=10_000_000, min_concurrency=1, max_concurrency=16,
+                   initial_concurrency=4, latency_target=1.0)
+    options.update(overrides)
+    return ModelLimiter(**options)
+
+
+def _fresh_model() -> str:
+    return f"check-model-{next(_models)}"
+
+
+class RateLimitError(Exception):
+    """Shaped like openai.RateLimitError: status 429 with a Retry-After header."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: str = "0.05"):
+        super().__init__("429 Too Many Requests")
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after}})()
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenario_priority_order():
+    """With the only slot busy, a later INTERACTIVE waiter is admitted before earlier BULK ones."""
+    from tools.rate_limiter import INTERACTIVE, BULK
+
+    limiter = _limiter(initial_concurrency=1, max_concurrency=1)
+    holder = limiter.acquire(1, BULK, timeout=1)
+    order: List[str] = []
+
+    def wait(name: str, priority: int):
+        ticket = limiter.acquire(1, priority, timeout=5)
+        order.append(name)
+        limiter.release(ticket, latency=0.0)
+
+    threads = [threading.Thread(target=wait, args=(f"bulk{i}", BULK)) for i in range(3)]
+    for t in threads:
+        t.start()
+    wait_for(lambda: sum(limiter.snapshot()["queued_by_priority"].values()) == 3, "bulk waiters queued")
+    interactive = threading.Thread(target=wait, args=("interactive", INTERACTIVE))
+    interactive.start()
+    wait_for(lambda: limiter.snapshot()["queued_by_priority"].get(INTERACTIVE) == 1, "interactive waiter queued")
+    limiter.release(holder, latency=0.0)
+    for t in threads + [interactive]:
+        t.join(5)
+    check(order[0] == "interactive", f"admission order {order}")
+    check(order[1:] == ["bulk0", "bulk1", "bulk2"], f"bulk waiters not FIFO: {order}")
+
+
+def scenario_concurrency_cap():
+    """No more than int(limit) calls are in flight at once."""
+    limiter = _limiter(initial_concurrency=3, max_concurrency=3)
+    peak = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def call():
+        ticket = limiter.acquire(1, 0, timeout=5)
+        with lock:
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+        time.sleep(0.02)
+        with lock:
+            peak["now"] -= 1
+        limiter.release(ticket, latency=0.02)
+
+    threads = [threading.Thread(target=call) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    check(peak["max"] == 3, f"peak in flight {peak['max']} with a limit of 3")
+    check(limiter.snapshot()["in_flight"] == 0, "slots leaked")
+
+
+def scenario_aimd_increase():
+    """Each fast success grows the limit by 1/limit, up to max_concurrency."""
+    limiter = _limiter(initial_concurrency=4, max_concurrency=5)
+    for _ in range(4):
+        limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.1)
+    # ~+1 per window of `limit` successes: 4 + 1/4 + 1/4.25 + 1/4.49 + 1/4.71
+    check(4.9 < limiter.limit < 5.0, f"limit {limiter.limit} after 4 successes at 4")
+    for _ in range(10):
+        limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.1)
+    check(limiter.limit == 5.0, f"limit {limiter.limit} above max_concurrency")
+
+
+def scenario_aimd_slow():
+    """A slow spell cuts the limit by x0.75 once per latency-target period, not once per call."""
+    limiter = _limiter(initial_concurrency=8, latency_target=0.2)
+    tickets = [limiter.acquire(1, 0, timeout=1) for _ in range(4)]
+    for ticket in tickets:
+        limiter.release(ticket, latency=0.5)
+    check(limiter.limit == 6.0, f"limit {limiter.limit}, expected one x0.75 cut from 8")
+    time.sleep(0.25)
+    limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.5)
+    check(limiter.limit == 4.5, f"limit {limiter.limit} after a second period")
+
+
+def scenario_aimd_throttled():
+    """Every 429 halves the limit (down to min_concurrency) and pauses admission for Retry-After."""
+    limiter = _limiter(initial_concurrency=8, min_concurrency=2)
+    limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.1, rate_limited=True, retry_after=0.2)
+    limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.1, rate_limited=True, retry_after=0.2)
+    # The second acquire waited out the first pause.
+    check(limiter.limit == 2.0, f"limit {limiter.limit} after two 429s from 8")
+    limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.1, rate_limited=True, retry_after=0.2)
+    check(limiter.limit == 2.0, f"limit {limiter.limit} below min_concurrency")
+    start = time.monotonic()
+    limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.1)
+    waited = time.monotonic() - start
+    check(waited >= 0.15, f"admitted {waited:.2f}s into a 0.2s pause")
+    check(limiter.snapshot()["throttled_429"] == 3, "429s not counted")
+
+
+def scenario_aimd_failed():
+    """Non-429 failures free their slot without growing (or shrinking) the limit."""
+    limiter = _limiter(initial_concurrency=4)
+    for _ in range(50):
+        limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.001, failed=True)
+    snap = limiter.snapshot()
+    check(snap["concurrency_limit"] == 4.0, f"limit {snap['concurrency_limit']} after 50 fast failures")
+    check(snap["failed"] == 50 and snap["in_flight"] == 0, f"snapshot {snap}")
+
+
+def scenario_rpm_window():
+    """Calls past the RPM budget wait until the oldest call leaves the window."""
+    from tools import rate_limiter
+
+    original = rate_limiter.WINDOW_SECONDS
+    rate_limiter.WINDOW_SECONDS = 0.3
+    try:
+        limiter = _limiter(rpm=2)
+        for _ in range(2):
+            limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.0)
+        start = time.monotonic()
+        limiter.release(limiter.acquire(1, 0, timeout=1), latency=0.0)
+        waited = time.monotonic() - start
+    finally:
+        rate_limiter.WINDOW_SECONDS = original
+    check(0.2 <= waited < 0.6, f"third call waited {waited:.2f}s on a 0.3s window")
+
+
+def scenario_tpm_window():
+    """The TPM budget counts actual usage reported at release, and lets one oversized call through."""
+    from tools import rate_limiter
+
+    original = rate_limiter.WINDOW_SECONDS
+    rate_limiter.WINDOW_SECONDS = 0.3
+    try:
+        limiter = _limiter(tpm=1000)
+        limiter.release(limiter.acquire(5000, 0, timeout=0.1), latency=0.0)  # empty window: admitted
+        time.sleep(0.35)
+        limiter.release(limiter.acquire(100, 0, timeout=1), latency=0.0, actual_tokens=950)
+        check(limiter.snapshot()["tokens_last_minute"] == 950, "actual usage not recorded")
+        start = time.monotonic()
+        limiter.release(limiter.acquire(100, 0, timeout=1), latency=0.0)
+        waited = time.monotonic() - start
+    finally:
+        rate_limiter.WINDOW_SECONDS = original
+    check(waited >= 0.2, f"call over the TPM budget admitted after {waited:.2f}s")
+
+
+def scenario_queue_timeout():
+    """A waiter that cannot be admitted in time raises LLMBusyError and leaves the queue."""
+    from tools.rate_limiter import LLMBusyError
+
+    limiter = _limiter(initial_concurrency=1, max_concurrency=1)
+    holder = limiter.acquire(1, 0, timeout=1)
+    try:
+        limiter.acquire(1, 0, timeout=0.1)
+    except LLMBusyError as e:
+        check(e.retry_after >= 1.0, f"retry_after {e.retry_after}")
+    else:
+        raise AssertionError("acquire did not time out")
+    snap = limiter.snapshot()
+    check(snap["queue_timeouts"] == 1 and not snap["queued_by_priority"], f"snapshot {snap}")
+    limiter.release(holder, latency=0.0)
+    limiter.release(limiter.acquire(1, 0, timeout=0.1), latency=0.0)
+
+
+def scenario_limited_call_retries_429():
+    """limited_call retries 429s through the limiter, up to OPENAI_MAX_ATTEMPTS."""
+    from config import settings
+    from tools import rate_limiter
+
+    model = _fresh_model()
+    calls = {"n": 0}
+
+    def flaky():
+        calls["n"] += 1
+        if calls["n"] < settings.OPENAI_MAX_ATTEMPTS:
+            raise RateLimitError()
+        return "ok"
+
+    check(rate_limiter.limited_call(model, 10, flaky) == "ok", "call did not succeed")
+    check(calls["n"] == settings.OPENAI_MAX_ATTEMPTS, f"{calls['n']} attempts")
+    snap = rate_limiter.get_limiter(model).snapshot()
+    check(snap["throttled_429"] == settings.OPENAI_MAX_ATTEMPTS - 1 and snap["in_flight"] == 0, f"snapshot {snap}")
+
+    model = _fresh_model()
+    try:
+        rate_limiter.limited_call(model, 10, lambda: (_ for _ in ()).throw(RateLimitError()))
+    except RateLimitError:
+        pass
+    else:
+        raise AssertionError("persistent 429 not raised after the last attempt")
+    check(rate_limiter.get_limiter(model).snapshot()["throttled_429"] == settings.OPENAI_MAX_ATTEMPTS,
+          "attempts past OPENAI_MAX_ATTEMPTS")
+
+
+def scenario_limited_call_other_errors():
+    """Other errors are raised at once and released as failures, leaving the limit alone."""
+    from tools import rate_limiter
+
+    model = _fresh_model()
+    limiter = rate_limiter.get_limiter(model)
+    before = limiter.limit
+    calls = {"n": 0}
+
+    def broken():
+        calls["n"] += 1
+        raise ValueError("bad request")
+
+    for _ in range(20):
+        try:
+            rate_limiter.limited_call(model, 10, broken)
+        except ValueError:
+            pass
+    snap = limiter.snapshot()
+    check(calls["n"] == 20, f"{calls['n']} calls for 20 requests: non-429 errors were retried")
+    check(snap["failed"] == 20 and snap["in_flight"] == 0, f"snapshot {snap}")
+    check(limiter.limit == before, f"limit moved from {before} to {limiter.limit} on failures")
+
+
+SCENARIOS = {
+    "priority_order": scenario_priority_order,
+    "concurrency_cap": scenario_concurrency_cap,
+    "aimd_increase": scenario_aimd_increase,
+    "aimd_slow": scenario_aimd_slow,
+    "aimd_throttled": scenario_aimd_throttled,
+    "aimd_failed": scenario_aimd_failed,
+    "rpm_window": scenario_rpm_window,
+    "tpm_window": scenario_tpm_window,
+    "queue_timeout": scenario_queue_timeout,
+    "limited_call_retries_429": scenario_limited_call_retries_429,
+    "limited_call_other_errors": scenario_limited_call_other_errors,
+}
+
+
+def main(argv=None) -> int:
+    return run_checks(SCENARIOS, "Behavioural checks for the OpenAI rate limiter.", argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Retrieval scaling benchmark: query latency, memory and recall@k of each
+retrieval backend as the corpus grows (10k -> 100k -> 1M by default).
+
+The corpus is grown in place between sizes, and exact ground truth is kept
+up to date batch by batch, so each size only pays for the new documents.
+
+    python -m bench.retrieval_scaling --sizes 1000,10000 --dim 256
+    python -m bench.retrieval_scaling --postgres-uri postgresql://... --mongo-uri mongodb://...
+
+Without URIs the corpus lives in SQLite + mongomock. Those keep every vector as
+Python lists (and mongomock copies documents on read), so sizes whose
+estimated footprint exceeds --max-memory-gb are skipped; use real databases
+for those.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import resource
+import tracemalloc
+from typing import Callable, Dict, List, Any
+
+from bench import stats
+from bench.corpus import CorpusGenerator, GroundTruth, populate, DEFAULT_DIM
+
+# Rough bytes per vector component for Python float lists held by mongomock,
+# including the copy it makes of every document returned by find().
+STANDIN_BYTES_PER_COMPONENT = 80
+
+
+class Context:
+    def __init__(self, session, coll):
+        self.session = session
+        self.coll = coll
+        self.index_dir = tempfile.mkdtemp(prefix="bench-index-")
+        self.index = None
+
+
+# -----------------------------
+# Retrieval backends under test
+# -----------------------------
+def _find_similar(ctx: Context, query, top_k: int) -> List[int]:
+    from tools.db_retrieval_tool import find_similar_embeddings
+    return [r["research_id"] for r in find_similar_embeddings(ctx.coll, query.tolist(), top_k=top_k)]
+
+
+def _related(ctx: Context, query, top_k: int) -> List[int]:
+    from tools.db_retrieval_tool import get_related_research
+    return [r["research_id"] for r in get_related_research(ctx.session, ctx.coll, query.tolist(), top_k=top_k)]
+
+
+def _vector_index(ctx: Context, query, top_k: int) -> List[int]:
+    return [r["research_id"] for r in ctx.index.search(query, top_k=top_k)]
+
+
+def _refresh_snapshot(ctx: Context):
+    from tools.vector_index import build_snapshot, VectorIndex
+
+    # ObjectId watermarks have one-second resolution; wait so every document
+    # just written falls before the cutoff.
+    time.sleep(1.0)
+    start = time.perf_counter()
+    manifest = build_snapshot(ctx.coll, ctx.index_dir, lag_seconds=0)
+    ctx.index = VectorIndex.open(ctx.index_dir)
+    print(f"  snapshot at {manifest['count']} vectors in {len(manifest['segments'])} segment(s) "
+          f"(+{time.perf_counter() - start:.1f}s incremental build)")
+
+
+BACKENDS: Dict[str, Callable[[Context, Any, int], List[int]]] = {
+    "find_similar_embeddings": _find_similar,
+    "get_related_research": _related,
+    "vector_index": _vector_index,
+}
+
+# Run once per corpus size, before the backend is measured.
+PREPARE: Dict[str, Callable[[Context], None]] = {
+    "vector_index": _refresh_snapshot,
+}
+
+
+def measure(backend: Callable, ctx: Context, queries, truth: GroundTruth, top_k: int) -> Dict[str, Any]:
+    latencies, recalls = [], []
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        found = backend(ctx, q, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(truth.recall(i, found))
+
+    # Separate pass: tracemalloc slows allocation-heavy code down, so it must
+    # not be active while latency is measured.
+    tracemalloc.start()
+    backend(ctx, queries[0], top_k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = stats.summarize(latencies)
+    summary["recall_at_k"] = round(sum(recalls) / len(recalls), 4)
+    summary["peak_alloc_mb"] = round(peak / 2**20, 1)
+    return summary
+
+
+def open_backends(args):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models.research import Base
+
+    if args.postgres_uri:
+        engine = create_engine(args.postgres_uri)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-corpus-"), "research.db")
+        engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        coll = MongoClient(args.mongo_uri)[args.mongo_db]["embeddings"]
+    else:
+        import mongomock
+        coll = mongomock.MongoClient()["bench_db"]["embeddings"]
+    return session, coll
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Retrieval latency / memory / recall as the corpus grows.")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--postgres-uri")
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--mongo-db", default="research_bench")
+    parser.add_argument("--max-memory-gb", type=float, default=8.0, help="skip stand-in sizes estimated above this")
+    parser.add_argument("--json", help="write the report to this path")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    backends = {name: BACKENDS[name] for name in args.backends.split(",")}
+    using_standins = not (args.postgres_uri and args.mongo_uri)
+
+    session, coll = open_backends(args)
+    ctx = Context(session, coll)
+    generator = CorpusGenerator(dim=args.dim, clusters=args.clusters, seed=args.seed)
+    queries = generator.queries(args.queries)
+    truth = GroundTruth(queries, args.top_k)
+
+    rows: List[Dict[str, Any]] = []
+    current = coll.count_documents({})
+    if current:
+        print(f"error: target collection already holds {current} documents; use an empty database")
+        return 1
+
+    for size in sizes:
+        estimate_gb = size * args.dim * STANDIN_BYTES_PER_COMPONENT / 2**30
+        if using_standins and estimate_gb > args.max_memory_gb:
+            print(f"skip {size}: ~{estimate_gb:.0f} GB with in-process stand-ins; pass --postgres-uri/--mongo-uri or lower --dim")
+            continue
+
+        start = time.perf_counter()
+        current += populate(session, coll, generator, size - current, batch_size=args.batch_size, on_batch=truth.add)
+        print(f"corpus at {current} docs (+{time.perf_counter() - start:.1f}s to grow)")
+
+        for name, backend in backends.items():
+            if name in PREPARE:
+                PREPARE[name](ctx)
+            summary = measure(backend, ctx, queries, truth, args.top_k)
+            summary["rss_max_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            rows.append({"size": size, "backend": name, **summary})
+            print(f"  {name}: p50 {summary['p50_ms']} ms, recall@{args.top_k} {summary['recall_at_k']}")
+
+    print()
+    print(stats.format_table(rows, ["size", "backend", "count", "p50_ms", "p99_ms", "recall_at_k", "peak_alloc_mb", "rss_max_mb"]))
+
+    if args.json:
+        stats.save_baseline(args.json, {
+            "config": {k: v for k, v in vars(args).items() if k not in ("postgres_uri", "mongo_uri", "json")},
+            "environment": stats.environment(),
+            "rows": rows,
+        })
+    session.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Behavioural checks for the S3 helpers (tools/s3_tool.py) and the on-disk
+download cache (tools/disk_cache.py), against moto: compressed and legacy
+round-trips, cache write-through / read-through, eviction under the byte
+budget, streaming, and every failure path returning None or raising
+S3ReadError instead of an unexpected exception.
+
+    python -m bench.s3_check
+    python -m bench.s3_check --only stream_multibyte -v
+
+Exits non-zero if any scenario fails.
+"""
+import os
+import sys
+import gzip
+import shutil
+import tempfile
+from typing import Any, Dict
+
+from bench.checks import check, main as run_checks
+
+handles: Dict[str, Any] = {}
+DEFAULTS = {"S3_COMPRESSION": "gzip", "S3_COMPRESSION_MIN_BYTES": 1024}
+LONG_TEXT = "Compressible research notes about caching. " * 200
+MULTIBYTE_TEXT = "naïve café — 日本語 😀 " * 500
+
+
+def setup():
+    from bench.fakes import install_fakes
+
+    handles.update(install_fakes())
+
+
+def reset():
+    import config
+    from tools import s3_tool
+
+    for name, value in DEFAULTS.items():
+        setattr(config.settings, name, value)
+    cache = s3_tool.get_download_cache()
+    if cache:
+        shutil.rmtree(cache.directory, ignore_errors=True)
+        os.makedirs(cache.directory)
+        s3_tool._cache = None  # drop the cached size along with the files
+
+
+def _bucket() -> str:
+    from config import settings
+
+    return settings.AWS_S3_BUCKET
+
+
+def _forget(key: str):
+    """Drop `key` from the download cache so the next read goes to S3."""
+    from tools import s3_tool
+
+    s3_tool.get_download_cache().delete(s3_tool._cache_key(_bucket(), key))
+
+
+def _head(key: str) -> Dict[str, Any]:
+    return handles["s3"].head_object(Bucket=_bucket(), Key=key)
+
+
+def _streamed(key: str, chunk_size: int = 1 << 16) -> str:
+    from tools.s3_tool import stream_text_from_s3
+
+    return "".join(stream_text_from_s3(key, chunk_size))
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenario_round_trip_gzip():
+    """Large bodies are stored gzip-compressed with ContentEncoding and read back intact."""
+    from tools.s3_tool import upload_text_to_s3, download_text_from_s3
+
+    key = "check/gzip.txt"
+    check(upload_text_to_s3(LONG_TEXT, key) == f"s3://{_bucket()}/{key}", "upload failed")
+    head = _head(key)
+    check(head.get("ContentEncoding") == "gzip", f"ContentEncoding {head.get('ContentEncoding')}")
+    check(head["ContentLength"] < len(LONG_TEXT) // 4, f"{head['ContentLength']} bytes stored for {len(LONG_TEXT)}")
+    _forget(key)
+    check(download_text_from_s3(key) == LONG_TEXT, "gzip body changed on the round trip")
+
+
+def scenario_round_trip_zstd():
+    """With S3_COMPRESSION=zstd (and zstandard installed) bodies are zstd-compressed."""
+    from config import settings
+    from tools.s3_tool import upload_text_to_s3, download_text_from_s3, _zstd
+
+    settings.S3_COMPRESSION = "zstd"
+    key = "check/zstd.txt"
+    upload_text_to_s3(LONG_TEXT, key)
+    expected = "zstd" if _zstd() else "gzip"  # falls back to gzip without the package
+    check(_head(key).get("ContentEncoding") == expected, f"ContentEncoding {_head(key).get('ContentEncoding')}")
+    _forget(key)
+    check(download_text_from_s3(key) == LONG_TEXT, "zstd body changed on the round trip")
+
+
+def scenario_round_trip_uncompressed():
+    """Small bodies, S3_COMPRESSION=none and legacy objects without ContentEncoding are stored as-is."""
+    from config import settings
+    from tools.s3_tool import upload_text_to_s3, download_text_from_s3
+
+    upload_text_to_s3("short", "check/small.txt")
+    check("ContentEncoding" not in _head("check/small.txt"), "body under S3_COMPRESSION_MIN_BYTES compressed")
+    settings.S3_COMPRESSION = "none"
+    upload_text_to_s3(LONG_TEXT, "check/none.txt")
+    check("ContentEncoding" not in _head("check/none.txt"), "S3_COMPRESSION=none compressed the body")
+    handles["s3"].put_object(Bucket=_bucket(), Key="check/legacy.txt", Body=MULTIBYTE_TEXT.encode("utf-8"))
+    for key, text in [("check/small.txt", "short"), ("check/none.txt", LONG_TEXT), ("check/legacy.txt", MULTIBYTE_TEXT)]:
+        _forget(key)
+        check(download_text_from_s3(key) == text, f"{key} changed on the round trip")
+
+
+def scenario_cache_write_and_read_through():
+    """Uploads fill the cache; downloads are served from it, and misses fill it."""
+    from tools.s3_tool import upload_text_to_s3, download_text_from_s3, get_download_cache
+
+    cache = get_download_cache()
+    key = "check/cached.txt"
+    upload_text_to_s3(LONG_TEXT, key)
+    hits = cache.hits
+    check(download_text_from_s3(key) == LONG_TEXT, "cached read")
+    check(cache.hits == hits + 1, "upload did not write through to the cache")
+
+    # Read-through: a cold cache is filled by the first download, which the
+    # second one then serves even though the object is gone from S3.
+    _forget(key)
+    check(download_text_from_s3(key) == LONG_TEXT, "cold read")
+    handles["s3"].delete_object(Bucket=_bucket(), Key=key)
+    check(download_text_from_s3(key) == LONG_TEXT, "download did not fill the cache")
+    check(_streamed(key) == LONG_TEXT, "stream did not read the cache")
+
+
+def scenario_disk_cache_eviction():
+    """Past max_bytes, least recently used entries go until the cache is under 90% of the budget."""
+    from tools.disk_cache import DiskCache
+
+    directory = tempfile.mkdtemp(prefix="disk-cache-check-")
+    try:
+        cache = DiskCache(directory, max_bytes=10_000)
+        for i in range(9):
+            cache.put(f"k{i}", bytes(1000))
+            os.utime(cache.path(f"k{i}"), (1000 + i, 1000 + i))  # distinct, ordered last-use times
+        check(cache.get("k0") is not None, "entry missing before eviction")  # k0 is now the newest
+        cache.put("k9", bytes(1000))
+        cache.put("k10", bytes(1000))  # 11,000 bytes: evict down to <= 9,000
+        stats = cache.stats()
+        check(stats["bytes"] <= 9000 and stats["evictions"] == 2, f"stats {stats}")
+        check(cache.get("k1") is None and cache.get("k2") is None, "least recently used entries kept")
+        check(all(cache.get(k) is not None for k in ("k0", "k3", "k9", "k10")), "recently used entry evicted")
+        on_disk = sum(e.stat().st_size for e in os.scandir(directory))
+        check(on_disk == stats["bytes"], f"{on_disk} bytes on disk, {stats['bytes']} accounted")
+
+        cache.put("huge", bytes(20_000))
+        check(cache.get("huge") is None, "entry larger than the whole budget was stored")
+        cache.delete("k0")
+        check(cache.stats()["bytes"] == on_disk - 1000, "delete not accounted")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def scenario_stream_multibyte():
+    """Streaming in small chunks yields the same text as a download, from S3 and from the cache."""
+    from config import settings
+    from tools.s3_tool import upload_text_to_s3, download_text_from_s3
+
+    for encoding in ("gzip", "zstd", "none"):
+        settings.S3_COMPRESSION = encoding
+        key = f"check/stream-{encoding}.txt"
+        upload_text_to_s3(MULTIBYTE_TEXT, key)
+        _forget(key)
+        # 7-byte chunks split the 2-4 byte UTF-8 sequences.
+        check(_streamed(key, chunk_size=7) == MULTIBYTE_TEXT, f"{encoding}: stream from S3 differs")
+        check(download_text_from_s3(key) == MULTIBYTE_TEXT, f"{encoding}: download differs")
+        check(_streamed(key, chunk_size=7) == MULTIBYTE_TEXT, f"{encoding}: stream from the cache differs")
+
+
+def scenario_unreadable_objects():
+    """Missing keys, truncated gzip and unknown encodings give None / S3ReadError, never a raw exception."""
+    from tools.s3_tool import download_text_from_s3, S3ReadError
+
+    compressed = gzip.compress(LONG_TEXT.encode("utf-8"))
+    s3 = handles["s3"]
+    s3.put_object(Bucket=_bucket(), Key="check/truncated.txt", Body=compressed[: len(compressed) // 2], ContentEncoding="gzip")
+    s3.put_object(Bucket=_bucket(), Key="check/corrupt.txt", Body=b"not gzip at all", ContentEncoding="gzip")
+    s3.put_object(Bucket=_bucket(), Key="check/brotli.txt", Body=b"\x8b\x00", ContentEncoding="br")
+    s3.put_object(Bucket=_bucket(), Key="check/latin1.txt", Body="café".encode("latin-1"))
+
+    for key in ("check/missing.txt", "check/truncated.txt", "check/corrupt.txt", "check/brotli.txt", "check/latin1.txt"):
+        check(download_text_from_s3(key) is None, f"download of {key} did not return None")
+        try:
+            _streamed(key)
+        except S3ReadError:
+            pass
+        else:
+            raise AssertionError(f"stream of {key} did not raise S3ReadError")
+    check(download_text_from_s3("check/truncated.txt") is None, "failed download was cached")
+
+
+def scenario_upload_failure():
+    """An upload that S3 rejects returns None (sync and async) and caches nothing."""
+    from config import settings
+    from tools.s3_tool import upload_text_to_s3, upload_texts_to_s3, get_download_cache
+
+    original = settings.AWS_S3_BUCKET
+    settings.AWS_S3_BUCKET = "check-missing-bucket"
+    try:
+        check(upload_text_to_s3(LONG_TEXT, "check/lost.txt") is None, "upload to a missing bucket succeeded")
+        check(upload_texts_to_s3([("a", "check/a.txt"), ("b", "check/b.txt")]) == [None, None], "async uploads")
+        check(get_download_cache().get(f"{settings.AWS_S3_BUCKET}/check/lost.txt") is None, "failed upload was cached")
+    finally:
+        settings.AWS_S3_BUCKET = original
+
+
+SCENARIOS = {
+    "round_trip_gzip": scenario_round_trip_gzip,
+    "round_trip_zstd": scenario_round_trip_zstd,
+    "round_trip_uncompressed": scenario_round_trip_uncompressed,
+    "cache_write_and_read_through": scenario_cache_write_and_read_through,
+    "disk_cache_eviction": scenario_disk_cache_eviction,
+    "stream_multibyte": scenario_stream_multibyte,
+    "unreadable_objects": scenario_unreadable_objects,
+    "upload_failure": scenario_upload_failure,
+}
+
+
+def main(argv=None) -> int:
+    return run_checks(SCENARIOS, "Behavioural checks for the S3 helpers and download cache.", argv,
+                      setup=setup, before_each=reset)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
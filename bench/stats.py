@@ -0,0 +1,100 @@
+import json
+import math
+import os
+import platform
+import datetime
+from typing import Dict, List, Any, Iterable, Optional, Union
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile; `pct` is 0-100. Returns 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p90_ms": round(percentile(latencies_ms, 90), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "recorded_at": datetime.datetime.utcnow().isoformat() + "Z",
+    }
+
+
+# -----------------------------
+# Baseline storage + comparison
+# -----------------------------
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, report: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    metrics: Iterable[str],
+    tolerance: Union[float, Dict[str, float]],
+    higher_is_better: Iterable[str] = (),
+    min_delta: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """
+    Compare `current[name][metric]` against `baseline[name][metric]` for every
+    name present in both. A metric regresses when it is worse than the baseline
+    by more than `tolerance` (0.2 == 20%, or a per-metric dict) and by more
+    than `min_delta` in absolute terms, which keeps sub-millisecond jitter
+    from failing a run. Returns one row per comparison.
+    """
+    higher_is_better = set(higher_is_better)
+    rows = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in metrics:
+            if metric not in cur or metric not in base or not base[metric]:
+                continue
+            change = (cur[metric] - base[metric]) / base[metric]
+            worse = -change if metric in higher_is_better else change
+            allowed = tolerance[metric] if isinstance(tolerance, dict) else tolerance
+            rows.append({
+                "name": name,
+                "metric": metric,
+                "baseline": base[metric],
+                "current": cur[metric],
+                "change_pct": round(change * 100, 1),
+                "regressed": worse > allowed and abs(cur[metric] - base[metric]) > min_delta,
+            })
+    return rows
+
+
+def format_table(rows: List[Dict[str, Any]], columns: List[str]) -> str:
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) if rows else len(c) for c in columns}
+    lines = ["  ".join(c.ljust(widths[c]) for c in columns)]
+    lines.append("  ".join("-" * widths[c] for c in columns))
+    for r in rows:
+        lines.append("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
+    return "\n".join(lines)
@@ -1,68 +1,360 @@
 import os
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from pymongo import MongoClient
-import redis
-import boto3
 
 load_dotenv()  # Load from .env file
 
+logger = logging.getLogger(__name__)
+
 
 class Settings:
     def __init__(self):
         # ---- PostgreSQL ----
         self.POSTGRES_URI = os.getenv("POSTGRES_URI")
+        self.POSTGRES_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "10"))
+        self.POSTGRES_MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", "10"))
+        self.POSTGRES_POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "10"))
+        self.POSTGRES_POOL_RECYCLE = int(os.getenv("POSTGRES_POOL_RECYCLE", "1800"))
 
         # ---- MongoDB ----
         self.MONGO_URI = os.getenv("MONGO_URI")
         self.MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "research_db")
+        self.MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+        self.MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+        self.MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+        self.MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+        self.MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+        self.MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+        # ---- Vector index snapshots (see tools/vector_index.py) ----
+        self.VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR")  # unset: scan Mongo per query
+        self.VECTOR_INDEX_RELOAD_SECONDS = float(os.getenv("VECTOR_INDEX_RELOAD_SECONDS", "30"))
+        self.VECTOR_INDEX_MAX_SEGMENTS = int(os.getenv("VECTOR_INDEX_MAX_SEGMENTS", "8"))
+        self.VECTOR_INDEX_WATERMARK_LAG_SECONDS = float(os.getenv("VECTOR_INDEX_WATERMARK_LAG_SECONDS", "5"))
+        # In-process delta over the snapshot, kept current from Mongo (tools/index_sync.py).
+        # Needs VECTOR_INDEX_DIR; catch-up waits until a snapshot has been built.
+        self.INDEX_SYNC_ENABLED = os.getenv("INDEX_SYNC_ENABLED", "false").lower() == "true"
+        self.INDEX_SYNC_BATCH_SIZE = int(os.getenv("INDEX_SYNC_BATCH_SIZE", "100"))
+        self.INDEX_SYNC_FLUSH_SECONDS = float(os.getenv("INDEX_SYNC_FLUSH_SECONDS", "0.5"))
+        self.INDEX_SYNC_POLL_SECONDS = float(os.getenv("INDEX_SYNC_POLL_SECONDS", "2"))
+        self.INDEX_SYNC_POLL_OVERLAP_SECONDS = float(os.getenv("INDEX_SYNC_POLL_OVERLAP_SECONDS", "5"))
+        # Polling mode only, per worker: reads the _ids past the watermark plus one
+        # count per snapshot segment; ~log2(rows) more counts per deleted document.
+        self.INDEX_SYNC_RECONCILE_SECONDS = float(os.getenv("INDEX_SYNC_RECONCILE_SECONDS", "300"))
 
         # ---- Redis ----
         self.REDIS_URI = os.getenv("REDIS_URI")
+        self.REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+        self.REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+        self.REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "2"))
+        self.REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
 
         # ---- AWS ----
         self.AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
         self.AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
         self.AWS_S3_BUCKET = os.getenv("AWS_S3_BUCKET")
+        # "gzip", "zstd" (needs the optional zstandard package) or "none"
+        self.S3_COMPRESSION = os.getenv("S3_COMPRESSION", "gzip").lower()
+        self.S3_COMPRESSION_MIN_BYTES = int(os.getenv("S3_COMPRESSION_MIN_BYTES", "1024"))
+        self.S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+        # On-disk read-through cache for downloads; 0 disables it.
+        self.S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", os.path.join(tempfile.gettempdir(), "research-s3-cache"))
+        self.S3_CACHE_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", str(256 * 2**20)))
+
+        # ---- Research job queue ----
+        self.JOB_QUEUE_MAX_LENGTH = int(os.getenv("JOB_QUEUE_MAX_LENGTH", "1000"))
+        self.JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "5"))
+        self.JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+        self.JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "86400"))
+        self.JOB_RETRY_AFTER_SECONDS = int(os.getenv("JOB_RETRY_AFTER_SECONDS", "30"))
+        self.WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
 
         # ---- LLM API ----
         self.LLM_API_KEY = os.getenv("LLM_API_KEY")
         self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+        # ---- OpenAI rate limiting (per model, per process) ----
+        self.OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+        self.OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+        # JSON overrides, e.g. {"text-embedding-3-large": {"rpm": 3000, "tpm": 1000000}}
+        self.OPENAI_MODEL_LIMITS = os.getenv("OPENAI_MODEL_LIMITS", "")
+        self.OPENAI_MIN_CONCURRENCY = int(os.getenv("OPENAI_MIN_CONCURRENCY", "1"))
+        self.OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+        self.OPENAI_INITIAL_CONCURRENCY = int(os.getenv("OPENAI_INITIAL_CONCURRENCY", "4"))
+        self.OPENAI_LATENCY_TARGET_SECONDS = float(os.getenv("OPENAI_LATENCY_TARGET_SECONDS", "10"))
+        self.OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OPENAI_QUEUE_TIMEOUT_SECONDS", "30"))
+        self.OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "3"))
+        # Completion tokens reserved per chat call until the real usage is known.
+        self.OPENAI_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKENS_ESTIMATE", "512"))
+
+        # ---- Web search ----
+        self.SEARCH_SUB_QUERIES = int(os.getenv("SEARCH_SUB_QUERIES", "3"))
+        # Searches expected to run at once (match the /chain/research admission
+        # limit); the sub-query pool gets SEARCH_SUB_QUERIES - 1 threads for each.
+        self.SEARCH_CONCURRENT_REQUESTS = int(os.getenv("SEARCH_CONCURRENT_REQUESTS", "8"))
+        self.SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+
+        # ---- Batch analyze ----
+        self.ANALYZE_BATCH_MAX_SIZE = int(os.getenv("ANALYZE_BATCH_MAX_SIZE", "64"))
+        self.ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "8"))
+
+        # ---- LLM completion cache ----
+        self.LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.LLM_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("LLM_CACHE_LOCAL_MAX_ENTRIES", "512"))
+        self.LLM_CACHE_REDIS_MAX_ENTRIES = int(os.getenv("LLM_CACHE_REDIS_MAX_ENTRIES", "20000"))
+        self.LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "604800"))
+        # llm_summarize runs at temperature 0.2, so caching it is opt-in.
+        self.LLM_CACHE_SUMMARIZE = os.getenv("LLM_CACHE_SUMMARIZE", "false").lower() == "true"
+
+        # ---- Admission control ----
+        self.ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+        # Max concurrent requests per path; keep the sum below the threadpool size (40).
+        self.ADMISSION_ROUTE_LIMITS = os.getenv(
+            "ADMISSION_ROUTE_LIMITS",
+            '{"/chain/research": 8, "/graph/analyze": 16, "/graph/analyze/batch": 2}',
+        )
+        self.ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+        self.ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+
+        # ---- Debug / Profiling ----
+        self.DEBUG_ROUTES_ENABLED = os.getenv("DEBUG_ROUTES_ENABLED", "false").lower() == "true"
+        self.PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+        self.PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+        self.PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+        self.PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", "20"))
+
+        # ---- Startup ----
+        # "background": warm clients up after the app starts serving
+        # "blocking":   finish warm-up (bounded by the timeout) before serving
+        # "off":        build every client on first use
+        self.STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background").lower()
+        self.STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "10"))
+
 
 settings = Settings()
 
+# -----------------------------
+# Lazy client registry
+# -----------------------------
+# Clients are built on first use rather than at import, so importing config
+# (and therefore booting a worker) is cheap and does not require every backend
+# to be reachable. The lock makes sure concurrent first requests build each
+# client exactly once; it is re-entrant because factories depend on each other.
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.RLock()
+
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def set_client(name: str, client: Any):
+    """
+    Replace a client in the registry (e.g. with an in-process stand-in for
+    benchmarks). `name` is one of the module attribute names below.
+    """
+    if name not in _LAZY_ATTRIBUTES:
+        raise KeyError(f"Unknown client '{name}'")
+    with _clients_lock:
+        _clients[name] = client
+
+
 # -----------------------------
 # PostgreSQL Engine + Session
 # -----------------------------
-engine = create_engine(
-    settings.POSTGRES_URI,
-    future=True,
-    pool_pre_ping=True
-)
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine
-)
+def get_engine():
+    def build():
+        from sqlalchemy import create_engine
+        from tools import pool_metrics
+
+        pool_kwargs = {}
+        # SQLite (used by the benchmarks) picks its own pool implementation.
+        if not settings.POSTGRES_URI.startswith("sqlite"):
+            stats = pool_metrics.get_stats(
+                "postgres", settings.POSTGRES_POOL_SIZE + settings.POSTGRES_MAX_OVERFLOW
+            )
+            pool_kwargs = dict(
+                poolclass=pool_metrics.sqlalchemy_pool_class(stats),
+                pool_size=settings.POSTGRES_POOL_SIZE,
+                max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+                pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+                pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+            )
+        engine = create_engine(
+            settings.POSTGRES_URI,
+            future=True,
+            pool_pre_ping=True,
+            **pool_kwargs
+        )
+        if pool_kwargs:
+            stats.set_gauges(lambda: {"pool_status": engine.pool.status()})
+        return engine
+    return _get_or_create("engine", build)
+
+
+def get_session_factory():
+    def build():
+        from sqlalchemy.orm import sessionmaker
+        return sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=get_engine()
+        )
+    return _get_or_create("SessionLocal", build)
+
 
 # -----------------------------
 # MongoDB Client
 # -----------------------------
-mongo_client = MongoClient(settings.MONGO_URI)
-mongo_db = mongo_client[settings.MONGO_DB_NAME]
+def get_mongo_client():
+    def build():
+        from pymongo import MongoClient
+        from tools import pool_metrics
+
+        stats = pool_metrics.get_stats("mongo", settings.MONGO_MAX_POOL_SIZE)
+        return MongoClient(
+            settings.MONGO_URI,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[pool_metrics.mongo_pool_listener(stats)],
+        )
+    return _get_or_create("mongo_client", build)
+
+
+def get_mongo_db():
+    return _get_or_create("mongo_db", lambda: get_mongo_client()[settings.MONGO_DB_NAME])
+
 
 # -----------------------------
 # Redis Client (SYNC)
 # -----------------------------
-redis_client = redis.from_url(settings.REDIS_URI)
+def get_redis_client():
+    def build():
+        import redis
+        from tools import pool_metrics
+
+        # A blocking pool waits up to REDIS_POOL_TIMEOUT for a free connection
+        # instead of failing with "Too many connections" under bursts.
+        stats = pool_metrics.get_stats("redis", settings.REDIS_MAX_CONNECTIONS)
+        pool = pool_metrics.redis_pool_class(stats).from_url(
+            settings.REDIS_URI,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        return redis.Redis(connection_pool=pool)
+    return _get_or_create("redis_client", build)
+
 
 # -----------------------------
 # AWS S3 Client
 # -----------------------------
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=settings.AWS_ACCESS_KEY,
-    aws_secret_access_key=settings.AWS_SECRET_KEY
-)
+def get_s3_client():
+    def build():
+        import boto3
+        return boto3.client(
+            "s3",
+            aws_access_key_id=settings.AWS_ACCESS_KEY,
+            aws_secret_access_key=settings.AWS_SECRET_KEY
+        )
+    return _get_or_create("s3_client", build)
+
+
+# -----------------------------
+# Warm-up
+# -----------------------------
+def _ping_postgres():
+    with get_engine().connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+
+def _ping_mongo():
+    get_mongo_db().client.admin.command("ping")
+
+
+def _ping_redis():
+    get_redis_client().ping()
+
+
+WARMUP_CHECKS: Dict[str, Callable[[], Any]] = {
+    "postgres": _ping_postgres,
+    "mongo": _ping_mongo,
+    "redis": _ping_redis,
+    "s3": get_s3_client,
+}
+
+
+def warm_up_client(name: str) -> bool:
+    """
+    Build one client and open its first connection. Failures are logged, not
+    raised: an unreachable backend must not stop the worker from starting.
+    """
+    try:
+        WARMUP_CHECKS[name]()
+        return True
+    except Exception as e:
+        logger.warning("Warm-up of %s failed: %s", name, e)
+        return False
+
+
+# -----------------------------
+# Shutdown
+# -----------------------------
+def close_clients():
+    """
+    Drain every client that was actually built and forget it, so in-flight
+    connections are returned and closed cleanly on worker shutdown.
+    """
+    with _clients_lock:
+        clients = dict(_clients)
+        _clients.clear()
+
+    closers = [
+        ("engine", lambda c: c.dispose()),
+        ("mongo_client", lambda c: c.close()),
+        ("redis_client", lambda c: c.connection_pool.disconnect()),
+        ("s3_client", lambda c: c.close()),
+    ]
+    for name, close in closers:
+        client = clients.get(name)
+        if client is None:
+            continue
+        try:
+            close(client)
+        except Exception as e:
+            logger.warning("Failed to close %s: %s", name, e)
+
+
+# `from config import redis_client` etc. keep working, but resolve lazily.
+_LAZY_ATTRIBUTES: Dict[str, Callable[[], Any]] = {
+    "engine": get_engine,
+    "SessionLocal": get_session_factory,
+    "mongo_client": get_mongo_client,
+    "mongo_db": get_mongo_db,
+    "redis_client": get_redis_client,
+    "s3_client": get_s3_client,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,4 @@
-from config import SessionLocal, mongo_db, redis_client, s3_client
+from config import get_session_factory, get_mongo_db as _get_mongo_db, get_redis_client as _get_redis_client, get_s3_client as _get_s3_client
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
@@ -6,8 +6,33 @@ from fastapi import Depends
 # -----------------------------
 # PostgreSQL Dependency
 # -----------------------------
+class LazySession:
+    """
+    Stands in for a Session and only creates the real one on first use, so
+    requests served from the Redis cache never build a session at all.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._session = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
 def get_postgres_db() -> Session: # type: ignore
-    db = SessionLocal()
+    db = LazySession(lambda: get_session_factory()())
     try:
         yield db
     finally:
@@ -18,18 +43,18 @@ def get_postgres_db() -> Session: # type: ignore
 # MongoDB Dependency
 # -----------------------------
 def get_mongo_db():
-    return mongo_db
+    return _get_mongo_db()
 
 
 # -----------------------------
 # Redis Dependency
 # -----------------------------
 def get_redis_client():
-    return redis_client
+    return _get_redis_client()
 
 
 # -----------------------------
 # AWS S3 Client Dependency
 # -----------------------------
 def get_s3_client():
-    return s3_client
+    return _get_s3_client()
@@ -1,16 +1,109 @@
 # app/main.py
 
-from fastapi import FastAPI
+import asyncio
+import importlib
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from routers import research, analyze
+import config
+from config import settings
+from middleware.profiling import ProfilingMiddleware
+from middleware.admission import AdmissionControlMiddleware
+from tools.rate_limiter import LLMBusyError
+from routers import research, analyze, debug
+
+logger = logging.getLogger(__name__)
+
+# Heavy modules the services import lazily; warm-up pulls them in so the
+# first request does not pay for them.
+WARMUP_IMPORTS = (
+    "langchain_openai",
+    "langchain_core.prompts",
+    "langchain_core.messages",
+    "langgraph.graph",
+    "tavily",
+    "botocore.exceptions",
+)
+
+
+def import_heavy_modules():
+    for name in WARMUP_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Warm-up import of %s failed: %s", name, e)
+
+
+async def warm_up():
+    """
+    Build every backend client and open its first connection concurrently,
+    while the deferred imports load on another thread.
+    """
+    clients = list(config.WARMUP_CHECKS)
+    results = await asyncio.gather(
+        asyncio.to_thread(import_heavy_modules),
+        *(asyncio.to_thread(config.warm_up_client, name) for name in clients),
+    )
+    ready = [name for name, ok in zip(clients, results[1:]) if ok]
+    logger.info("Warm-up finished; ready: %s", ", ".join(ready) or "none")
+
+
+# --------------------------
+# Lifespan: startup warm-up + index sync + pool shutdown
+# --------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if settings.STARTUP_WARMUP == "blocking":
+        try:
+            await asyncio.wait_for(warm_up(), timeout=settings.STARTUP_WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Warm-up exceeded %.1fs; serving anyway", settings.STARTUP_WARMUP_TIMEOUT)
+    elif settings.STARTUP_WARMUP == "background":
+        warmup_task = asyncio.create_task(warm_up())
+
+    if settings.INDEX_SYNC_ENABLED:
+        from tools.index_sync import start_index_sync  # deferred: pulls in numpy
+        await asyncio.to_thread(lambda: start_index_sync(config.get_mongo_db()["embeddings"]))
+
+    yield
+
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if settings.INDEX_SYNC_ENABLED:
+        from tools.index_sync import stop_index_sync
+        await asyncio.to_thread(stop_index_sync)
+    await asyncio.to_thread(config.close_clients)
+
 
 app = FastAPI(
     title="AI Research Assistant",
     version="1.0.0",
-    description="LangChain + LangGraph powered micro-orchestrator for research & analysis"
+    description="LangChain + LangGraph powered micro-orchestrator for research & analysis",
+    lifespan=lifespan,
 )
 
+# --------------------------
+# Admission control: per-route concurrency limits, load shedding, cache-hit
+# fast path. Added before CORS so rejections still carry CORS headers.
+# --------------------------
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        limits=json.loads(settings.ADMISSION_ROUTE_LIMITS),
+        cache_keys={
+            "/chain/research": research.admission_cache_key,
+            "/graph/analyze": analyze.admission_cache_key,
+        },
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    )
+
 # --------------------------
 # CORS (optional but recommended)
 # --------------------------
@@ -22,11 +115,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --------------------------
+# Request profiling (opt-in per request via X-Profile header or sampling)
+# --------------------------
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        interval_ms=settings.PROFILING_INTERVAL_MS,
+        buffer_size=settings.PROFILING_BUFFER_SIZE,
+    )
+
+# --------------------------
+# OpenAI capacity exhausted -> 503 instead of a 500
+# --------------------------
+@app.exception_handler(LLMBusyError)
+async def llm_busy_handler(request: Request, exc: LLMBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after + 0.5))},
+    )
+
+
 # --------------------------
 # Routers
 # --------------------------
 app.include_router(research.router, prefix="/chain", tags=["Research"])
 app.include_router(analyze.router, prefix="/graph", tags=["Analyze"])
+if settings.DEBUG_ROUTES_ENABLED:
+    app.include_router(debug.router, prefix="/debug", tags=["Debug"])
 
 
 # --------------------------
@@ -0,0 +1,240 @@
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from tools.cache import cache_exists
+
+logger = logging.getLogger(__name__)
+
+# Clients may tighten (never extend) how long they are willing to queue.
+TIMEOUT_HEADER = b"x-request-timeout"
+
+# Latency EWMA weight for new samples.
+LATENCY_ALPHA = 0.2
+
+
+class Shed(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# -----------------------------
+# Per-route gate
+# -----------------------------
+class RouteGate:
+    """
+    At most `limit` requests of one route run at a time; up to `queue_size`
+    more wait in FIFO order. Lives on the event loop, so no locking.
+    """
+
+    def __init__(self, path: str, limit: int, queue_size: int):
+        self.path = path
+        self.limit = limit
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.avg_latency: Optional[float] = None
+        self.admitted = 0
+        self.fast_path = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "timeout": 0}
+
+    def expected_wait(self, position: int) -> float:
+        """Rough time until the `position`-th waiter gets a slot."""
+        return position * (self.avg_latency or 0.0) / self.limit
+
+    async def acquire(self, budget: float):
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        position = len(self.waiters) + 1
+        if len(self.waiters) >= self.queue_size:
+            self.shed["queue_full"] += 1
+            raise Shed("queue full", self.expected_wait(position))
+        # No point queueing a request that would time out before its turn.
+        if self.expected_wait(position) > budget:
+            self.shed["deadline"] += 1
+            raise Shed("deadline", self.expected_wait(position))
+
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.append(fut)
+        try:
+            done, _ = await asyncio.wait({fut}, timeout=budget)
+        except BaseException:
+            # Client went away while waiting; hand on a slot we were given.
+            if fut.done() and not fut.cancelled():
+                self.release(None)
+            else:
+                self._discard(fut)
+            raise
+        if not done:
+            self._discard(fut)
+            self.shed["timeout"] += 1
+            raise Shed("timeout", self.expected_wait(len(self.waiters) + 1))
+        self.admitted += 1
+
+    def _discard(self, fut):
+        fut.cancel()
+        try:
+            self.waiters.remove(fut)
+        except ValueError:
+            pass
+
+    def release(self, latency: Optional[float]):
+        if latency is not None:
+            self.avg_latency = latency if self.avg_latency is None else (
+                (1 - LATENCY_ALPHA) * self.avg_latency + LATENCY_ALPHA * latency
+            )
+        # Hand the slot straight to the next waiter, if any.
+        while self.waiters:
+            fut = self.waiters.popleft()
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "cache_fast_path": self.fast_path,
+            "shed": dict(self.shed),
+            "avg_latency_ms": round(self.avg_latency * 1000, 1) if self.avg_latency is not None else None,
+        }
+
+
+_gates: Dict[str, RouteGate] = {}
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {path: gate.snapshot() for path, gate in _gates.items()}
+
+
+# -----------------------------
+# ASGI middleware
+# -----------------------------
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes, receive):
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return replay
+
+
+def _client_timeout(scope) -> Optional[float]:
+    for name, value in scope.get("headers", []):
+        if name == TIMEOUT_HEADER:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class AdmissionControlMiddleware:
+    """
+    Per-route concurrency limits with a bounded wait queue.
+
+    - `limits` maps a path to its max concurrent requests; other paths pass
+      straight through.
+    - A request that cannot start within its budget (queue_timeout, or less
+      via the X-Request-Timeout header) is rejected with 503 + Retry-After;
+      if the expected wait already exceeds the budget it is rejected
+      immediately instead of occupying a queue slot.
+    - `cache_keys` maps a path to a function from the JSON body to the
+      Redis key its response is cached under. Requests whose key exists skip
+      the gate, so cache hits are served even when the route is saturated.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: Dict[str, int],
+        cache_keys: Optional[Dict[str, Callable[[Dict[str, Any]], Optional[str]]]] = None,
+        queue_size: int = 64,
+        queue_timeout: float = 10.0,
+    ):
+        self.app = app
+        self.cache_keys = cache_keys or {}
+        self.queue_timeout = queue_timeout
+        self.gates = {path: RouteGate(path, limit, queue_size) for path, limit in limits.items()}
+        _gates.update(self.gates)
+
+    async def __call__(self, scope, receive, send):
+        gate = self.gates.get(scope["path"]) if scope["type"] == "http" else None
+        if gate is None:
+            return await self.app(scope, receive, send)
+
+        key_fn = self.cache_keys.get(scope["path"])
+        if key_fn and scope["method"] == "POST":
+            body = await _read_body(receive)
+            receive = _replay(body, receive)
+            if await self._is_cached(key_fn, body):
+                gate.fast_path += 1
+                return await self.app(scope, receive, send)
+
+        budget = self.queue_timeout
+        client_timeout = _client_timeout(scope)
+        if client_timeout is not None:
+            budget = min(budget, client_timeout)
+
+        try:
+            await gate.acquire(budget)
+        except Shed as e:
+            logger.info("Shed %s (%s, %d queued)", scope["path"], e.reason, len(gate.waiters))
+            return await self._reject(send, e)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.perf_counter() - start)
+
+    async def _is_cached(self, key_fn, body: bytes) -> bool:
+        try:
+            key = key_fn(json.loads(body))
+        except Exception:
+            return False  # malformed body: let the route produce the 422
+        return bool(key) and await run_in_threadpool(cache_exists, key)
+
+    async def _reject(self, send, shed: Shed):
+        retry_after = max(1, math.ceil(shed.retry_after))
+        body = json.dumps({"detail": f"Server busy ({shed.reason}); retry later."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
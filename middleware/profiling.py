@@ -0,0 +1,198 @@
+import os
+import sys
+import time
+import uuid
+import random
+import logging
+import threading
+import datetime
+from collections import Counter, deque
+from typing import Dict, List, Optional, Any
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Only stacks that pass through our own code are kept; idle threadpool
+# workers and the event loop waiting on sockets are dropped.
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+
+# -----------------------------
+# Profile + bounded ring buffer
+# -----------------------------
+class Profile:
+    def __init__(self, method: str, path: str, interval_ms: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.interval_ms = interval_ms
+        self.started_at = datetime.datetime.utcnow().isoformat() + "Z"
+        self.duration_ms: float = 0.0
+        self.status_code: Optional[int] = None
+        self.stacks: Counter = Counter()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """
+        Brendan Gregg's collapsed-stack format, one `frame;frame;frame count`
+        line per unique stack. Feed it to flamegraph.pl or speedscope.
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 2),
+            "status_code": self.status_code,
+            "interval_ms": self.interval_ms,
+            "samples": self.samples,
+        }
+
+
+class ProfileStore:
+    """Keeps the last `maxlen` profiles; older ones fall off the end."""
+
+    def __init__(self, maxlen: int = 20):
+        self._profiles: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def resize(self, maxlen: int):
+        with self._lock:
+            self._profiles = deque(self._profiles, maxlen=maxlen)
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[Profile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            for p in self._profiles:
+                if p.id == profile_id:
+                    return p
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore()
+
+
+# -----------------------------
+# Wall-clock sampler
+# -----------------------------
+def _frame_label(frame) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def _is_app_frame(frame) -> bool:
+    filename = os.path.abspath(frame.f_code.co_filename)
+    return filename.startswith(APP_ROOT) and filename != _THIS_FILE and "site-packages" not in filename
+
+
+class _Sampler(threading.Thread):
+    """
+    Samples every thread's stack at a fixed wall-clock interval, so time spent
+    blocked on Mongo, Postgres or an HTTP call to the LLM shows up just like CPU
+    time. The sampler is process-wide: requests running concurrently with a
+    profiled one appear in its profile as well.
+    """
+
+    def __init__(self, interval_s: float, stacks: Counter):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval_s = interval_s
+        self.stacks = stacks
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            self.sample()
+
+    def sample(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            labels = []
+            in_app = False
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                in_app = in_app or _is_app_frame(frame)
+                frame = frame.f_back
+            if not in_app:
+                continue
+            labels.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        # Always take one sample so very short requests still leave a trace.
+        if not self.stacks:
+            self.sample()
+
+
+# -----------------------------
+# Middleware
+# -----------------------------
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Profiles a request when it carries `X-Profile: 1` or is picked by
+    `sample_rate` (0.0 - 1.0). The collapsed stacks are kept in `profile_store`
+    and the id is returned in the `X-Profile-Id` response header.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0, interval_ms: float = 5.0, buffer_size: int = 20):
+        super().__init__(app)
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        profile_store.resize(buffer_size)
+
+    def should_profile(self, request: Request) -> bool:
+        header = request.headers.get(PROFILE_HEADER, "").lower()
+        if header in ("1", "true", "yes"):
+            return True
+        if header in ("0", "false", "no"):
+            return False
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def dispatch(self, request: Request, call_next):
+        if not self.should_profile(request):
+            return await call_next(request)
+
+        profile = Profile(request.method, request.url.path, self.interval_ms)
+        sampler = _Sampler(self.interval_ms / 1000.0, profile.stacks)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            response = await call_next(request)
+            profile.status_code = response.status_code
+        finally:
+            sampler.stop()
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            profile_store.add(profile)
+            logger.info(
+                "Profiled %s %s in %.1f ms (%d samples, id=%s)",
+                profile.method, profile.path, profile.duration_ms, profile.samples, profile.id
+            )
+
+        response.headers[PROFILE_ID_HEADER] = profile.id
+        return response
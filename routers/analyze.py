@@ -1,12 +1,18 @@
+from typing import Any, Dict, Optional
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from dependency import get_postgres_db, get_mongo_db
-from schemas.analyze_schema import AnalyzeInput, AnalyzeOutput, RetrievedKnowledge
-from services.analyze_service import run_analyze_pipeline
+from schemas.analyze_schema import AnalyzeInput, AnalyzeOutput, RetrievedKnowledge, AnalyzeBatchInput, AnalyzeBatchOutput
+from services.analyze_service import run_analyze_pipeline, run_analyze_batch, analyze_cache_key
 
 router = APIRouter()
 
 
+def admission_cache_key(body: Dict[str, Any]) -> Optional[str]:
+    """Cache key a POST /analyze body will be answered from (admission fast path)."""
+    return analyze_cache_key(" ".join(body["text"].split()))
+
+
 @router.post("/analyze", response_model=AnalyzeOutput)
 def analyze_text(
     payload: AnalyzeInput,
@@ -20,16 +26,19 @@ def analyze_text(
     - Uses LLM to synthesize insights, contradictions, and missing points
     """
     result = run_analyze_pipeline(payload.text, db, mongo)
-    
-    return {
-        "insights": result.insights["insights"],
-        "related": [
-            {
-                "topic": r.get("topic"),
-                "summary": r.get("summary"),
-                "similarity": r.get("similarity"),
-            } for r in result.get("related", [])
-        ],
-        "contradictions": result.insights.get("contradictions", []),
-        "missing_points": result.insights.get("missing_points", []),
-    }
\ No newline at end of file
+    return result
+
+
+@router.post("/analyze/batch", response_model=AnalyzeBatchOutput)
+def analyze_batch(
+    payload: AnalyzeBatchInput,
+    db: Session = Depends(get_postgres_db),
+    mongo = Depends(get_mongo_db)
+):
+    """
+    /graph/analyze for up to ANALYZE_BATCH_MAX_SIZE texts in one call.
+    Results come back in input order; shared work (cache lookup, embedding,
+    retrieval) is done once for the whole batch.
+    """
+    results = run_analyze_batch(payload.texts, db, mongo)
+    return {"results": results, "cache_hits": sum(1 for r in results if r.get("cached"))}
@@ -0,0 +1,97 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from middleware.profiling import profile_store
+from middleware.admission import admission_stats
+from tools import pool_metrics, job_queue, rate_limiter, llm_cache, s3_tool
+
+router = APIRouter()
+
+
+@router.get("/profiles")
+def list_profiles():
+    """
+    Most recent request profiles first (bounded by PROFILING_BUFFER_SIZE).
+    """
+    return {"profiles": [p.summary() for p in profile_store.list()]}
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    """
+    Collapsed-stack output for one profile, ready for flamegraph.pl / speedscope.
+    """
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return profile.collapsed()
+
+
+@router.delete("/profiles")
+def clear_profiles():
+    profile_store.clear()
+    return {"status": "ok"}
+
+
+@router.get("/pools")
+def pool_stats():
+    """
+    Connection pool saturation for Postgres, Mongo and Redis: connections in
+    use vs. the configured maximum, checkout wait times and failures.
+    """
+    return {"pools": pool_metrics.snapshot()}
+
+
+@router.get("/jobs")
+def job_queue_depth():
+    """
+    Research job backlog: queued, in progress and waiting for a retry.
+    """
+    return {"research": job_queue.queue_depth()}
+
+
+@router.get("/llm")
+def llm_limits():
+    """
+    OpenAI limiter state per model: adaptive concurrency limit, in-flight and
+    queued calls (by priority), and request / token usage over the last minute.
+    """
+    return {"models": rate_limiter.snapshot()}
+
+
+@router.get("/llm-cache")
+def llm_cache_stats():
+    """
+    Completion cache hits per tier, misses, and tokens saved vs. spent.
+    """
+    return llm_cache.stats()
+
+
+@router.get("/s3-cache")
+def s3_cache_stats():
+    """
+    On-disk S3 download cache: size vs. budget, hits, misses and evictions.
+    """
+    cache = s3_tool.get_download_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+@router.get("/admission")
+def admission():
+    """
+    Admission control per route: concurrency limit, in-flight and queued
+    requests, cache fast-path hits and shed counts by reason.
+    """
+    return {"routes": admission_stats()}
+
+
+@router.get("/index-sync")
+def index_sync_stats():
+    """
+    Incremental index sync: mode (change stream / polling), delta size,
+    tombstones, applied counts and replication lag.
+    """
+    from tools.index_sync import get_index_sync  # deferred: pulls in numpy
+
+    sync = get_index_sync(include_unready=True)
+    return sync.stats() if sync else {"enabled": False}
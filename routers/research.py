@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from config import settings
 from dependency import get_postgres_db, get_mongo_db
-from schemas.research_schema import ResearchInput, ResearchOutput
-from services.research_service import run_research_pipeline
+from schemas.research_schema import ResearchInput, ResearchOutput, ResearchJob
+from services.research_service import run_research_pipeline, research_cache_key
+from tools import job_queue
+from tools.cache import cache_get
 
 router = APIRouter()
 
 
+def admission_cache_key(body: Dict[str, Any]) -> Optional[str]:
+    """Cache key a POST /research body will be answered from (admission fast path)."""
+    return research_cache_key(body["topic"])
+
+
 @router.post("/research", response_model=ResearchOutput)
 def research_topic(
     payload: ResearchInput,
@@ -24,3 +33,39 @@ def research_topic(
     """
     result = run_research_pipeline(payload, db, mongo)
     return result
+
+
+def _job_response(job) -> dict:
+    return {"job_id": job["id"], **job}
+
+
+@router.post("/research/jobs", response_model=ResearchJob, status_code=202)
+def enqueue_research(payload: ResearchInput):
+    """
+    Asynchronous research: queue the topic for `worker.py` and return a job id
+    immediately. Poll GET /chain/research/jobs/{job_id} for the result.
+    """
+    topic = payload.topic.strip()
+    if not topic:
+        raise HTTPException(status_code=400, detail="Empty topic provided.")
+
+    try:
+        job = job_queue.enqueue_research(topic, cached_result=cache_get(research_cache_key(topic)))
+    except job_queue.QueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(settings.JOB_RETRY_AFTER_SECONDS)},
+        )
+    return _job_response(job)
+
+
+@router.get("/research/jobs/{job_id}", response_model=ResearchJob)
+def get_research_job(job_id: str):
+    """
+    Job state: queued, running, retrying, succeeded (with `result`) or failed (with `error`).
+    """
+    job = job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return _job_response(job)
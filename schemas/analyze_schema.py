@@ -20,3 +20,12 @@ class AnalyzeOutput(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class AnalyzeBatchInput(BaseModel):
+    texts: List[str]
+
+
+class AnalyzeBatchOutput(BaseModel):
+    results: List[AnalyzeOutput]
+    cache_hits: int = 0
@@ -16,3 +16,14 @@ class ResearchOutput(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class ResearchJob(BaseModel):
+    job_id: str
+    topic: str
+    status: str
+    attempts: int = 0
+    created_at: str
+    updated_at: str
+    result: Optional[ResearchOutput] = None
+    error: Optional[str] = None
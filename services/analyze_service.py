@@ -4,17 +4,19 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
-from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
-
 from tools.embeddings import embed_texts_openai
-from tools.db_retrieval_tool import get_related_research
-from tools.cache import cache_get, cache_set
+from tools.db_retrieval_tool import get_related_research, get_related_research_many
+from tools.cache import cache_get, cache_set, cache_get_many, cache_set_many
+from tools.rate_limiter import limited_call, estimate_tokens, LLMBusyError
+from tools.llm_cache import cached_completion, is_json
+from config import settings
 
 import hashlib
 import datetime
 import json
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -77,23 +79,21 @@ def make_retrieval_node(db: Session, mongo_db):
 # --------------------------------------------------
 # NODE 5: SynthesisNode — generate insights via LLM
 # --------------------------------------------------
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
-import json
-import logging
-
-logger = logging.getLogger(__name__)
-
 def synthesis_node(state):
+    # Deferred: LangChain/OpenAI take most of the worker's import time.
+    from langchain_openai import ChatOpenAI
+    from langchain_core.messages import HumanMessage
+
     llm = ChatOpenAI(
         model="gpt-4o-mini",
-        temperature=0.0
+        temperature=0.0,
+        max_retries=0,  # 429s are retried by the rate limiter
     )
 
     # Build context from related docs
     if state.related:
         related_block = "\n\n".join(
-            f"Topic: {r['topic']}\nSummary: {r['summary']}\nSimilarity: {r['similarity']}"
+            f"Topic: {r['topic']}\nSummary: {r['summary']}\nSimilarity: {r['similarity']:.4f}"
             for r in state.related
         )
     else:
@@ -118,9 +118,15 @@ def synthesis_node(state):
 
     try:
         # Call the LLM correctly
-        response = llm([HumanMessage(content=prompt_text)])
-        raw = response.content
+        tokens = estimate_tokens(prompt_text) + settings.OPENAI_COMPLETION_TOKENS_ESTIMATE
+        raw = cached_completion(
+            "gpt-4o-mini", 0.0, prompt_text,
+            lambda: limited_call("gpt-4o-mini", tokens, lambda: llm([HumanMessage(content=prompt_text)])),
+            validate=is_json,
+        )
         parsed = json.loads(raw)
+    except LLMBusyError:
+        raise
     except Exception as e:
         logger.warning("LLM returned non-JSON or failed: %s", e)
         parsed = {
@@ -138,6 +144,8 @@ def synthesis_node(state):
 # BUILD THE LANGGRAPH
 # --------------------------------------------------
 def build_graph(db: Session, mongo_db):
+    from langgraph.graph import StateGraph, END  # deferred: heavy import
+
     graph = StateGraph(AnalyzeState)
 
     # Add nodes
@@ -160,6 +168,31 @@ def build_graph(db: Session, mongo_db):
     return graph.compile()
 
 
+# --------------------------------------------------
+# RESULT HELPERS
+# --------------------------------------------------
+def analyze_cache_key(normalized: str) -> str:
+    return "analyze:" + hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def _format_result(state: AnalyzeState) -> Dict[str, Any]:
+    # Format API response
+    return {
+        "insights": state.insights["insights"],
+        "related": [
+            {
+                "topic": r["topic"],
+                "summary": r["summary"],
+                "similarity": r["similarity"],
+            }
+            for r in (state.related or [])
+        ],
+        "contradictions": state.insights.get("contradictions", []),
+        "missing_points": state.insights.get("missing_points", []),
+        "generated_at": datetime.datetime.utcnow().isoformat() + "Z"
+    }
+
+
 # --------------------------------------------------
 # PUBLIC PIPELINE FUNCTION
 # --------------------------------------------------
@@ -172,7 +205,7 @@ def run_analyze_pipeline(
 
     # Normalize early to build stable cache key
     normalized = " ".join(text.strip().split())
-    cache_key = "analyze:" + hashlib.sha1(normalized.encode()).hexdigest()
+    cache_key = analyze_cache_key(normalized)
 
     if use_cache:
         cached = cache_get(cache_key)
@@ -182,25 +215,63 @@ def run_analyze_pipeline(
     # Build graph instance
     app = build_graph(db, mongo_db)
 
-    # Execute graph
-    final_state: AnalyzeState = app.invoke(AnalyzeState(text=text))
-
-    # Format API response
-    result = {
-        "insights": final_state.insights["insights"],
-        "related": [
-            {
-                "topic": r["topic"],
-                "summary": r["summary"],
-                "similarity": r["similarity"],
-            }
-            for r in (final_state.related or [])
-        ],
-        "contradictions": final_state.insights.get("contradictions", []),
-        "missing_points": final_state.insights.get("missing_points", []),
-        "generated_at": datetime.datetime.utcnow().isoformat() + "Z"
-    }
+    # Execute graph (LangGraph returns the final state as a plain dict)
+    final_state = AnalyzeState(**app.invoke(AnalyzeState(text=text)))
 
+    result = _format_result(final_state)
     cache_set(cache_key, result, ttl_seconds=3600)
 
     return result
+
+
+# --------------------------------------------------
+# BATCH PIPELINE FUNCTION
+# --------------------------------------------------
+def run_analyze_batch(
+    texts: List[str],
+    db: Session,
+    mongo_db,
+    use_cache: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    run_analyze_pipeline for many texts, results in input order. Duplicate
+    and cached texts are answered once; the rest share one embedding call,
+    one similarity pass and one Postgres lookup, and are synthesized with at
+    most ANALYZE_BATCH_CONCURRENCY LLM calls in flight.
+    """
+    if len(texts) > settings.ANALYZE_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {settings.ANALYZE_BATCH_MAX_SIZE} texts per batch.")
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            raise HTTPException(status_code=400, detail=f"Empty text provided at index {i}.")
+
+    keys = []
+    unique: Dict[str, str] = {}  # cache key -> normalized text, first occurrence order
+    for text in texts:
+        normalized = " ".join(text.strip().split())
+        key = analyze_cache_key(normalized)
+        keys.append(key)
+        unique.setdefault(key, normalized)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    if use_cache:
+        results = {k: {**v, "cached": True} for k, v in cache_get_many(list(unique)).items()}
+
+    misses = [k for k in unique if k not in results]
+    if misses:
+        states = [AnalyzeState(text=unique[k], normalized=unique[k]) for k in misses]
+        vectors = embed_texts_openai([s.normalized for s in states], model="text-embedding-3-large")
+        related = get_related_research_many(db, mongo_db["embeddings"], vectors, top_k=5)
+        for state, vec, rel in zip(states, vectors, related):
+            state.embedding = vec
+            state.related = rel
+
+        with ThreadPoolExecutor(max_workers=settings.ANALYZE_BATCH_CONCURRENCY) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, synthesis_node, s) for s in states]
+            fresh = {k: _format_result(f.result()) for k, f in zip(misses, futures)}
+
+        cache_set_many(fresh, ttl_seconds=3600)
+        results.update(fresh)
+
+    return [results[k] for k in keys]
+
@@ -2,28 +2,36 @@
 
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable
 
 from tools.web_search_tool import search
-from tools.s3_tool import upload_text_to_s3
+from tools.s3_tool import upload_text_to_s3_async
 from tools.embeddings import create_and_store_embedding
 from tools.cache import cache_set, cache_get
+from tools.rate_limiter import limited_call, estimate_tokens, llm_priority, BULK
+from tools.llm_cache import cached_completion, is_json
+from config import settings
 from models.research import Research
 from schemas.research_schema import ResearchInput
 
 # -----------------------------------
 # LangChain LLM Integration
 # -----------------------------------
-
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def llm_summarize(text: str) -> Dict[str, Any]:
+    # Deferred: LangChain/OpenAI take most of the worker's import time.
+    from langchain_openai import ChatOpenAI
+    from langchain_core.prompts import ChatPromptTemplate
+
     llm = ChatOpenAI(
         model="gpt-4o-mini",
         temperature=0.2,
+        max_retries=0,  # 429s are retried by the rate limiter
     )
 
     prompt = ChatPromptTemplate.from_messages([
@@ -51,8 +59,14 @@ def llm_summarize(text: str) -> Dict[str, Any]:
 
 
     chain = prompt | llm
-    response = chain.invoke({"text": text})
-    content = response.content.strip()
+    rendered = "\n".join(f"{m.type}: {m.content}" for m in prompt.format_messages(text=text))
+    tokens = estimate_tokens(rendered) + settings.OPENAI_COMPLETION_TOKENS_ESTIMATE
+    content = cached_completion(
+        "gpt-4o-mini", 0.2, rendered,
+        lambda: limited_call("gpt-4o-mini", tokens, lambda: chain.invoke({"text": text})),
+        opt_in=settings.LLM_CACHE_SUMMARIZE,
+        validate=is_json,
+    ).strip()
 
     try:
         return json.loads(content)
@@ -64,51 +78,104 @@ def llm_summarize(text: str) -> Dict[str, Any]:
 # -----------------------------------
 # Research Pipeline
 # -----------------------------------
-def run_research_pipeline(payload: ResearchInput, db: Session, mongo_db):
-    topic = payload.topic.strip()
+def research_cache_key(topic: str) -> str:
+    return f"research:{topic.strip()}"
+
+
+def run_research_pipeline(payload: ResearchInput, db: Session, mongo_db, research_id: Optional[int] = None, on_saved: Optional[Callable[[int], None]] = None):
+    """
+    Research a topic end to end. `on_saved` is called with the new Research
+    id once its row is committed; passing that id back as `research_id`
+    resumes the pipeline from there (used by worker.py on retries), so a
+    retried job does not insert a second row, object or embedding.
+    """
+    # Research is bulk work: its LLM / embedding calls queue behind /graph/analyze.
+    with llm_priority(BULK):
+        return _run_research_pipeline(payload, db, mongo_db, research_id, on_saved)
 
-    # 1. Check cache
-    cached = cache_get(f"research:{topic}")
-    if cached:
-        return {**cached, "cached": True}
 
-    # 2. Web search
+def _search_text(topic: str) -> str:
     results = search(topic, num=5)
     if not results:
         raise HTTPException(500, "Search failed.")
 
-    raw_text = "\n\n".join(
+    return "\n\n".join(
         f"TITLE: {r['title']}\nSNIPPET: {r['snippet']}\nLINK: {r['link']}"
         for r in results
     )
 
-    # 3. LLM summary using LangChain
-    summary_data = llm_summarize(raw_text)
-    summary = summary_data.get("summary", "")
-    tags = summary_data.get("tags", [])
-    tags_str = ",".join(tags)
 
-    # 4. Save metadata to Postgres
-    research_obj = Research(topic=topic, summary=summary, tags=tags_str)
-    db.add(research_obj)
+def _record_upload(db: Session, research_obj: Research, upload):
+    research_obj.s3_url = upload.result()
     db.commit()
     db.refresh(research_obj)
 
-    # 5. Upload raw research text to S3
-    key = f"research/{research_obj.id}_{topic.replace(' ', '_')}.txt"
-    s3_url = upload_text_to_s3(raw_text, key)
-    research_obj.s3_url = s3_url
-    db.commit()
-    db.refresh(research_obj)
+
+def _run_research_pipeline(payload: ResearchInput, db: Session, mongo_db, research_id: Optional[int], on_saved):
+    topic = payload.topic.strip()
+
+    # 1. Check cache
+    cached = cache_get(research_cache_key(topic))
+    if cached:
+        return {**cached, "cached": True}
+
+    research_obj = db.get(Research, research_id) if research_id is not None else None
+    raw_text = None
+    if research_obj is None:
+        # 2. Web search
+        raw_text = _search_text(topic)
+
+        # 3. LLM summary using LangChain
+        summary_data = llm_summarize(raw_text)
+        summary = summary_data.get("summary", "")
+        tags = summary_data.get("tags", [])
+        tags_str = ",".join(tags)
+
+        # 4. Save metadata to Postgres
+        research_obj = Research(topic=topic, summary=summary, tags=tags_str)
+        db.add(research_obj)
+        db.commit()
+        db.refresh(research_obj)
+        if on_saved:
+            on_saved(research_obj.id)
+        resumed = False
+    else:
+        # Resuming a retried job: steps 2-4 already ran.
+        summary = research_obj.summary
+        tags = [t for t in research_obj.tags.split(",") if t]
+        resumed = True
+
+    # 5. Upload raw research text to S3 (in the background, overlapping step 6)
+    upload = None
+    if not research_obj.s3_url:
+        if raw_text is None:
+            raw_text = _search_text(topic)  # search results are cached, so normally the same text
+        key = f"research/{research_obj.id}_{topic.replace(' ', '_')}.txt"
+        upload = upload_text_to_s3_async(raw_text, key)
 
     # 6. Generate & store embedding
     mongo_coll = mongo_db["embeddings"]
-    create_and_store_embedding(
-        mongo_coll,
-        research_id=research_obj.id,
-        topic=topic,
-        text=summary,
-    )
+    try:
+        if not resumed or mongo_coll.find_one({"research_id": research_obj.id}, {"_id": 1}) is None:
+            create_and_store_embedding(
+                mongo_coll,
+                research_id=research_obj.id,
+                topic=topic,
+                text=summary,
+            )
+    except Exception:
+        # Record the upload anyway, so a retry skips it, but never let that
+        # replace the embedding error being raised.
+        if upload is not None:
+            try:
+                _record_upload(db, research_obj, upload)
+            except Exception:
+                logger.exception("Could not record the S3 upload for research %s", research_obj.id)
+        raise
+    if upload is not None:
+        _record_upload(db, research_obj, upload)
+
+    s3_url = research_obj.s3_url
 
     # 7. Cache final output
     result = {
@@ -120,6 +187,6 @@ def run_research_pipeline(payload: ResearchInput, db: Session, mongo_db):
         "created_at": research_obj.created_at.isoformat(),
     }
 
-    cache_set(f"research:{topic}", result, ttl_seconds=3600)
+    cache_set(research_cache_key(topic), result, ttl_seconds=3600)
 
     return result
@@ -0,0 +1,39 @@
+# snapshot_index.py
+"""
+Build or refresh the memory-mapped vector index in VECTOR_INDEX_DIR from the
+Mongo `embeddings` collection (see tools/vector_index.py).
+
+    python snapshot_index.py                 # incremental: new documents only
+    python snapshot_index.py --full          # rebuild (also drops deleted docs)
+    python snapshot_index.py --every 60      # keep refreshing once a minute
+
+Run a single builder per index directory; API workers only read it.
+"""
+import argparse
+import logging
+import time
+
+from config import settings, get_mongo_db
+from tools.vector_index import build_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped vector index snapshot.")
+    parser.add_argument("--dir", default=settings.VECTOR_INDEX_DIR)
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch instead of appending")
+    parser.add_argument("--every", type=float, default=0, help="repeat every N seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not args.dir:
+        parser.error("set VECTOR_INDEX_DIR or pass --dir")
+
+    coll = get_mongo_db()["embeddings"]
+    build_snapshot(coll, args.dir, full=args.full)
+    while args.every:
+        time.sleep(args.every)
+        build_snapshot(coll, args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import json
-from typing import Any, Optional
-from config import redis_client
+from typing import Any, Dict, List, Optional
+from config import get_redis_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,9 +14,9 @@ def cache_set(key: str, value: Any, ttl_seconds: int | None = 3600) -> bool:
     try:
         payload = json.dumps(value, default=str)
         if ttl_seconds:
-            redis_client.set(key, payload, ex=ttl_seconds)
+            get_redis_client().set(key, payload, ex=ttl_seconds)
         else:
-            redis_client.set(key, payload)
+            get_redis_client().set(key, payload)
         return True
     except Exception as e:
         logger.exception("Failed to set cache for key %s: %s", key, e)
@@ -28,7 +28,7 @@ def cache_get(key: str) -> Optional[Any]:
     Return parsed JSON value or None if missing.
     """
     try:
-        val = redis_client.get(key)
+        val = get_redis_client().get(key)
         if not val:
             return None
         return json.loads(val)
@@ -37,9 +37,62 @@ def cache_get(key: str) -> Optional[Any]:
         return None
 
 
+def cache_exists(key: str) -> bool:
+    """
+    True if `key` is cached. Cheaper than cache_get: nothing is transferred
+    or parsed. Redis errors count as a miss.
+    """
+    try:
+        return bool(get_redis_client().exists(key))
+    except Exception as e:
+        logger.warning("Failed to check cache for key %s: %s", key, e)
+        return False
+
+
+def cache_get_many(keys: List[str]) -> Dict[str, Any]:
+    """
+    Parsed values for every key present, fetched with one MGET.
+    Missing keys (and all keys, if Redis fails) are left out, as are values
+    that are not valid JSON.
+    """
+    if not keys:
+        return {}
+    try:
+        values = get_redis_client().mget(keys)
+    except Exception as e:
+        logger.exception("Failed to get cache for %d keys: %s", len(keys), e)
+        return {}
+    found = {}
+    for key, val in zip(keys, values):
+        if not val:
+            continue
+        try:
+            found[key] = json.loads(val)
+        except ValueError as e:
+            logger.warning("Ignoring unparseable cache value for key %s: %s", key, e)
+    return found
+
+
+def cache_set_many(items: Dict[str, Any], ttl_seconds: int | None = 3600) -> bool:
+    """
+    Store several JSON-serializable values in one pipelined round trip.
+    """
+    if not items:
+        return True
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, json.dumps(value, default=str), ex=ttl_seconds or None)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.exception("Failed to set cache for %d keys: %s", len(items), e)
+        return False
+
+
 def cache_delete(key: str) -> bool:
     try:
-        redis_client.delete(key)
+        get_redis_client().delete(key)
         return True
     except Exception as e:
         logger.exception("Failed to delete cache key %s: %s", key, e)
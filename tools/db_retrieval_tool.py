@@ -1,10 +1,12 @@
-from typing import List, Dict, Any, Optional
+from __future__ import annotations
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 from sqlalchemy.orm import Session
-from pymongo.collection import Collection
 from models.research import Research  # SQLAlchemy model
-from bson import ObjectId
 import logging
 
+if TYPE_CHECKING:  # pymongo is only needed for annotations here
+    from pymongo.collection import Collection
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,12 +21,9 @@ def get_research_by_id(db: Session, research_id: int) -> Optional[Research]:
     return db.query(Research).filter(Research.id == research_id).first()
 
 
-def find_similar_embeddings(mongo_coll: Collection, embedding_vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+def _score_documents(cursor, embedding_vector: List[float]) -> List[Dict[str, Any]]:
     """
-    Basic similarity retrieval using cosine similarity calculated in Python.
-    For production use, use a vector DB (Milvus, Pinecone, or MongoDB Atlas Vector Search).
-    mongo_coll is a pymongo Collection instance (e.g., mongo_db['embeddings'])
-    Each document in collection expected to have fields: 'research_id', 'embedding', 'topic', 'created_at'
+    Cosine similarity of every embedding document in `cursor`, computed in Python.
     """
     import math
 
@@ -35,7 +34,6 @@ def find_similar_embeddings(mongo_coll: Collection, embedding_vector: List[float
         return math.sqrt(sum(x*x for x in a))
 
     results = []
-    cursor = mongo_coll.find({})
     for doc in cursor:
         vec = doc.get("embedding")
         if not vec:
@@ -51,6 +49,81 @@ def find_similar_embeddings(mongo_coll: Collection, embedding_vector: List[float
             "similarity": float(similarity),
             "_id": str(doc.get("_id"))
         })
+    return results
+
+
+def _score_documents_many(cursor, vectors: List[List[float]], top_k: int, chunk_size: int = 2048) -> List[List[Dict[str, Any]]]:
+    """
+    Top-k cosine matches for every query vector in one pass over `cursor`:
+    documents are stacked into chunks and scored with a matrix product.
+    Float64 throughout, so scores match _score_documents.
+    """
+    import numpy as np
+
+    queries = np.asarray(vectors, dtype=np.float64)
+    dim = queries.shape[1]
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    candidates: List[List[Dict[str, Any]]] = [[] for _ in range(len(queries))]
+
+    def score(docs, rows):
+        matrix = np.asarray(rows, dtype=np.float64)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        sims = queries @ matrix.T
+        k = min(top_k, len(docs))
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        for qi, row_ids in enumerate(top):
+            for row in row_ids:
+                doc = docs[row]
+                candidates[qi].append({
+                    "research_id": doc.get("research_id"),
+                    "topic": doc.get("topic"),
+                    "similarity": float(sims[qi, row]),
+                    "_id": str(doc.get("_id")),
+                })
+
+    docs, rows = [], []
+    for doc in cursor:
+        vec = doc.get("embedding")
+        if not vec or len(vec) != dim:
+            continue
+        docs.append(doc)
+        rows.append(vec)
+        if len(docs) == chunk_size:
+            score(docs, rows)
+            docs, rows = [], []
+    if docs:
+        score(docs, rows)
+    return candidates
+
+
+def find_similar_embeddings(mongo_coll: Collection, embedding_vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Basic similarity retrieval using cosine similarity.
+    For production use, use a vector DB (Milvus, Pinecone, or MongoDB Atlas Vector Search).
+    mongo_coll is a pymongo Collection instance (e.g., mongo_db['embeddings'])
+    Each document in collection expected to have fields: 'research_id', 'embedding', 'topic', 'created_at'
+
+    When VECTOR_INDEX_DIR holds a snapshot (tools/vector_index.py) it is searched
+    instead of the full collection; only documents newer than the snapshot's
+    watermark are still read from Mongo. With INDEX_SYNC_ENABLED those are
+    already in memory (tools/index_sync.py) and Mongo is not read at all.
+    """
+    from tools.vector_index import get_vector_index  # deferred: pulls in numpy
+    from tools.index_sync import get_index_sync
+
+    sync = get_index_sync()
+    if sync is not None and sync.dim == len(embedding_vector):
+        return sync.search_many([embedding_vector], top_k=top_k)[0]
+
+    index = get_vector_index()
+    if index is not None and index.dim == len(embedding_vector):
+        from bson import ObjectId
+
+        results = index.search(embedding_vector, top_k=top_k)
+        tail = mongo_coll.find({"_id": {"$gte": ObjectId(index.watermark)}})
+        results += _score_documents(tail, embedding_vector)
+    else:
+        results = _score_documents(mongo_coll.find({}), embedding_vector)
 
     # sort by similarity descending
     results.sort(key=lambda x: x["similarity"], reverse=True)
@@ -75,3 +148,61 @@ def get_related_research(db: Session, mongo_coll: Collection, embedding_vector:
                 "created_at": research.created_at.isoformat() if research.created_at else None
             })
     return related
+
+
+def find_similar_embeddings_many(mongo_coll: Collection, embedding_vectors: List[List[float]], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+    """
+    find_similar_embeddings for several query vectors at once: the snapshot
+    (or, without one, the collection) is scanned once for all of them.
+    """
+    from tools.vector_index import get_vector_index  # deferred: pulls in numpy
+    from tools.index_sync import get_index_sync
+
+    if not embedding_vectors:
+        return []
+    sync = get_index_sync()
+    if sync is not None and sync.dim == len(embedding_vectors[0]):
+        return sync.search_many(embedding_vectors, top_k=top_k)
+
+    index = get_vector_index()
+    if index is not None and index.dim == len(embedding_vectors[0]):
+        from bson import ObjectId
+
+        results = index.search_many(embedding_vectors, top_k=top_k)
+        tail = mongo_coll.find({"_id": {"$gte": ObjectId(index.watermark)}})
+        for found, extra in zip(results, _score_documents_many(tail, embedding_vectors, top_k)):
+            found += extra
+    else:
+        results = _score_documents_many(mongo_coll.find({}), embedding_vectors, top_k)
+
+    for found in results:
+        found.sort(key=lambda x: x["similarity"], reverse=True)
+    return [found[:top_k] for found in results]
+
+
+def get_related_research_many(db: Session, mongo_coll: Collection, embedding_vectors: List[List[float]], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+    """
+    get_related_research for several query vectors, with one similarity pass
+    and one Postgres query for all of their matches.
+    """
+    sims_per_query = find_similar_embeddings_many(mongo_coll, embedding_vectors, top_k=top_k)
+    ids = {s["research_id"] for sims in sims_per_query for s in sims}
+    rows = db.query(Research).filter(Research.id.in_(ids)).all() if ids else []
+    by_id = {r.id: r for r in rows}
+
+    related_per_query = []
+    for sims in sims_per_query:
+        related = []
+        for s in sims:
+            research = by_id.get(s["research_id"])
+            if research:
+                related.append({
+                    "research_id": research.id,
+                    "topic": research.topic,
+                    "summary": research.summary,
+                    "similarity": s["similarity"],
+                    "s3_url": research.s3_url,
+                    "created_at": research.created_at.isoformat() if research.created_at else None
+                })
+        related_per_query.append(related)
+    return related_per_query
@@ -0,0 +1,125 @@
+"""
+Size-bounded on-disk LRU cache for immutable blobs.
+
+One file per entry, named by the SHA-256 of the key; a file's mtime is its
+last-use time. Writes go through a temp file + rename, so readers (including
+other worker processes sharing the directory) never see partial entries.
+When the directory grows past `max_bytes`, least recently used files are
+removed until it is back under 90% of the budget.
+"""
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # bytes on disk, computed lazily
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def open(self, key: str):
+        """Open the entry for reading (binary), or return None on a miss."""
+        path = self.path(key)
+        try:
+            f = open(path, "rb")
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return f
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self.path(key)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Disk cache write failed for %s: %s", key, e)
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data) - old
+        self._evict_if_needed()
+
+    def delete(self, key: str):
+        path = self.path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            if self._size <= self.max_bytes:
+                return
+            # Rescan: other processes may have added or evicted entries.
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            self._size = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for path, size, _ in entries:
+                if self._size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._size -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,7 +1,6 @@
 import os
 import logging
 from typing import List, Optional, Dict, Any
-from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,8 +11,13 @@ OPENAI_API_KEY = os.getenv("LLM_API_KEY") or os.getenv("OPENAI_API_KEY")
 
 
 def embed_texts_openai(texts: List[str], model="text-embedding-3-large"):
-    embedder = OpenAIEmbeddings(model=model)
-    return embedder.embed_documents(texts)
+    from langchain_openai import OpenAIEmbeddings  # deferred: heavy import
+
+    from tools.rate_limiter import limited_call, estimate_tokens
+
+    embedder = OpenAIEmbeddings(model=model, max_retries=0)  # 429s are retried by the rate limiter
+    tokens = sum(estimate_tokens(t) for t in texts)
+    return limited_call(model, tokens, lambda: embedder.embed_documents(texts))
 
 
 def create_and_store_embedding(mongo_coll, research_id: int, topic: str, text: str, model: str = "text-embedding-3-large") -> Dict[str, Any]:
@@ -0,0 +1,521 @@
+"""
+Keeps retrieval current between vector index snapshots.
+
+IndexSync follows the Mongo `embeddings` collection and maintains an
+in-memory delta on top of the mmap snapshot (tools/vector_index.py):
+
+  * inserted documents newer than the snapshot watermark become delta rows;
+  * deleted documents become tombstones, hiding them in both the snapshot
+    and the delta.
+
+Changes come from a change stream when the deployment supports one (replica
+set / sharded cluster). Otherwise, on standalone servers and mongomock, the
+collection is polled by `_id`, re-reading a short overlap window because
+ObjectIds from different clients are only roughly ordered; deletes are then
+found by a periodic reconcile of `_id`s. Changes are applied in small
+batches, and readers always see a consistent, immutable state, so searches
+never take a lock.
+
+The delta only ever holds what is newer than the snapshot, so the sync
+requires VECTOR_INDEX_DIR and waits for a snapshot before catching up. When
+a builder swaps in a newer snapshot, delta rows it now covers are dropped. Searches through find_similar_embeddings use the sync once its
+initial catch-up is done, instead of scanning the Mongo tail per query.
+"""
+import time
+import logging
+import datetime
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import settings
+from tools.vector_index import OBJECT_ID_BYTES, get_vector_index
+
+logger = logging.getLogger(__name__)
+
+# Snapshot results fetched beyond top_k to make up for tombstoned rows.
+MAX_OVERFETCH = 1000
+# Snapshot rows whose ids reconcile reads once their range's count is off.
+RECONCILE_LEAF_ROWS = 512
+
+_OID_DTYPE = f"S{OBJECT_ID_BYTES}"
+
+
+def _oid_bytes(value) -> bytes:
+    # numpy drops trailing NULs from S12 scalars; restore the full 12 bytes.
+    return bytes(value).ljust(OBJECT_ID_BYTES, b"\0")
+
+
+class _Chunk:
+    """One applied batch of delta rows (immutable once published)."""
+
+    def __init__(self, vectors: np.ndarray, ids: List[str], research_ids: List[Any], topics: List[str]):
+        self.vectors = vectors
+        self.ids = np.asarray(ids, dtype="<U24")
+        self.research_ids = research_ids
+        self.topics = topics
+
+    def select(self, mask: np.ndarray) -> "_Chunk":
+        keep = np.flatnonzero(mask)
+        return _Chunk(
+            self.vectors[keep],
+            self.ids[keep].tolist(),
+            [self.research_ids[i] for i in keep],
+            [self.topics[i] for i in keep],
+        )
+
+    @classmethod
+    def concat(cls, chunks: List["_Chunk"]) -> "_Chunk":
+        return cls(
+            np.vstack([c.vectors for c in chunks]),
+            [i for c in chunks for i in c.ids.tolist()],
+            [r for c in chunks for r in c.research_ids],
+            [t for c in chunks for t in c.topics],
+        )
+
+
+class _State:
+    def __init__(self, chunks: Tuple[_Chunk, ...], tombstones: frozenset, base_watermark: Optional[str]):
+        self.chunks = chunks
+        self.tombstones = tombstones
+        self.base_watermark = base_watermark
+
+    @property
+    def rows(self) -> int:
+        return sum(len(c.ids) for c in self.chunks)
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _live_tombstones(tombstones: frozenset, chunks: List[_Chunk], index) -> frozenset:
+    """
+    The tombstones that still hide a row in the snapshot or the delta. Rows
+    dropped by a full rebuild no longer need one.
+    """
+    if not tombstones:
+        return tombstones
+    ids = np.array(sorted(tombstones), dtype="<U24")
+    live = np.zeros(len(ids), dtype=bool)
+    for chunk in chunks:
+        live |= np.isin(ids, chunk.ids)
+    if index is not None:
+        raw = np.frombuffer(b"".join(bytes.fromhex(i) for i in ids.tolist()), dtype=_OID_DTYPE)
+        for seg in index.segments:
+            if seg.count:
+                live |= np.isin(raw, seg.object_ids.view(_OID_DTYPE).ravel())
+    return frozenset(ids[live].tolist())
+
+
+class IndexSync:
+    def __init__(
+        self,
+        mongo_coll,
+        batch_size: int = 100,
+        flush_seconds: float = 0.5,
+        poll_seconds: float = 2.0,
+        reconcile_seconds: float = 300.0,
+        overlap_seconds: float = 5.0,
+    ):
+        self.coll = mongo_coll
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.poll_seconds = poll_seconds
+        self.reconcile_seconds = reconcile_seconds
+        self.overlap_seconds = overlap_seconds
+
+        self.dim: Optional[int] = None
+        self.mode = "starting"
+        self.ready = threading.Event()
+        self._state = _State((), frozenset(), None)
+        self._known: set = set()              # delta ids, writer thread only
+        self._max_seen = None                 # newest ObjectId applied
+        self._last_reconcile = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.inserts_applied = 0
+        self.deletes_applied = 0
+        self.batches_applied = 0
+        self.errors = 0
+        self.lag_seconds: Optional[float] = None
+        self.max_lag_seconds = 0.0
+        self.last_applied_at: Optional[float] = None
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="index-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            if not self._wait_for_snapshot():
+                return
+            stream = self._open_stream()
+            self._poll_once()   # catch up on everything since the snapshot
+            self.ready.set()
+            if stream is not None:
+                self.mode = "change_stream"
+                self._tail(stream)
+            if not self._stop.is_set():
+                self.mode = "polling"
+                self._poll_loop()
+        except Exception:
+            # Readers must not keep serving a delta that no longer advances;
+            # with ready cleared they go back to reading the Mongo tail.
+            self.ready.clear()
+            self.errors += 1
+            self.mode = "stopped"
+            logger.exception("Index sync stopped")
+
+    def _wait_for_snapshot(self) -> bool:
+        """
+        Hold off catch-up until a snapshot exists. Without one the delta
+        would be the whole collection, held in every worker's memory.
+        """
+        while not self._stop.is_set():
+            self._rebase()
+            if self._state.base_watermark:
+                return True
+            if self.mode != "waiting_for_snapshot":
+                self.mode = "waiting_for_snapshot"
+                logger.warning("Index sync waiting for a vector index snapshot in %s", settings.VECTOR_INDEX_DIR)
+            self._stop.wait(self.poll_seconds)
+        return False
+
+    # -----------------------------
+    # Change stream
+    # -----------------------------
+    def _open_stream(self):
+        try:
+            return self.coll.watch(
+                [{"$match": {"operationType": {"$in": ["insert", "delete"]}}}],
+                max_await_time_ms=int(self.flush_seconds * 1000),
+            )
+        except Exception as e:
+            # Standalone servers and mongomock have no change streams.
+            logger.info("Change streams unavailable (%s); polling by _id", e)
+            return None
+
+    def _tail(self, stream):
+        inserts, deletes, first_at = [], [], None
+        while not self._stop.is_set():
+            try:
+                change = stream.try_next()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self.errors += 1
+                logger.warning("Change stream failed (%s); falling back to polling", e)
+                break
+            if change is not None:
+                first_at = first_at or time.monotonic()
+                cluster_time = change.get("clusterTime")
+                event_time = cluster_time.time if cluster_time is not None else None
+                if change["operationType"] == "delete":
+                    deletes.append((str(change["documentKey"]["_id"]), event_time))
+                else:
+                    inserts.append((change["fullDocument"], event_time))
+            due = first_at is not None and time.monotonic() - first_at >= self.flush_seconds
+            full = len(inserts) + len(deletes) >= self.batch_size
+            if full or ((change is None or due) and (inserts or deletes)):
+                self._apply(inserts, deletes)
+                inserts, deletes, first_at = [], [], None
+            if change is None:
+                self._rebase()
+        if inserts or deletes:
+            self._apply(inserts, deletes)
+        stream.close()
+
+    # -----------------------------
+    # Polling fallback
+    # -----------------------------
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self._rebase()
+                self._poll_once()
+                if time.monotonic() - self._last_reconcile >= self.reconcile_seconds:
+                    self._reconcile()
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Index sync poll failed: %s", e)
+
+    def _poll_once(self):
+        from bson import ObjectId
+
+        since = self._state.base_watermark
+        if self._max_seen is not None:
+            overlap = ObjectId.from_datetime(
+                self._max_seen.generation_time - datetime.timedelta(seconds=self.overlap_seconds)
+            )
+            since = max(since, str(overlap)) if since else str(overlap)
+        query = {"_id": {"$gte": ObjectId(since)}} if since else {}
+
+        batch = []
+        for doc in self.coll.find(query).sort("_id", 1):
+            if str(doc["_id"]) in self._known:
+                continue
+            batch.append((doc, None))
+            if len(batch) >= self.batch_size:
+                self._apply(batch, [])
+                batch = []
+        if batch:
+            self._apply(batch, [])
+
+    def _reconcile(self):
+        """
+        Tombstone ids that are indexed but no longer in Mongo (polling mode).
+
+        Only the delta range (_id >= watermark) is read id by id. The snapshot
+        range is checked with counts: one count_documents per segment, and a
+        range whose count disagrees with the snapshot is bisected down to
+        RECONCILE_LEAF_ROWS rows before its ids are read. A reconcile with no
+        deletes therefore costs one small query per segment, not a scan of
+        the corpus. Documents the builder skipped (no embedding) make their
+        range's count disagree, costing extra counts but never a wrong result.
+        """
+        from bson import ObjectId
+
+        self._last_reconcile = time.monotonic()
+        state = self._state
+        query = {"_id": {"$gte": ObjectId(state.base_watermark)}} if state.base_watermark else {}
+        live = {str(d["_id"]) for d in self.coll.find(query, {"_id": 1})}
+        gone = [i for i in self._known if i not in live]
+
+        index = get_vector_index()
+        if index is not None and index.watermark and index.watermark == state.base_watermark:
+            tombstones = np.sort(np.array(
+                [bytes.fromhex(i) for i in state.tombstones if i < index.watermark], dtype=_OID_DTYPE,
+            ))
+            segments = [seg for seg in index.segments if seg.count]
+            for i, seg in enumerate(segments):
+                upper = segments[i + 1].object_id(0) if i + 1 < len(segments) else index.watermark
+                gone += self._missing_in_segment(seg.object_ids.view(_OID_DTYPE).ravel(), ObjectId(upper), tombstones)
+
+        new = [i for i in gone if i not in state.tombstones]
+        if new:
+            self._apply([], [(i, None) for i in new])
+
+    def _missing_in_segment(self, ids: np.ndarray, upper, tombstones: np.ndarray) -> List[str]:
+        """
+        Ids of one snapshot segment (sorted, as the builder writes them) that
+        are gone from Mongo and not yet tombstoned. `upper` bounds the
+        segment's _id range from above.
+        """
+        from bson import ObjectId
+
+        missing: List[str] = []
+        stack = [(0, len(ids))]
+        while stack:
+            a, b = stack.pop()
+            lo = _oid_bytes(ids[a])
+            hi = _oid_bytes(ids[b]) if b < len(ids) else upper.binary
+            hidden = int(np.searchsorted(tombstones, hi) - np.searchsorted(tombstones, lo))
+            in_range = {"_id": {"$gte": ObjectId(lo), "$lt": ObjectId(hi)}}
+            if self.coll.count_documents(in_range) == (b - a) - hidden:
+                continue
+            if b - a > RECONCILE_LEAF_ROWS:
+                mid = (a + b) // 2
+                stack += [(a, mid), (mid, b)]
+                continue
+            present = np.array([d["_id"].binary for d in self.coll.find(in_range, {"_id": 1})], dtype=_OID_DTYPE)
+            rows = ids[a:b]
+            dead = ~np.isin(rows, present) & ~np.isin(rows, tombstones)
+            missing += [_oid_bytes(oid).hex() for oid in rows[dead]]
+        return missing
+
+    # -----------------------------
+    # Applying changes
+    # -----------------------------
+    def _apply(self, inserts: List[Tuple[Dict[str, Any], Optional[float]]], deletes: List[Tuple[str, Optional[float]]]):
+        state = self._state
+        base = state.base_watermark
+        now = time.time()
+        lags = []
+
+        ids, research_ids, topics, vectors = [], [], [], []
+        for doc, event_time in inserts:
+            oid = str(doc["_id"])
+            vec = doc.get("embedding")
+            if not vec or oid in self._known or (base and oid < base):
+                continue
+            if self.dim is None:
+                self.dim = len(vec)
+            if len(vec) != self.dim:
+                continue
+            self._known.add(oid)
+            ids.append(oid)
+            research_ids.append(doc.get("research_id"))
+            topics.append(doc.get("topic"))
+            vectors.append(vec)
+            if self._max_seen is None or doc["_id"] > self._max_seen:
+                self._max_seen = doc["_id"]
+            lags.append(now - (event_time or doc["_id"].generation_time.timestamp()))
+        lags += [now - t for _, t in deletes if t is not None]
+
+        chunks = list(state.chunks)
+        if ids:
+            chunks.append(_Chunk(_normalize(vectors), ids, research_ids, topics))
+        tombstones = state.tombstones | {oid for oid, _ in deletes}
+        # Merge the newest chunks while they are within 2x of each other, so
+        # chunk sizes shrink geometrically: O(log n) chunks, and each row is
+        # copied O(log n) times rather than on every merge of the whole delta.
+        while len(chunks) > 1 and len(chunks[-2].ids) <= 2 * len(chunks[-1].ids):
+            merged = _Chunk.concat(chunks[-2:])
+            chunks[-2:] = [merged.select(~np.isin(merged.ids, list(tombstones))) if tombstones else merged]
+        self._state = _State(tuple(c for c in chunks if len(c.ids)), frozenset(tombstones), base)
+
+        self.inserts_applied += len(ids)
+        self.deletes_applied += len(deletes)
+        self.batches_applied += 1
+        self.last_applied_at = now
+        if lags:
+            self.lag_seconds = max(0.0, lags[-1])
+            self.max_lag_seconds = max(self.max_lag_seconds, max(lags))
+
+    def _rebase(self):
+        """Drop delta rows covered by a newer snapshot."""
+        index = get_vector_index()
+        watermark = index.watermark if index is not None else None
+        state = self._state
+        if watermark == state.base_watermark:
+            return
+        if index is not None:
+            self.dim = self.dim or index.dim
+        chunks = []
+        for chunk in state.chunks:
+            keep = chunk.ids >= watermark if watermark else np.ones(len(chunk.ids), dtype=bool)
+            for oid in chunk.ids[~keep].tolist():
+                self._known.discard(oid)
+            if keep.any():
+                chunks.append(chunk if keep.all() else chunk.select(keep))
+        tombstones = _live_tombstones(state.tombstones, chunks, index)
+        self._state = _State(tuple(chunks), tombstones, watermark)
+        logger.info("Index sync rebased on snapshot watermark %s (%d delta rows, %d tombstones, %d pruned)",
+                    watermark, self._state.rows, len(tombstones), len(state.tombstones) - len(tombstones))
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def search_many(self, queries, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k over snapshot + delta minus tombstones, shaped like
+        find_similar_embeddings results.
+        """
+        state = self._state
+        queries = _normalize(queries)
+        results: List[List[Dict[str, Any]]] = [[] for _ in range(len(queries))]
+
+        index = get_vector_index()
+        watermark = None
+        if index is not None and index.dim == queries.shape[1]:
+            watermark = index.watermark
+            overfetch = min(len(state.tombstones), MAX_OVERFETCH)
+            for found, hits in zip(results, index.search_many(queries, top_k + overfetch)):
+                found += [h for h in hits if h["_id"] not in state.tombstones]
+
+        for chunk in state.chunks:
+            live = ~np.isin(chunk.ids, list(state.tombstones)) if state.tombstones else np.ones(len(chunk.ids), dtype=bool)
+            if watermark:
+                live &= chunk.ids >= watermark
+            if not live.any():
+                continue
+            sims = queries @ chunk.vectors.T
+            sims[:, ~live] = -np.inf
+            k = min(top_k, int(live.sum()))
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            for qi, rows in enumerate(top):
+                results[qi] += [
+                    {
+                        "research_id": chunk.research_ids[row],
+                        "topic": chunk.topics[row],
+                        "similarity": float(sims[qi, row]),
+                        "_id": str(chunk.ids[row]),
+                    }
+                    for row in rows
+                ]
+
+        for found in results:
+            found.sort(key=lambda r: r["similarity"], reverse=True)
+        return [found[:top_k] for found in results]
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._state
+        return {
+            "mode": self.mode,
+            "ready": self.ready.is_set(),
+            "base_watermark": state.base_watermark,
+            "delta_rows": state.rows,
+            "tombstones": len(state.tombstones),
+            "inserts_applied": self.inserts_applied,
+            "deletes_applied": self.deletes_applied,
+            "batches_applied": self.batches_applied,
+            "errors": self.errors,
+            "lag_seconds": round(self.lag_seconds, 3) if self.lag_seconds is not None else None,
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+            "seconds_since_last_apply": round(time.time() - self.last_applied_at, 1) if self.last_applied_at else None,
+        }
+
+
+# -----------------------------
+# Process-wide instance
+# -----------------------------
+_sync: Optional[IndexSync] = None
+_sync_lock = threading.Lock()
+
+
+def start_index_sync(mongo_coll) -> Optional[IndexSync]:
+    """
+    Start the process-wide sync. It runs on top of a snapshot, so without
+    VECTOR_INDEX_DIR it is not started and retrieval keeps reading Mongo.
+    """
+    global _sync
+    if not settings.VECTOR_INDEX_DIR:
+        logger.warning("INDEX_SYNC_ENABLED needs VECTOR_INDEX_DIR; index sync not started")
+        return None
+    with _sync_lock:
+        if _sync is None:
+            _sync = IndexSync(
+                mongo_coll,
+                batch_size=settings.INDEX_SYNC_BATCH_SIZE,
+                flush_seconds=settings.INDEX_SYNC_FLUSH_SECONDS,
+                poll_seconds=settings.INDEX_SYNC_POLL_SECONDS,
+                reconcile_seconds=settings.INDEX_SYNC_RECONCILE_SECONDS,
+                overlap_seconds=settings.INDEX_SYNC_POLL_OVERLAP_SECONDS,
+            )
+            _sync.start()
+        return _sync
+
+
+def stop_index_sync():
+    global _sync
+    with _sync_lock:
+        if _sync is not None:
+            _sync.stop()
+            _sync = None
+
+
+def get_index_sync(include_unready: bool = False) -> Optional[IndexSync]:
+    """
+    The running sync once its initial catch-up is done, else None. A sync
+    whose thread has died is never returned as ready. `include_unready`
+    returns any started sync, for diagnostics.
+    """
+    sync = _sync
+    if sync is None or include_unready:
+        return sync
+    alive = sync._thread is not None and sync._thread.is_alive()
+    return sync if alive and sync.ready.is_set() else None
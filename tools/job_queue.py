@@ -0,0 +1,204 @@
+import json
+import time
+import uuid
+import logging
+import datetime
+from typing import Any, Dict, Optional
+
+from config import get_redis_client, settings
+
+logger = logging.getLogger(__name__)
+
+# Redis layout (all keys prefixed with the queue name):
+#   <q>:queue       LIST  job ids waiting to run (LPUSH in, BLMOVE out)
+#   <q>:processing  LIST  job ids claimed by a worker
+#   <q>:delayed     ZSET  job ids waiting for a retry, scored by ready-at time
+#   job:<id>        HASH  job state, see enqueue_research()
+QUEUE_NAME = "jobs:research"
+QUEUED, RUNNING, RETRYING, SUCCEEDED, FAILED = "queued", "running", "retrying", "succeeded", "failed"
+
+
+class QueueFull(Exception):
+    """Raised by enqueue when the backlog is at JOB_QUEUE_MAX_LENGTH."""
+
+
+def _key(suffix: str) -> str:
+    return f"{QUEUE_NAME}:{suffix}"
+
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _decode(raw: Dict[Any, Any]) -> Dict[str, Any]:
+    job = {_text(k): _text(v) for k, v in raw.items()}
+    job["attempts"] = int(job.get("attempts", 0))
+    job["result"] = json.loads(job["result"]) if job.get("result") else None
+    job["error"] = job.get("error") or None
+    job["research_id"] = int(job["research_id"]) if job.get("research_id") else None
+    return job
+
+
+# -----------------------------
+# API side
+# -----------------------------
+def queue_depth() -> Dict[str, int]:
+    redis = get_redis_client()
+    return {
+        "queued": redis.llen(_key("queue")),
+        "processing": redis.llen(_key("processing")),
+        "delayed": redis.zcard(_key("delayed")),
+    }
+
+
+def enqueue_research(topic: str, cached_result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Create a research job and push it onto the queue. With `cached_result`
+    the job is recorded as already succeeded and never reaches a worker.
+    Raises QueueFull when the backlog is at JOB_QUEUE_MAX_LENGTH.
+    """
+    redis = get_redis_client()
+    job_id = uuid.uuid4().hex
+    now = _now()
+    job = {
+        "id": job_id,
+        "topic": topic,
+        "status": QUEUED,
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+        "result": "",
+        "error": "",
+    }
+
+    if cached_result is not None:
+        job.update(status=SUCCEEDED, result=json.dumps(cached_result, default=str))
+        redis.hset(_job_key(job_id), mapping=job)
+        redis.expire(_job_key(job_id), settings.JOB_RESULT_TTL)
+        return _decode(job)
+
+    # Not atomic with the push, so the bound can be overshot by the number of
+    # concurrent enqueuers; that is fine for backpressure purposes.
+    if redis.llen(_key("queue")) >= settings.JOB_QUEUE_MAX_LENGTH:
+        raise QueueFull(f"Research queue is full ({settings.JOB_QUEUE_MAX_LENGTH} jobs)")
+
+    pipe = redis.pipeline()
+    pipe.hset(_job_key(job_id), mapping=job)
+    pipe.expire(_job_key(job_id), settings.JOB_RESULT_TTL)
+    pipe.lpush(_key("queue"), job_id)
+    pipe.execute()
+    return _decode(job)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    raw = get_redis_client().hgetall(_job_key(job_id))
+    return _decode(raw) if raw else None
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+def claim(timeout: float = 1.0) -> Optional[Dict[str, Any]]:
+    """
+    Block up to `timeout` seconds for the next job and move it to the
+    processing list, so it is not lost if this worker dies mid-job.
+    """
+    redis = get_redis_client()
+    job_id = redis.blmove(_key("queue"), _key("processing"), timeout, "RIGHT", "LEFT")
+    if not job_id:
+        return None
+    job_id = job_id.decode()
+    now = _now()
+    pipe = redis.pipeline()
+    pipe.hset(_job_key(job_id), mapping={"status": RUNNING, "updated_at": now, "heartbeat": time.time()})
+    pipe.hincrby(_job_key(job_id), "attempts", 1)
+    pipe.execute()
+    return get_job(job_id)
+
+
+def set_research_id(job_id: str, research_id: int):
+    """Remember the job's committed Research row so a retry resumes from it."""
+    get_redis_client().hset(_job_key(job_id), "research_id", research_id)
+
+
+def heartbeat(job_id: str):
+    get_redis_client().hset(_job_key(job_id), "heartbeat", time.time())
+
+
+def complete(job_id: str, result: Dict[str, Any]):
+    redis = get_redis_client()
+    pipe = redis.pipeline()
+    pipe.hset(_job_key(job_id), mapping={
+        "status": SUCCEEDED,
+        "updated_at": _now(),
+        "result": json.dumps(result, default=str),
+        "error": "",
+    })
+    pipe.expire(_job_key(job_id), settings.JOB_RESULT_TTL)
+    pipe.lrem(_key("processing"), 1, job_id)
+    pipe.execute()
+
+
+def fail(job_id: str, error: str, retryable: bool = True):
+    """
+    Record a failed attempt. Retryable failures go to the delayed set with
+    exponential backoff until JOB_MAX_ATTEMPTS is reached.
+    """
+    redis = get_redis_client()
+    attempts = int(redis.hget(_job_key(job_id), "attempts") or 0)
+    pipe = redis.pipeline()
+    # Drop this attempt's heartbeat: left in place, requeue_stale could see it
+    # as stale while the next claim() is between BLMOVE and HSET.
+    pipe.hdel(_job_key(job_id), "heartbeat")
+    if retryable and attempts < settings.JOB_MAX_ATTEMPTS:
+        delay = settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1))
+        pipe.hset(_job_key(job_id), mapping={"status": RETRYING, "updated_at": _now(), "error": error})
+        pipe.zadd(_key("delayed"), {job_id: time.time() + delay})
+    else:
+        pipe.hset(_job_key(job_id), mapping={"status": FAILED, "updated_at": _now(), "error": error})
+    pipe.lrem(_key("processing"), 1, job_id)
+    pipe.execute()
+
+
+def promote_delayed() -> int:
+    """Move retries whose backoff has elapsed back onto the queue."""
+    redis = get_redis_client()
+    due = redis.zrangebyscore(_key("delayed"), 0, time.time())
+    moved = 0
+    for job_id in due:
+        # zrem returns 0 if another worker promoted it first.
+        if redis.zrem(_key("delayed"), job_id):
+            redis.hset(_job_key(job_id.decode()), mapping={"status": QUEUED, "updated_at": _now()})
+            redis.lpush(_key("queue"), job_id)
+            moved += 1
+    return moved
+
+
+def requeue_stale(visibility_timeout: float) -> int:
+    """
+    Put back jobs whose worker stopped heart-beating (crashed or was killed).
+    The attempt still counts, so a job that kills its worker is not retried forever.
+    """
+    redis = get_redis_client()
+    requeued = 0
+    for raw_id in redis.lrange(_key("processing"), 0, -1):
+        job_id = raw_id.decode()
+        beat = redis.hget(_job_key(job_id), "heartbeat")
+        if not redis.exists(_job_key(job_id)):
+            redis.lrem(_key("processing"), 1, job_id)  # state expired, nothing to retry
+            continue
+        # No heartbeat yet means claim() is still between BLMOVE and HSET.
+        if not beat or time.time() - float(beat) < visibility_timeout:
+            continue
+        logger.warning("Job %s lost its worker; retrying", job_id)
+        fail(job_id, "worker stopped responding", retryable=True)
+        requeued += 1
+    return requeued
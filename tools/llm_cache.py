@@ -0,0 +1,202 @@
+"""
+Completion cache for deterministic LLM calls.
+
+Keyed by (model, temperature, sha256 of the rendered prompt), so two requests
+that end up sending the same prompt share one completion even when their
+endpoint inputs differ. Two tiers:
+
+  * an in-process LRU (LLM_CACHE_LOCAL_MAX_ENTRIES), checked first;
+  * Redis, shared by every worker, with an idle TTL (refreshed on every hit)
+    and an LRU index (a sorted set of last-use times) trimmed to
+    LLM_CACHE_REDIS_MAX_ENTRIES. Because the TTL runs from the last use,
+    index members older than the TTL are exactly the expired keys, and they
+    are pruned before trimming.
+
+Only temperature-0 calls are cached unless the caller opts in, and only
+completions the caller's `validate` accepts are stored. Redis errors are
+logged and treated as misses; the cache never fails a request.
+"""
+import json
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from config import get_redis_client, settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm:"
+INDEX_KEY = "llm:index"
+
+
+def prompt_key(model: str, temperature: float, prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode()).hexdigest()
+    return f"{KEY_PREFIX}{model}:{temperature:g}:{digest}"
+
+
+def _usage_tokens(response: Any) -> int:
+    metadata = getattr(response, "response_metadata", None) or {}
+    return int((metadata.get("token_usage") or {}).get("total_tokens") or 0)
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.rejected = 0
+        self.tokens_saved = 0
+        self.tokens_spent = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+_local: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_local_lock = threading.Lock()
+_stats = _Stats()
+
+
+# -----------------------------
+# Tiers
+# -----------------------------
+def _local_get(key: str) -> Optional[Dict[str, Any]]:
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is not None:
+            _local.move_to_end(key)
+        return entry
+
+
+def _local_put(key: str, entry: Dict[str, Any]):
+    with _local_lock:
+        _local[key] = entry
+        _local.move_to_end(key)
+        while len(_local) > settings.LLM_CACHE_LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def _redis_get(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        redis = get_redis_client()
+        raw = redis.get(key)
+        if not raw:
+            return None
+        pipe = redis.pipeline()
+        pipe.expire(key, settings.LLM_CACHE_TTL)
+        pipe.zadd(INDEX_KEY, {key: time.time()})
+        pipe.execute()
+        return json.loads(raw)
+    except Exception as e:
+        logger.warning("LLM cache read failed for %s: %s", key, e)
+        return None
+
+
+def _redis_put(key: str, entry: Dict[str, Any]):
+    try:
+        redis = get_redis_client()
+        now = time.time()
+        pipe = redis.pipeline()
+        pipe.set(key, json.dumps(entry), ex=settings.LLM_CACHE_TTL)
+        pipe.zadd(INDEX_KEY, {key: now})
+        # Members idle for longer than the TTL point at keys Redis has expired.
+        pipe.zremrangebyscore(INDEX_KEY, 0, now - settings.LLM_CACHE_TTL)
+        pipe.zcard(INDEX_KEY)
+        size = pipe.execute()[-1]
+        overflow = size - settings.LLM_CACHE_REDIS_MAX_ENTRIES
+        if overflow > 0:
+            evicted = [k for k, _ in redis.zpopmin(INDEX_KEY, overflow)]
+            if evicted:
+                redis.delete(*evicted)
+    except Exception as e:
+        logger.warning("LLM cache write failed for %s: %s", key, e)
+
+
+# -----------------------------
+# Public API
+# -----------------------------
+def is_json(content: str) -> bool:
+    """`validate` for prompts that ask for a JSON reply."""
+    try:
+        json.loads(content)
+        return True
+    except ValueError:
+        return False
+
+
+def cached_completion(
+    model: str,
+    temperature: float,
+    prompt: str,
+    call: Callable[[], Any],
+    opt_in: bool = False,
+    validate: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    Return the completion text for `prompt`, from cache when possible.
+    `call` performs the real request and returns a LangChain message; it runs
+    only on a miss. Non-zero temperatures are cached only with `opt_in`.
+    Completions rejected by `validate` are returned but not cached, so one
+    malformed reply is not served to every later request for the prompt.
+    """
+    if not settings.LLM_CACHE_ENABLED or (temperature != 0 and not opt_in):
+        response = call()
+        _stats.add(bypassed=1, tokens_spent=_usage_tokens(response))
+        return response.content
+
+    key = prompt_key(model, temperature, prompt)
+    entry = _local_get(key)
+    if entry is not None:
+        _stats.add(local_hits=1, tokens_saved=entry["tokens"])
+        return entry["content"]
+
+    entry = _redis_get(key)
+    if entry is not None:
+        _local_put(key, entry)
+        _stats.add(redis_hits=1, tokens_saved=entry["tokens"])
+        return entry["content"]
+
+    response = call()
+    entry = {"content": response.content, "tokens": _usage_tokens(response)}
+    _stats.add(misses=1, tokens_spent=entry["tokens"])
+    if not entry["content"] or (validate and not validate(entry["content"])):
+        _stats.add(rejected=1)
+    else:
+        _local_put(key, entry)
+        _redis_put(key, entry)
+    return entry["content"]
+
+
+def stats() -> Dict[str, Any]:
+    with _stats.lock:
+        hits = _stats.local_hits + _stats.redis_hits
+        lookups = hits + _stats.misses
+        return {
+            "local_hits": _stats.local_hits,
+            "redis_hits": _stats.redis_hits,
+            "misses": _stats.misses,
+            "bypassed": _stats.bypassed,
+            "rejected": _stats.rejected,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "tokens_saved": _stats.tokens_saved,
+            "tokens_spent": _stats.tokens_spent,
+            "local_entries": len(_local),
+        }
+
+
+def clear_local():
+    """Drop the in-process tier and reset the counters (Redis is untouched)."""
+    with _local_lock:
+        _local.clear()
+    with _stats.lock:
+        _stats.reset()
@@ -0,0 +1,208 @@
+import time
+import threading
+import logging
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """
+    Thread-safe counters for one connection pool. `checkout_wait_ms_*` is the
+    time a caller spent waiting for a connection; a growing max or failures
+    mean the pool is saturated and requests are queuing on checkout.
+    """
+
+    def __init__(self, name: str, max_size: Optional[int] = None):
+        self.name = name
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self._gauges: Optional[Callable[[], Dict[str, Any]]] = None
+
+    def checked_out(self, wait_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def checked_in(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def checkout_failed(self, wait_ms: float):
+        with self._lock:
+            self.checkout_failures += 1
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def connection_created(self):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.connections_closed += 1
+
+    def set_gauges(self, gauges: Callable[[], Dict[str, Any]]):
+        """Extra live values read from the pool itself at snapshot time."""
+        self._gauges = gauges
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "max_size": self.max_size,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "saturation": round(self.in_use / self.max_size, 3) if self.max_size else None,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_wait_ms_max": round(self.wait_ms_max, 3),
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+            }
+        if self._gauges:
+            try:
+                data.update(self._gauges())
+            except Exception as e:
+                logger.debug("Pool gauges for %s unavailable: %s", self.name, e)
+        return data
+
+
+_registry: Dict[str, PoolStats] = {}
+_registry_lock = threading.Lock()
+
+
+def get_stats(name: str, max_size: Optional[int] = None) -> PoolStats:
+    with _registry_lock:
+        stats = _registry.get(name)
+        if stats is None:
+            stats = _registry[name] = PoolStats(name, max_size)
+        elif max_size is not None:
+            stats.max_size = max_size
+        return stats
+
+
+def snapshot() -> Dict[str, Any]:
+    with _registry_lock:
+        pools = dict(_registry)
+    return {name: stats.snapshot() for name, stats in pools.items()}
+
+
+# -----------------------------
+# Instrumented pool implementations
+# -----------------------------
+# Built on demand so importing this module stays free of driver imports.
+def sqlalchemy_pool_class(stats: PoolStats):
+    from sqlalchemy.pool import QueuePool
+    from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+    class InstrumentedQueuePool(QueuePool):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeout:
+                stats.checkout_failed((time.perf_counter() - start) * 1000)
+                raise
+            stats.checked_out((time.perf_counter() - start) * 1000)
+            return conn
+
+        def _do_return_conn(self, record):
+            stats.checked_in()
+            super()._do_return_conn(record)
+
+        def _create_connection(self):
+            stats.connection_created()
+            return super()._create_connection()
+
+    return InstrumentedQueuePool
+
+
+def redis_pool_class(stats: PoolStats):
+    import redis
+
+    class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # ids of connections handed to callers. get_connection() releases
+            # a connection itself when connect() fails; that one was never
+            # checked out and must not be counted as a check-in.
+            self._handed_out = set()
+            self._handed_out_lock = threading.Lock()
+
+        def get_connection(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                conn = super().get_connection(*args, **kwargs)
+            except redis.ConnectionError:
+                stats.checkout_failed((time.perf_counter() - start) * 1000)
+                raise
+            with self._handed_out_lock:
+                self._handed_out.add(id(conn))
+            stats.checked_out((time.perf_counter() - start) * 1000)
+            return conn
+
+        def release(self, connection):
+            with self._handed_out_lock:
+                handed_out = id(connection) in self._handed_out
+                self._handed_out.discard(id(connection))
+            if handed_out:
+                stats.checked_in()
+            super().release(connection)
+
+        def make_connection(self):
+            stats.connection_created()
+            return super().make_connection()
+
+    return InstrumentedBlockingConnectionPool
+
+
+def mongo_pool_listener(stats: PoolStats):
+    from pymongo import monitoring
+
+    class PoolListener(monitoring.ConnectionPoolListener):
+        def __init__(self):
+            self._started = threading.local()
+
+        def pool_created(self, event): pass
+        def pool_ready(self, event): pass
+        def pool_cleared(self, event): pass
+        def pool_closed(self, event): pass
+        def connection_ready(self, event): pass
+
+        def connection_created(self, event):
+            stats.connection_created()
+
+        def connection_closed(self, event):
+            stats.connection_closed()
+
+        def connection_check_out_started(self, event):
+            self._started.value = time.perf_counter()
+
+        def _waited_ms(self, event) -> float:
+            duration = getattr(event, "duration", None)  # pymongo >= 4.7
+            if duration is not None:
+                return duration * 1000
+            started = getattr(self._started, "value", None)
+            return (time.perf_counter() - started) * 1000 if started else 0.0
+
+        def connection_checked_out(self, event):
+            stats.checked_out(self._waited_ms(event))
+
+        def connection_check_out_failed(self, event):
+            stats.checkout_failed(self._waited_ms(event))
+
+        def connection_checked_in(self, event):
+            stats.checked_in()
+
+    return PoolListener()
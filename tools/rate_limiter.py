@@ -0,0 +1,298 @@
+"""
+Process-wide admission control for OpenAI calls.
+
+Every chat / embedding request goes through the limiter for its model, which
+enforces:
+
+  * requests-per-minute and tokens-per-minute budgets over a sliding window;
+  * an adaptive concurrency limit (AIMD): +1/limit per fast success, x0.5 on
+    a 429, x0.75 when latency exceeds the target;
+  * a priority queue, so interactive /graph/analyze calls are admitted ahead
+    of bulk research work waiting on the same model.
+
+Retries on 429 also go through the limiter (the OpenAI client's own retries
+are disabled), so a burst of throttled calls backs off together instead of
+turning into a retry storm.
+"""
+import heapq
+import itertools
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 10
+
+WINDOW_SECONDS = 60.0
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class LLMBusyError(Exception):
+    """No capacity for the call within OPENAI_QUEUE_TIMEOUT_SECONDS."""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"OpenAI capacity for {model} exhausted; retry in {retry_after:.0f}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Run the enclosed LLM / embedding calls at `priority` (lower goes first)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for budgeting.
+    return len(text) // 4 + 1
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    return type(exc).__name__ == "RateLimitError"
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Ticket:
+    def __init__(self, priority: int, tokens: int):
+        self.priority = priority
+        self.tokens = tokens
+        self.admitted_at = 0.0
+        self.usage_entry = None
+
+
+class ModelLimiter:
+    def __init__(
+        self,
+        model: str,
+        rpm: int,
+        tpm: int,
+        min_concurrency: int,
+        max_concurrency: int,
+        initial_concurrency: int,
+        latency_target: float,
+    ):
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.latency_target = latency_target
+
+        self._cond = threading.Condition()
+        self._queue: list = []                 # heap of (priority, seq, ticket)
+        self._seq = itertools.count()
+        self._usage: deque = deque()           # [admitted_at, tokens] per request
+        self._window_tokens = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.in_flight = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    # -----------------------------
+    # Sliding window budget
+    # -----------------------------
+    def _prune(self, now: float):
+        while self._usage and now - self._usage[0][0] >= WINDOW_SECONDS:
+            self._window_tokens -= self._usage.popleft()[1]
+
+    def _wait_for_budget(self, tokens: int, now: float) -> float:
+        """0 if a call with `tokens` fits now, else seconds until it might."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._prune(now)
+        over_rpm = len(self._usage) >= self.rpm
+        # A single call larger than the whole TPM budget is let through on an
+        # empty window rather than blocking forever.
+        over_tpm = self._usage and self._window_tokens + tokens > self.tpm
+        if not over_rpm and not over_tpm:
+            return 0.0
+        return max(0.01, self._usage[0][0] + WINDOW_SECONDS - now)
+
+    # -----------------------------
+    # Admission
+    # -----------------------------
+    def acquire(self, tokens: int, priority: int, timeout: float) -> Ticket:
+        ticket = Ticket(priority, tokens)
+        entry = (priority, next(self._seq), ticket)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            while True:
+                now = time.monotonic()
+                wait = None
+                if self._queue[0] is entry and self.in_flight < int(self.limit):
+                    wait = self._wait_for_budget(tokens, now)
+                    if wait == 0.0:
+                        heapq.heappop(self._queue)
+                        self.in_flight += 1
+                        self.admitted += 1
+                        ticket.admitted_at = now
+                        ticket.usage_entry = [now, tokens]
+                        self._usage.append(ticket.usage_entry)
+                        self._window_tokens += tokens
+                        self._cond.notify_all()
+                        return ticket
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self.timed_out += 1
+                    self._cond.notify_all()
+                    raise LLMBusyError(self.model, retry_after=max(1.0, wait or self.latency_target))
+                self._cond.wait(min(remaining, wait) if wait else remaining)
+
+    def release(self, ticket: Ticket, latency: float, rate_limited: bool = False,
+                actual_tokens: Optional[int] = None, retry_after: Optional[float] = None,
+                failed: bool = False):
+        """
+        Free the ticket's slot and adapt the limit. `failed` (an error other
+        than a 429) frees the slot without growing the limit: a fast failure
+        says nothing good about upstream capacity.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if actual_tokens is not None and ticket.usage_entry is not None:
+                self._window_tokens += actual_tokens - ticket.usage_entry[1]
+                ticket.usage_entry[1] = actual_tokens
+
+            now = time.monotonic()
+            if rate_limited:
+                self.throttled += 1
+                self._decrease(0.5, now, force=True)
+                self._paused_until = max(self._paused_until, now + (retry_after or 1.0))
+            elif failed:
+                self.failed += 1
+            elif latency > self.latency_target:
+                self._decrease(0.75, now)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _decrease(self, factor: float, now: float, force: bool = False):
+        # One decrease per latency-target period: a single slow spell should
+        # not collapse the limit once per in-flight request.
+        if not force and now - self._last_decrease < self.latency_target:
+            return
+        self.limit = max(self.min_concurrency, self.limit * factor)
+        self._last_decrease = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            self._prune(now)
+            queued: Dict[int, int] = {}
+            for priority, _, _ in self._queue:
+                queued[priority] = queued.get(priority, 0) + 1
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queued_by_priority": queued,
+                "requests_last_minute": len(self._usage),
+                "tokens_last_minute": self._window_tokens,
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm,
+                "admitted": self.admitted,
+                "throttled_429": self.throttled,
+                "failed": self.failed,
+                "queue_timeouts": self.timed_out,
+                "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+            }
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+_limiters: Dict[str, ModelLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _model_overrides(model: str) -> Dict[str, Any]:
+    try:
+        return json.loads(settings.OPENAI_MODEL_LIMITS or "{}").get(model, {})
+    except ValueError:
+        logger.warning("OPENAI_MODEL_LIMITS is not valid JSON; ignoring it")
+        return {}
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            o = _model_overrides(model)
+            limiter = _limiters[model] = ModelLimiter(
+                model=model,
+                rpm=int(o.get("rpm", settings.OPENAI_RPM_LIMIT)),
+                tpm=int(o.get("tpm", settings.OPENAI_TPM_LIMIT)),
+                min_concurrency=int(o.get("min_concurrency", settings.OPENAI_MIN_CONCURRENCY)),
+                max_concurrency=int(o.get("max_concurrency", settings.OPENAI_MAX_CONCURRENCY)),
+                initial_concurrency=int(o.get("initial_concurrency", settings.OPENAI_INITIAL_CONCURRENCY)),
+                latency_target=float(o.get("latency_target_seconds", settings.OPENAI_LATENCY_TARGET_SECONDS)),
+            )
+        return limiter
+
+
+def snapshot() -> Dict[str, Any]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.snapshot() for model, limiter in limiters.items()}
+
+
+def _usage_tokens(result: Any) -> Optional[int]:
+    metadata = getattr(result, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+def limited_call(model: str, tokens: int, fn: Callable[[], Any]) -> Any:
+    """
+    Run `fn` (one OpenAI request for `model`, ~`tokens` tokens) under the
+    model's limiter at the current llm_priority. 429s are retried through the
+    limiter up to OPENAI_MAX_ATTEMPTS times. Raises LLMBusyError when no
+    capacity frees up within OPENAI_QUEUE_TIMEOUT_SECONDS.
+    """
+    limiter = get_limiter(model)
+    priority = _priority.get()
+    for attempt in range(1, settings.OPENAI_MAX_ATTEMPTS + 1):
+        ticket = limiter.acquire(tokens, priority, settings.OPENAI_QUEUE_TIMEOUT_SECONDS)
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            throttled = is_rate_limit_error(e)
+            limiter.release(ticket, time.monotonic() - start, rate_limited=throttled,
+                            retry_after=_retry_after(e), failed=not throttled)
+            if throttled and attempt < settings.OPENAI_MAX_ATTEMPTS:
+                logger.warning("OpenAI 429 for %s (attempt %d); backing off", model, attempt)
+                continue
+            raise
+        limiter.release(ticket, time.monotonic() - start, actual_tokens=_usage_tokens(result))
+        return result
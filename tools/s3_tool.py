@@ -1,17 +1,108 @@
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 import io
+import gzip
+import zlib
+import codecs
 import logging
-from botocore.exceptions import ClientError
-from config import s3_client, settings
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from config import get_s3_client, settings
+from tools.disk_cache import DiskCache
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 1 << 16
 
+_executor: Optional[ThreadPoolExecutor] = None
+_cache: Optional[DiskCache] = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.S3_UPLOAD_CONCURRENCY, thread_name_prefix="s3-upload")
+        return _executor
+
+
+def get_download_cache() -> Optional[DiskCache]:
+    """The on-disk cache in front of downloads, or None when S3_CACHE_MAX_BYTES is 0."""
+    global _cache
+    with _lock:
+        if _cache is None and settings.S3_CACHE_MAX_BYTES > 0:
+            _cache = DiskCache(settings.S3_CACHE_DIR, settings.S3_CACHE_MAX_BYTES)
+        return _cache
+
+
+# -----------------------------
+# Compression
+# -----------------------------
+def _zstd():
+    try:
+        import zstandard  # optional dependency
+        return zstandard
+    except ImportError:
+        return None
+
+
+def _encoding() -> Optional[str]:
+    encoding = settings.S3_COMPRESSION
+    if encoding == "zstd" and _zstd() is None:
+        logger.warning("S3_COMPRESSION=zstd but the zstandard package is not installed; using gzip")
+        return "gzip"
+    return encoding if encoding in ("gzip", "zstd") else None
+
+
+def _compress(data: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "zstd":
+        return _zstd().ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def _decompressor(encoding: Optional[str]):
+    """Object with .decompress(chunk) for `encoding`; identity for legacy uncompressed objects."""
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("object is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if encoding not in (None, "", "identity"):
+        raise RuntimeError(f"unsupported ContentEncoding '{encoding}'")
+
+    class _Identity:
+        def decompress(self, chunk: bytes) -> bytes:
+            return chunk
+    return _Identity()
+
+
+def _s3_errors() -> tuple:
+    """Exceptions an S3 call can raise: service errors, transport errors, failed transfers."""
+    from boto3.exceptions import S3UploadFailedError
+    from botocore.exceptions import BotoCoreError, ClientError
+    return (ClientError, BotoCoreError, S3UploadFailedError)
+
+
+def _cache_key(bucket: str, key: str) -> str:
+    return f"{bucket}/{key}"
+
+
+# -----------------------------
+# Uploads
+# -----------------------------
 def upload_text_to_s3(text: str, key: str, content_type: str = "text/plain") -> Optional[str]:
     """
     Upload a string as an object to the configured S3 bucket.
     Returns the S3 object URL on success, None on failure.
     `key` should be something like "research/<timestamp>_topic.txt"
+
+    Bodies of S3_COMPRESSION_MIN_BYTES or more are compressed (S3_COMPRESSION)
+    and tagged with ContentEncoding, which download_text_from_s3 undoes.
     """
     bucket = settings.AWS_S3_BUCKET
     if not bucket:
@@ -19,36 +110,151 @@ def upload_text_to_s3(text: str, key: str, content_type: str = "text/plain") ->
         return None
 
     try:
+        data = text.encode("utf-8")
+        extra = {"ContentType": content_type, "ACL": "private"}
+        encoding = _encoding() if len(data) >= settings.S3_COMPRESSION_MIN_BYTES else None
+        if encoding:
+            extra["ContentEncoding"] = encoding
+
         # boto3 accepts bytes or file-like object
-        body = io.BytesIO(text.encode("utf-8"))
-        s3_client.upload_fileobj(
+        body = io.BytesIO(_compress(data, encoding))
+        get_s3_client().upload_fileobj(
             Fileobj=body,
             Bucket=bucket,
             Key=key,
-            ExtraArgs={"ContentType": content_type, "ACL": "private"},
+            ExtraArgs=extra,
         )
 
+        cache = get_download_cache()
+        if cache:
+            # Write-through: the object is about to be read by retrieval anyway.
+            cache.put(_cache_key(bucket, key), data)
+
         # Construct an S3 URL (may vary depending on region / bucket config)
         url = f"s3://{bucket}/{key}"
         return url
-    except ClientError as e:
+    except _s3_errors() as e:
         logger.exception("Failed to upload to S3: %s", e)
         return None
 
 
+def upload_text_to_s3_async(text: str, key: str, content_type: str = "text/plain") -> "Future[Optional[str]]":
+    """
+    upload_text_to_s3 on a background pool (S3_UPLOAD_CONCURRENCY threads).
+    The future resolves to the URL, or None on failure, like the sync call.
+    """
+    ctx = contextvars.copy_context()
+    return _get_executor().submit(ctx.run, upload_text_to_s3, text, key, content_type)
+
+
+def upload_texts_to_s3(items: List[Tuple[str, str]], content_type: str = "text/plain") -> List[Optional[str]]:
+    """
+    Upload several (text, key) pairs concurrently. Returns their URLs (None
+    for failures) in input order.
+    """
+    futures = [upload_text_to_s3_async(text, key, content_type) for text, key in items]
+    return [f.result() for f in futures]
+
+
+# -----------------------------
+# Downloads
+# -----------------------------
 def download_text_from_s3(key: str) -> Optional[str]:
     """
-    Download an object from S3 and return its text content, or None on failure.
+    Download an object from S3 and return its text content, or None on failure
+    (including bodies that cannot be decompressed or decoded). Served from
+    the on-disk cache when possible; compressed and legacy uncompressed
+    objects are both handled.
     """
     bucket = settings.AWS_S3_BUCKET
     if not bucket:
         logger.error("AWS_S3_BUCKET not configured")
         return None
 
+    cache = get_download_cache()
+    if cache:
+        data = cache.get(_cache_key(bucket, key))
+        if data is not None:
+            return data.decode("utf-8")
+
     try:
-        response = s3_client.get_object(Bucket=bucket, Key=key)
-        body = response["Body"].read()
-        return body.decode("utf-8")
-    except ClientError as e:
+        response = get_s3_client().get_object(Bucket=bucket, Key=key)
+        raw = response["Body"].read()
+    except _s3_errors() as e:
         logger.exception("Failed to download from S3: %s", e)
         return None
+
+    try:
+        data = _decode_body(raw, response.get("ContentEncoding"))
+        text = data.decode("utf-8")
+    except (RuntimeError, zlib.error, EOFError, UnicodeDecodeError) as e:
+        logger.error("Could not decode s3://%s/%s: %s", bucket, key, e)
+        return None
+
+    if cache:
+        cache.put(_cache_key(bucket, key), data)
+    return text
+
+
+def _decode_body(raw: bytes, encoding: Optional[str]) -> bytes:
+    """Decompress a whole body, rejecting truncated compressed streams."""
+    decompressor = _decompressor(encoding)
+    data = decompressor.decompress(raw)
+    if getattr(decompressor, "eof", True) is False:
+        raise EOFError("compressed body is truncated")
+    return data
+
+
+class S3ReadError(Exception):
+    """An object could not be fetched, decompressed or decoded."""
+
+
+def stream_text_from_s3(key: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yield an object's text in chunks without holding the whole body in
+    memory. Decompression and UTF-8 decoding are incremental. Reads the
+    on-disk cache when the object is there but never fills it.
+    Raises S3ReadError if the object cannot be fetched or decoded; text
+    already yielded before a mid-stream failure is not retracted.
+    """
+    try:
+        yield from _stream_text(key, chunk_size)
+    except (*_s3_errors(), RuntimeError, zlib.error, EOFError, UnicodeDecodeError) as e:
+        logger.error("Could not stream s3://%s/%s: %s", settings.AWS_S3_BUCKET, key, e)
+        raise S3ReadError(f"could not read {key}: {e}") from e
+
+
+def _stream_text(key: str, chunk_size: int) -> Iterator[str]:
+    bucket = settings.AWS_S3_BUCKET
+    if not bucket:
+        raise RuntimeError("AWS_S3_BUCKET not configured")
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    cache = get_download_cache()
+    cached = cache.open(_cache_key(bucket, key)) if cache else None
+    if cached is not None:
+        with cached:
+            for chunk in iter(lambda: cached.read(chunk_size), b""):
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+        return
+
+    response = get_s3_client().get_object(Bucket=bucket, Key=key)
+    decompressor = _decompressor(response.get("ContentEncoding"))
+    body = response["Body"]
+    try:
+        for chunk in body.iter_chunks(chunk_size):
+            text = decoder.decode(decompressor.decompress(chunk))
+            if text:
+                yield text
+    finally:
+        body.close()
+    if getattr(decompressor, "eof", True) is False:
+        raise EOFError("compressed body is truncated")
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
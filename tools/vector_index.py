@@ -0,0 +1,382 @@
+"""
+Memory-mapped snapshots of the Mongo `embeddings` collection.
+
+A snapshot directory holds immutable segments plus a MANIFEST.json naming the
+live ones:
+
+    <VECTOR_INDEX_DIR>/
+        MANIFEST.json              {"dim", "count", "watermark", "segments": [...]}
+        seg-<timestamp>/
+            meta.json              {"count", "dim"}
+            vectors.f32            count x dim float32, L2-normalised
+            research_ids.i64       count int64
+            object_ids.bin         count x 12 bytes (Mongo ObjectId)
+            topic_offsets.i64      count + 1 int64 offsets into topics.bin
+            topics.bin             utf-8 topics, concatenated
+
+Every uvicorn worker maps the same files read-only, so the vectors live once
+in the page cache no matter how many processes serve queries. Building is
+incremental: only documents whose _id is past the manifest's watermark are
+read from Mongo and written as a new segment, and the manifest is swapped
+with an atomic rename so readers see either the old or the new snapshot.
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import datetime
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "MANIFEST.json"
+OBJECT_ID_BYTES = 12
+
+
+def _fsync_file(path: str):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_manifest(index_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(index_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+# -----------------------------
+# Segment writer
+# -----------------------------
+class SegmentWriter:
+    """Streams rows into a new segment directory; `finish()` makes it visible."""
+
+    def __init__(self, index_dir: str, dim: int):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.name = f"seg-{time.time_ns()}"
+        self.tmp_path = os.path.join(index_dir, f"{self.name}.tmp")
+        os.makedirs(self.tmp_path)
+        self.count = 0
+        self._topic_offset = 0
+        self._files = {
+            name: open(os.path.join(self.tmp_path, name), "wb")
+            for name in ("vectors.f32", "research_ids.i64", "object_ids.bin", "topic_offsets.i64", "topics.bin")
+        }
+        self._files["topic_offsets.i64"].write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def add(self, vectors: np.ndarray, research_ids: List[int], object_ids: List[bytes], topics: List[str]):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._files["vectors.f32"].write((vectors / norms).tobytes())
+        self._files["research_ids.i64"].write(np.asarray(research_ids, dtype=np.int64).tobytes())
+        self._files["object_ids.bin"].write(b"".join(object_ids))
+        encoded = [(t or "").encode("utf-8") for t in topics]
+        offsets = self._topic_offset + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        self._files["topics.bin"].write(b"".join(encoded))
+        self._files["topic_offsets.i64"].write(offsets.tobytes())
+        if len(offsets):
+            self._topic_offset = int(offsets[-1])
+        self.count += len(vectors)
+
+    def finish(self) -> str:
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        _write_json_atomic(os.path.join(self.tmp_path, "meta.json"), {"count": self.count, "dim": self.dim})
+        final = os.path.join(self.index_dir, self.name)
+        os.rename(self.tmp_path, final)
+        return self.name
+
+    def abort(self):
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+# -----------------------------
+# Segment reader
+# -----------------------------
+class Segment:
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.path = path
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        if self.count:
+            self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            self.research_ids = np.memmap(os.path.join(path, "research_ids.i64"), dtype=np.int64, mode="r", shape=(self.count,))
+            self.object_ids = np.memmap(os.path.join(path, "object_ids.bin"), dtype=np.uint8, mode="r", shape=(self.count, OBJECT_ID_BYTES))
+            self.topic_offsets = np.memmap(os.path.join(path, "topic_offsets.i64"), dtype=np.int64, mode="r", shape=(self.count + 1,))
+            size = int(self.topic_offsets[-1])
+            self.topics = np.memmap(os.path.join(path, "topics.bin"), dtype=np.uint8, mode="r", shape=(size,)) if size else np.zeros(0, dtype=np.uint8)
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+    def topic(self, row: int) -> str:
+        start, end = int(self.topic_offsets[row]), int(self.topic_offsets[row + 1])
+        return bytes(self.topics[start:end]).decode("utf-8")
+
+    def object_id(self, row: int) -> str:
+        return bytes(self.object_ids[row]).hex()
+
+    def iter_rows(self, batch_size: int = 10000):
+        """Yields (vectors, research_ids, object_ids, topics) batches, for compaction."""
+        for start in range(0, self.count, batch_size):
+            end = min(start + batch_size, self.count)
+            yield (
+                np.asarray(self.vectors[start:end]),
+                self.research_ids[start:end].tolist(),
+                [bytes(self.object_ids[i]) for i in range(start, end)],
+                [self.topic(i) for i in range(start, end)],
+            )
+
+
+class VectorIndex:
+    """Read-only view over the segments listed in one manifest."""
+
+    def __init__(self, index_dir: str, manifest: Dict[str, Any]):
+        self.index_dir = index_dir
+        self.manifest = manifest
+        self.dim = manifest["dim"]
+        self.watermark = manifest.get("watermark")
+        self.segments = [Segment(os.path.join(index_dir, name)) for name in manifest["segments"]]
+        self.count = sum(s.count for s in self.segments)
+
+    @classmethod
+    def open(cls, index_dir: str) -> Optional["VectorIndex"]:
+        manifest = read_manifest(index_dir)
+        return cls(index_dir, manifest) if manifest else None
+
+    def _normalize(self, queries: np.ndarray) -> np.ndarray:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return queries / norms
+
+    def search_many(self, queries, top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Cosine top-k for every query row with one matrix product per segment.
+        Returns, per query, dicts shaped like find_similar_embeddings results.
+        """
+        queries = self._normalize(queries)
+        if queries.shape[1] != self.dim:
+            return [[] for _ in range(len(queries))]
+
+        candidates: List[List[tuple]] = [[] for _ in range(len(queries))]
+        for seg in self.segments:
+            if not seg.count:
+                continue
+            sims = queries @ seg.vectors.T            # (queries, rows)
+            k = min(top_k, seg.count)
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            for qi in range(len(queries)):
+                for row in top[qi]:
+                    candidates[qi].append((float(sims[qi, row]), seg, int(row)))
+
+        results = []
+        for cands in candidates:
+            cands.sort(key=lambda c: c[0], reverse=True)
+            results.append([
+                {
+                    "research_id": int(seg.research_ids[row]),
+                    "topic": seg.topic(row),
+                    "similarity": sim,
+                    "_id": seg.object_id(row),
+                }
+                for sim, seg, row in cands[:top_k]
+            ])
+        return results
+
+    def search(self, query, top_k: int = 5) -> List[Dict[str, Any]]:
+        return self.search_many([query], top_k)[0]
+
+
+# -----------------------------
+# Snapshot builder
+# -----------------------------
+def _object_id_cutoff(lag_seconds: float):
+    from bson import ObjectId
+
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=lag_seconds)
+    return ObjectId.from_datetime(cutoff)
+
+
+def _compact(index_dir: str, segment_names: List[str], dim: int) -> str:
+    writer = SegmentWriter(index_dir, dim)
+    try:
+        for name in segment_names:
+            for batch in Segment(os.path.join(index_dir, name)).iter_rows():
+                writer.add(*batch)
+        return writer.finish()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def _remove_unreferenced(index_dir: str, live: List[str]):
+    # Readers that still map a removed segment keep working: on POSIX the
+    # pages stay valid until they unmap it.
+    for name in os.listdir(index_dir):
+        if name.startswith("seg-") and name not in live:
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+def build_snapshot(
+    mongo_coll,
+    index_dir: str,
+    full: bool = False,
+    lag_seconds: Optional[float] = None,
+    batch_size: int = 1000,
+    max_segments: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Bring the snapshot in `index_dir` up to date with `mongo_coll`.
+
+    Documents are read in `_id` order between the previous watermark and an
+    ObjectId `lag_seconds` in the past; the lag absorbs ObjectIds minted
+    slightly out of order by different clients. With `full=True` (or on first
+    run) everything is rebuilt, which is also how deletions are picked up.
+    Returns the new manifest.
+    """
+    lag_seconds = settings.VECTOR_INDEX_WATERMARK_LAG_SECONDS if lag_seconds is None else lag_seconds
+    max_segments = max_segments or settings.VECTOR_INDEX_MAX_SEGMENTS
+    os.makedirs(index_dir, exist_ok=True)
+
+    manifest = None if full else read_manifest(index_dir)
+    cutoff = _object_id_cutoff(lag_seconds)
+    query: Dict[str, Any] = {"_id": {"$lt": cutoff}}
+    if manifest and manifest.get("watermark"):
+        from bson import ObjectId
+        query["_id"]["$gte"] = ObjectId(manifest["watermark"])
+
+    dim = manifest["dim"] if manifest else None
+    segments = list(manifest["segments"]) if manifest else []
+    writer: Optional[SegmentWriter] = None
+    skipped = 0
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal writer
+        if not batch:
+            return
+        if writer is None:
+            writer = SegmentWriter(index_dir, dim)
+        writer.add(
+            np.array([d["embedding"] for d in batch], dtype=np.float32),
+            [d.get("research_id") or 0 for d in batch],
+            [d["_id"].binary for d in batch],
+            [d.get("topic") or "" for d in batch],
+        )
+        batch.clear()
+
+    cursor = mongo_coll.find(query, {"research_id": 1, "topic": 1, "embedding": 1}).sort("_id", 1)
+    try:
+        for doc in cursor:
+            vec = doc.get("embedding")
+            if not vec:
+                skipped += 1
+                continue
+            if dim is None:
+                dim = len(vec)
+            if len(vec) != dim:
+                skipped += 1
+                continue
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        if writer is not None:
+            segments.append(writer.finish())
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if dim is None:
+        logger.info("No embeddings to snapshot yet")
+        return manifest or {}
+
+    if len(segments) > max_segments:
+        segments = [_compact(index_dir, segments, dim)]
+
+    new_manifest = {
+        "version": 1,
+        "dim": dim,
+        "watermark": str(cutoff),
+        "segments": segments,
+        "count": sum(Segment(os.path.join(index_dir, s)).count for s in segments),
+        "built_at": datetime.datetime.utcnow().isoformat() + "Z",
+    }
+    _write_json_atomic(os.path.join(index_dir, MANIFEST), new_manifest)
+    _remove_unreferenced(index_dir, segments)
+    added = writer.count if writer else 0
+    logger.info("Snapshot now has %d vectors in %d segment(s) (+%d, %d skipped)",
+                new_manifest["count"], len(segments), added, skipped)
+    return new_manifest
+
+
+# -----------------------------
+# Process-wide reader
+# -----------------------------
+_index: Optional[VectorIndex] = None
+_index_stamp = None
+_index_checked = 0.0
+_index_lock = threading.Lock()
+
+
+def _manifest_stamp(index_dir: str):
+    try:
+        st = os.stat(os.path.join(index_dir, MANIFEST))
+        return (st.st_ino, st.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """
+    The current snapshot for this process, or None when VECTOR_INDEX_DIR is
+    unset or no snapshot has been built. The manifest is re-checked at most
+    every VECTOR_INDEX_RELOAD_SECONDS and the segments are re-mapped when a
+    builder has swapped in a new one.
+    """
+    global _index, _index_stamp, _index_checked
+    index_dir = settings.VECTOR_INDEX_DIR
+    if not index_dir:
+        return None
+
+    now = time.monotonic()
+    if _index is not None and now - _index_checked < settings.VECTOR_INDEX_RELOAD_SECONDS:
+        return _index
+
+    with _index_lock:
+        if _index is not None and now - _index_checked < settings.VECTOR_INDEX_RELOAD_SECONDS:
+            return _index
+        _index_checked = now
+        stamp = _manifest_stamp(index_dir)
+        if stamp != _index_stamp:
+            try:
+                _index = VectorIndex.open(index_dir) if stamp else None
+                _index_stamp = stamp
+            except Exception as e:
+                logger.warning("Could not load vector index from %s: %s", index_dir, e)
+        return _index
@@ -1,42 +1,147 @@
-import os
-import logging
-from typing import List, Dict, Any
-import requests
-
-logger = logging.getLogger(__name__)
-
 # tools/web_search_tool.py
 import os
+import hashlib
 import logging
-from typing import List, Dict, Any
-from tavily import TavilyClient  # make sure you have tavily installed
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit, urlunsplit
 from dotenv import load_dotenv
+
+from config import settings
+from tools.cache import cache_get, cache_set
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "")
 
+# Appended to the topic to widen coverage; the bare topic always runs first.
+EXPANSION_SUFFIXES = ("overview", "latest research", "challenges and limitations")
+
+_client = None
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            from tavily import TavilyClient  # deferred: heavy import
+            _client = TavilyClient(api_key=TAVILY_API_KEY)
+        return _client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            # The caller runs one sub-query itself, so every concurrent search
+            # gets its other sub-queries started at once instead of queueing.
+            workers = max(1, settings.SEARCH_SUB_QUERIES - 1) * settings.SEARCH_CONCURRENT_REQUESTS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        return _executor
+
+
+# -----------------------------
+# Query helpers
+# -----------------------------
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def expand_query(query: str, count: int) -> List[str]:
+    """The query itself followed by up to `count - 1` broader variants."""
+    base = " ".join(query.split())
+    variants = [base] + [f"{base} {suffix}" for suffix in EXPANSION_SUFFIXES]
+    return variants[:max(1, count)]
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("", parts.netloc.lower().removeprefix("www."), path, parts.query, ""))
+
+
+def merge_results(result_lists: List[List[Dict[str, Any]]], num: int) -> List[Dict[str, Any]]:
+    """
+    Round-robin over the per-query lists (each already ranked), dropping
+    URLs seen before, so every sub-query contributes its best hits.
+    """
+    merged, seen = [], set()
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            r = results[rank]
+            key = _normalize_url(r["link"]) if r.get("link") else r.get("title", "")
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(r)
+            if len(merged) == num:
+                return merged
+    return merged
+
+
+# -----------------------------
+# Backends
+# -----------------------------
 def tavily_search(query: str, num: int = 5) -> List[Dict[str, Any]]:
     """
-    Search using Tavily API.
+    Search using Tavily API, cached per normalized query for SEARCH_CACHE_TTL.
     Returns a list of dicts: [{'title': ..., 'link': ..., 'snippet': ...}, ...]
     """
     if not TAVILY_API_KEY:
         raise RuntimeError("TAVILY_API_KEY missing from environment")
-    
-    client = TavilyClient(api_key=TAVILY_API_KEY)
-    results = client.search(query=query, max_results=num)
-    
+
+    cache_key = "search:" + hashlib.sha1(f"{num}:{normalize_query(query)}".encode()).hexdigest()
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    response = _get_client().search(query=query, max_results=num)
+
     # Transform to same format as previous
     transformed = []
-    for r in results:
+    for r in response.get("results", []):
         transformed.append({
             "title": r.get("title", ""),
-            "link": "project_structure.txt",
-            "snippet": r.get("snippet", ""),
+            "link": r.get("url", ""),
+            "snippet": r.get("content", ""),
         })
+    # An empty list may be a transient upstream problem; do not pin it.
+    if transformed:
+        cache_set(cache_key, transformed, ttl_seconds=settings.SEARCH_CACHE_TTL)
     return transformed
 
+
+def multi_search(query: str, num: int = 5) -> List[Dict[str, Any]]:
+    """
+    Run the query and its expansions concurrently and merge the results.
+    Failed sub-queries are skipped; raises only if every one of them fails.
+    """
+    queries = expand_query(query, settings.SEARCH_SUB_QUERIES)
+    if len(queries) == 1:
+        return tavily_search(queries[0], num=num)
+
+    executor = _get_executor()
+    futures = [executor.submit(contextvars.copy_context().run, tavily_search, q, num) for q in queries[1:]]
+    result_lists, errors = [], []
+    for q, f in zip(queries, [None] + futures):
+        try:
+            # The bare query runs on the calling thread while the pool takes the rest.
+            result_lists.append(tavily_search(q, num=num) if f is None else f.result())
+        except Exception as e:
+            logger.warning("Sub-query %r failed: %s", q, e)
+            errors.append(e)
+    if not result_lists:
+        raise errors[0]
+    return merge_results(result_lists, num)
+
+
 def dummy_search(query: str, num: int = 3) -> List[Dict[str, Any]]:
     return [
         {"title": f"Dummy result {i+1} for {query}", "link": "", "snippet": f"This is a dummy snippet {i+1}."}
@@ -49,7 +154,7 @@ def search(query: str, num: int = 5) -> List[Dict[str, Any]]:
     """
     try:
         if TAVILY_API_KEY:
-            return tavily_search(query, num=num)
+            return multi_search(query, num=num)
         else:
             logger.warning("TAVILY_API_KEY not configured — using dummy_search")
             return dummy_search(query, num=min(num, 3))
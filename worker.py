@@ -0,0 +1,131 @@
+# worker.py
+"""
+Research job worker: runs queued /chain/research/jobs requests through
+run_research_pipeline, outside the HTTP request.
+
+    python worker.py                     # WORKER_CONCURRENCY threads
+    python worker.py --concurrency 8
+
+Stops after the in-flight jobs finish on SIGINT / SIGTERM.
+"""
+import argparse
+import logging
+import signal
+import threading
+import time
+from typing import Set
+
+from fastapi import HTTPException
+
+import config
+from config import settings
+from tools import job_queue
+
+logger = logging.getLogger("worker")
+
+MAINTENANCE_INTERVAL = 5.0
+
+
+class Worker:
+    def __init__(self, concurrency: int, poll_timeout: float = 1.0):
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self.stop_event = threading.Event()
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+
+    # -----------------------------
+    # One job
+    # -----------------------------
+    def process(self, job):
+        from schemas.research_schema import ResearchInput
+        from services.research_service import run_research_pipeline
+
+        job_id = job["id"]
+        with self._running_lock:
+            self._running.add(job_id)
+        db = config.get_session_factory()()
+        start = time.perf_counter()
+        try:
+            result = run_research_pipeline(
+                ResearchInput(topic=job["topic"]),
+                db,
+                config.get_mongo_db(),
+                research_id=job["research_id"],  # set if an earlier attempt got that far
+                on_saved=lambda research_id: job_queue.set_research_id(job_id, research_id),
+            )
+            job_queue.complete(job_id, result)
+            logger.info("Job %s done in %.1fs", job_id, time.perf_counter() - start)
+        except HTTPException as e:
+            # 4xx means the input itself is bad; retrying will not help.
+            job_queue.fail(job_id, str(e.detail), retryable=e.status_code >= 500)
+            logger.warning("Job %s failed (attempt %d): %s", job_id, job["attempts"], e.detail)
+        except Exception as e:
+            db.rollback()
+            job_queue.fail(job_id, f"{type(e).__name__}: {e}", retryable=True)
+            logger.exception("Job %s failed (attempt %d)", job_id, job["attempts"])
+        finally:
+            db.close()
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    def consume(self):
+        while not self.stop_event.is_set():
+            try:
+                job = job_queue.claim(timeout=self.poll_timeout)
+            except Exception as e:
+                logger.warning("Could not claim a job: %s", e)
+                self.stop_event.wait(self.poll_timeout)
+                continue
+            if job:
+                self.process(job)
+
+    # -----------------------------
+    # Heartbeats, retries, crash recovery
+    # -----------------------------
+    def maintain(self):
+        while not self.stop_event.wait(MAINTENANCE_INTERVAL):
+            try:
+                with self._running_lock:
+                    running = list(self._running)
+                for job_id in running:
+                    job_queue.heartbeat(job_id)
+                job_queue.promote_delayed()
+                job_queue.requeue_stale(settings.JOB_VISIBILITY_TIMEOUT)
+            except Exception as e:
+                logger.warning("Queue maintenance failed: %s", e)
+
+    def run(self):
+        threads = [threading.Thread(target=self.maintain, name="maintenance", daemon=True)]
+        threads += [
+            threading.Thread(target=self.consume, name=f"consumer-{i}")
+            for i in range(self.concurrency)
+        ]
+        for t in threads:
+            t.start()
+        logger.info("Worker started with %d consumers", self.concurrency)
+        for t in threads[1:]:
+            t.join()
+        config.close_clients()
+        logger.info("Worker stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued research jobs.")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(levelname)s %(message)s")
+    worker = Worker(concurrency=args.concurrency)
+
+    def shutdown(signum, frame):
+        logger.info("Signal %d received; finishing in-flight jobs", signum)
+        worker.stop_event.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()